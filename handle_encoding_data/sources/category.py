@@ -1,16 +1,26 @@
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / "../..").resolve()
 CSV_IN = SCRIPT_DIR / "../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
 CSV_OUT = SCRIPT_DIR / "../output_data/5_category/encoded_category_dataset.csv"
 CATEGORY = "Category"
 PREFIX = "cat"  # use 'cat_' prefix to make columns self-explanatory
 
+# Shared helpers (factorized group index, dtype plan, validation, headless switch, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import planned_dtype
+from pipeline.group_index import build_group_index, one_hot
+from pipeline.headless import is_headless
+from pipeline.validation import binary, display_validation_report, one_hot_group, validate_frame
+
 
 # Load encoded item dataset from CSV
 # Returns dataframe ready for category encoding
@@ -33,14 +43,14 @@ def display_dataset_overview(dataframe):
 
 # Apply one-hot encoding to Category column
 # Creates binary 0/1 columns for each category with 'cat_' prefix
-# Settings: drop_first=False (keep all categories), dtype=int (clean 0/1 integers)
-def apply_one_hot_encoding_to_category(dataframe):
-    # One-Hot Encode Category
-    category_dummies = pd.get_dummies(
-        dataframe[CATEGORY],
-        prefix=PREFIX,
-        drop_first=False,
-        dtype=int
+# Settings: drop_first=False (keep all categories), dtype=uint8 (0/1 integers, see pipeline.dtype_plan)
+def apply_one_hot_encoding_to_category(dataframe, group_index):
+    # One-Hot Encode Category from the factorized codes (columns in sorted category order, like get_dummies)
+    category_entry = group_index[CATEGORY]
+    category_dummies = pd.DataFrame(
+        one_hot(category_entry, dtype=planned_dtype(f"{PREFIX}_{CATEGORY}")),
+        columns=[f"{PREFIX}_{category}" for category in category_entry['uniques']],
+        index=dataframe.index
     )
 
     print("Created dummy columns:", list(category_dummies.columns)[:10], "...")
@@ -57,13 +67,13 @@ def apply_one_hot_encoding_to_category(dataframe):
 # Perform diagnostic checks to validate one-hot encoding correctness
 # Ensures: only 0/1 values, row sums equal 1, displays distribution of categories
 def validate_one_hot_encoding_correctness(category_dummies_dataframe):
-    # Ensure dummies contain only 0/1
-    only_zero_one = category_dummies_dataframe.apply(lambda s: s.isin([0, 1]).all())
-    print("All dummy columns are 0/1:", bool(only_zero_one.all()))
-
-    # For any single row, the sum across Category dummies should be 1 (exactly one Category per row)
-    row_sums = category_dummies_dataframe.sum(axis=1)
-    print("Row sums unique values (should mostly be 1):", row_sums.value_counts().head())
+    # Dummies contain only 0/1 and every row has exactly one Category (checked in one pass)
+    dummy_columns = list(category_dummies_dataframe.columns)
+    report = validate_frame(category_dummies_dataframe, [
+        binary(dummy_columns, name="All dummy columns are 0/1"),
+        one_hot_group(CATEGORY, dummy_columns),
+    ])
+    display_validation_report(report)
 
     # Show the distribution of each dummy (first few)
     print("\nDummy column counts (first few):")
@@ -73,6 +83,12 @@ def validate_one_hot_encoding_correctness(category_dummies_dataframe):
 # Visualize category frequency distribution with horizontal bar chart
 # Shows how many rows fall into each category after one-hot encoding
 def visualize_category_distribution(category_dummies_dataframe):
+    if is_headless():
+        return
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     category_columns = list(category_dummies_dataframe.columns)
     category_counts = category_dummies_dataframe.sum().sort_values()
 
@@ -91,21 +107,20 @@ def visualize_category_distribution(category_dummies_dataframe):
 
 # Save the encoded dataset to CSV file
 # Creates output directory if needed and saves with 'cat_' prefix columns
-def save_encoded_category_dataset(dataframe, output_csv_path):
-    # Ensure output directory exists
-    output_csv_path.parent.mkdir(parents=True, exist_ok=True)
-
-    dataframe.to_csv(output_csv_path, index=False)
+# With PIPELINE_WRITE_DELTA set only Transaction ID and the 'cat_' columns are written (see pipeline.deltas)
+def save_encoded_category_dataset(dataframe, output_csv_path, base_csv_path):
+    save_stage_output(dataframe, output_csv_path, base_csv_path)
 
 def main():
     # Step 1: Load encoded item dataset
     input_dataframe = load_encoded_item_dataset(CSV_IN)
+    group_index = build_group_index(input_dataframe, columns=(CATEGORY,))
 
     # Step 2: Display dataset overview
     display_dataset_overview(input_dataframe)
 
     # Step 3: Apply one-hot encoding to Category
-    encoded_dataframe, category_dummies = apply_one_hot_encoding_to_category(input_dataframe)
+    encoded_dataframe, category_dummies = apply_one_hot_encoding_to_category(input_dataframe, group_index)
 
     # Step 4: Validate encoding
     validate_one_hot_encoding_correctness(category_dummies)
@@ -114,7 +129,7 @@ def main():
     visualize_category_distribution(category_dummies)
 
     # Step 6: Save encoded dataset
-    save_encoded_category_dataset(encoded_dataframe, CSV_OUT)
+    save_encoded_category_dataset(encoded_dataframe, CSV_OUT, CSV_IN)
 
 
 if __name__ == "__main__":
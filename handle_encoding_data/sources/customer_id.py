@@ -1,18 +1,28 @@
+import sys
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / "../..").resolve()
 CSV_IN = SCRIPT_DIR / "../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
 CSV_OUT = SCRIPT_DIR / "../output_data/1_customer_id/encoded_customer_id_dataset.csv"
 CUSTOMER_ID = "Customer ID"
 TARGET_COL = "Total Spent"
 ENCODED_COL = "Customer ID Target Encoded"
 
+# Shared helpers (compact integer keys, factorized group index, dtype plan, headless switch, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.group_index import broadcast_to_rows, build_group_index, group_sizes, group_sum, group_value_count
+from pipeline.headless import is_headless
+from pipeline.keys import compact_keys
+
 
 # Load data from CSV and perform basic checks on data quality
 # Ensures target column is numeric and displays overview statistics
@@ -37,15 +47,14 @@ def load_and_validate_input_data(input_csv_path):
 # Compute Leave-One-Out (LOO) target encoding for Customer ID
 # For each row, calculates mean Total Spent for same Customer ID excluding current row
 # This prevents target leakage by not using the row's own target value in its encoding
-def compute_leave_one_out_target_encoding(dataframe, global_target_mean):
-    # Aggregate sum and count of the target per Customer ID
-    customer_aggregated_spending = (
-        dataframe.groupby(CUSTOMER_ID)[TARGET_COL]
-          .agg(sum_total_spent_per_customer="sum", count_total_spent_per_customer="count")
-    )
+def compute_leave_one_out_target_encoding(dataframe, global_target_mean, group_index):
+    customer_entry = group_index[CUSTOMER_ID]
+    target_values = dataframe[TARGET_COL].to_numpy(dtype=np.float64)
 
-    # Join the aggregation back to the original rows
-    dataframe = dataframe.join(customer_aggregated_spending, on=CUSTOMER_ID)
+    # Aggregate sum and count of the target per Customer ID (bincount over the Customer ID group codes)
+    # and broadcast back to the original rows; rows without a Customer ID get NaN, as in a join on a missing key
+    dataframe["sum_total_spent_per_customer"] = broadcast_to_rows(customer_entry, group_sum(customer_entry, target_values))
+    dataframe["count_total_spent_per_customer"] = broadcast_to_rows(customer_entry, group_value_count(customer_entry, target_values), fill=0)
 
     print(f"\nGlobal mean of {TARGET_COL}: {global_target_mean:.6f}")
     print(dataframe[[CUSTOMER_ID, TARGET_COL, "sum_total_spent_per_customer", "count_total_spent_per_customer"]].head(3))
@@ -69,6 +78,9 @@ def compute_leave_one_out_target_encoding(dataframe, global_target_mean):
     # Drop helper columns to keep the output tidy
     dataframe = dataframe.drop(columns=["sum_total_spent_per_customer", "count_total_spent_per_customer"])
 
+    # Store the encoding as float32 (see pipeline.dtype_plan)
+    dataframe = apply_dtype_plan(dataframe, columns=[ENCODED_COL])
+
     print("\nEncoded feature preview:")
     print(dataframe[[CUSTOMER_ID, TARGET_COL, ENCODED_COL]].head(5))
 
@@ -77,10 +89,10 @@ def compute_leave_one_out_target_encoding(dataframe, global_target_mean):
 
 # Run diagnostic checks on encoded data to verify correctness
 # Identifies singleton Customer IDs (appearing once) - their encoding should equal global mean
-def validate_encoding_correctness(dataframe, global_target_mean):
+def validate_encoding_correctness(dataframe, global_target_mean, group_index):
     # Diagnostics: spot checks
     # IDs with single occurrence should equal global mean
-    customer_id_frequency_counts = dataframe[CUSTOMER_ID].value_counts()
+    customer_id_frequency_counts = group_sizes(group_index[CUSTOMER_ID])
     singleton_customer_ids = customer_id_frequency_counts[customer_id_frequency_counts == 1].index[:5]
 
     if singleton_customer_ids.empty:
@@ -93,6 +105,12 @@ def validate_encoding_correctness(dataframe, global_target_mean):
 # Create histogram and density plot to visualize distribution of encoded values
 # Shows the typical customer spending pattern captured by the encoding
 def visualize_encoded_distribution(dataframe):
+    if is_headless():
+        return
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(8, 5))
     sns.histplot(
         dataframe[ENCODED_COL],
@@ -115,11 +133,9 @@ def visualize_encoded_distribution(dataframe):
 
 # Save the encoded dataset to CSV file
 # Creates output directory if it doesn't exist and saves with encoded feature column
-def save_encoded_dataset_to_csv(dataframe, output_csv_path, global_target_mean):
-    # Ensure output directory exists
-    output_csv_path.parent.mkdir(parents=True, exist_ok=True)
-
-    dataframe.to_csv(output_csv_path, index=False)
+# With PIPELINE_WRITE_DELTA set only Transaction ID and the encoded column are written (see pipeline.deltas)
+def save_encoded_dataset_to_csv(dataframe, output_csv_path, global_target_mean, base_csv_path):
+    save_stage_output(dataframe, output_csv_path, base_csv_path)
     print(f"\nSaved: {output_csv_path.resolve()}")
     print(f"New column: {ENCODED_COL} (global mean fallback = {global_target_mean:.6f})")
 
@@ -129,22 +145,24 @@ def main():
     # Step 1: Load and check data
     print("Step 1: Loading data and performing basic checks...")
     input_dataframe = load_and_validate_input_data(CSV_IN)
+    # Group on the compact integer customer codes instead of hashing the key strings
+    group_index = build_group_index(input_dataframe, columns=(CUSTOMER_ID,), keys=compact_keys(input_dataframe, columns=(CUSTOMER_ID,)))
 
     # Step 2: Compute global mean
     global_target_mean = input_dataframe[TARGET_COL].mean()
 
     # Step 3: Compute LOO encoding
     print("\nStep 2: Computing Leave-One-Out encoding...")
-    encoded_dataframe = compute_leave_one_out_target_encoding(input_dataframe, global_target_mean)
+    encoded_dataframe = compute_leave_one_out_target_encoding(input_dataframe, global_target_mean, group_index)
 
     # Step 4: Run diagnostics
-    validate_encoding_correctness(encoded_dataframe, global_target_mean)
+    validate_encoding_correctness(encoded_dataframe, global_target_mean, group_index)
 
     # Step 5: Visualize encoding distribution
     visualize_encoded_distribution(encoded_dataframe)
 
     # Step 6: Save encoded dataset
-    save_encoded_dataset_to_csv(encoded_dataframe, CSV_OUT, global_target_mean)\
+    save_encoded_dataset_to_csv(encoded_dataframe, CSV_OUT, global_target_mean, CSV_IN)\
 
 
 if __name__ == "__main__":
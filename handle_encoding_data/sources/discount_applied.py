@@ -1,32 +1,42 @@
+import sys
 import pandas as pd
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / "../..").resolve()
 CSV_IN = SCRIPT_DIR / "../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
 CSV_OUT = SCRIPT_DIR / "../output_data/4_discount_applied/discount_applied_one_hot_encoded.csv"
 DISCOUNT_APPLIED = "Discount Applied"
 ENCODING_PREFIX = "Discount"
 
+# Shared helpers (factorized group index, validation, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load the cleaned dataset and create a working copy
+from pipeline.deltas import save_stage_output
+from pipeline.group_index import build_group_index, one_hot
+from pipeline.validation import binary, display_validation_report, not_null, one_hot_group, validate_frame
+
+
+# Load the cleaned dataset
 # Returns dataframe ready for discount applied encoding
 def load_cleaned_dataset_for_encoding(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
     return working_dataframe
 
 
 # Apply one-hot encoding to Discount Applied column
 # Creates 3 binary columns: Discount_True, Discount_False, Discount_Unknown
 # Each row will have exactly one "1" and two "0"s
-def apply_one_hot_encoding_to_discount_applied(dataframe):
-    # Apply one-hot encoding
-    discount_encoded = pd.get_dummies(
-        dataframe[DISCOUNT_APPLIED],
-        prefix=ENCODING_PREFIX,
-        drop_first=False
+def apply_one_hot_encoding_to_discount_applied(dataframe, group_index):
+    # Apply one-hot encoding from the factorized codes (boolean columns in sorted order, like pd.get_dummies)
+    discount_entry = group_index[DISCOUNT_APPLIED]
+    discount_encoded = pd.DataFrame(
+        one_hot(discount_entry, dtype=bool),
+        columns=[f"{ENCODING_PREFIX}_{value}" for value in discount_entry['uniques']],
+        index=dataframe.index
     )
 
     # Add encoded columns to dataframe
@@ -44,18 +54,13 @@ def apply_one_hot_encoding_to_discount_applied(dataframe):
 def validate_discount_encoding_correctness(dataframe):
     encoded_columns = ['Discount_False', 'Discount_True', 'Discount_Unknown']
 
-    # 1. Check one-hot columns sum to 1 per row
-    one_hot_sum = dataframe[encoded_columns].sum(axis=1)
-    sum_check = (one_hot_sum == 1).all()
-    print(f"\n1. Each row has exactly one '1' across encoded columns: {sum_check}")
-
-    # 2. Check no missing values
-    no_missing = dataframe[encoded_columns].isna().sum().sum() == 0
-    print(f"2. No missing values in encoded columns: {no_missing}")
-
-    # 3. Check only binary values (0 or 1)
-    binary_check = dataframe[encoded_columns].isin([0, 1]).all().all()
-    print(f"3. Only contains 0/1 values: {binary_check}")
+    # 1-3. One-hot columns sum to 1 per row, no missing values, only binary values (one pass)
+    report = validate_frame(dataframe, [
+        one_hot_group(DISCOUNT_APPLIED, encoded_columns),
+        not_null(encoded_columns, name="No missing values in encoded columns"),
+        binary(encoded_columns, name="Only contains 0/1 values"),
+    ])
+    display_validation_report(report)
 
     # 4. Display distribution
     print(f"\nDistribution of encoded columns:")
@@ -67,27 +72,25 @@ def validate_discount_encoding_correctness(dataframe):
 
 # Save the encoded dataset to CSV file
 # Creates output directory if it doesn't exist
-def save_discount_encoded_dataset(dataframe, output_csv_path):
-    # Create output directory if it doesn't exist
-    output_path = Path(output_csv_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
+# With PIPELINE_WRITE_DELTA set only Transaction ID and the one-hot columns are written (see pipeline.deltas)
+def save_discount_encoded_dataset(dataframe, output_csv_path, base_csv_path):
     # Save the encoded dataset
-    dataframe.to_csv(output_path, index=False)
+    save_stage_output(dataframe, output_csv_path, base_csv_path)
 
 
 def main():
     # Step 1: Load cleaned dataset
     working_data = load_cleaned_dataset_for_encoding(CSV_IN)
+    group_index = build_group_index(working_data, columns=(DISCOUNT_APPLIED,))
 
     # Step 2: Apply one-hot encoding
-    encoded_data = apply_one_hot_encoding_to_discount_applied(working_data)
+    encoded_data = apply_one_hot_encoding_to_discount_applied(working_data, group_index)
 
     # Step 3: Validate encoding
     validate_discount_encoding_correctness(encoded_data)
 
     # Step 4: Save encoded dataset
-    save_discount_encoded_dataset(encoded_data, CSV_OUT)
+    save_discount_encoded_dataset(encoded_data, CSV_OUT, CSV_IN)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,12 @@
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-from sklearn.model_selection import KFold
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / "../..").resolve()
 CSV_IN = SCRIPT_DIR / "../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
 CSV_OUT = SCRIPT_DIR / "../output_data/6_item/encoded_item_dataset.csv"
 
@@ -16,10 +15,20 @@ ITEM = "Item"
 TARGET_COL = "Total Spent"
 ENCODED_COL = "Item Target Encoded"
 
-# 2-Fold parameters
+# 2-Fold parameters (shuffled splits, identical to sklearn KFold(shuffle=True))
 N_SPLITS = 2          # fixed to 2-fold
 RANDOM_STATE = 42     # random seed for reproducibility
-SHUFFLE = True        # shuffle before split
+
+# Shared helpers (compact integer keys, factorized group index, dtype plan, headless switch, k-fold splits, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.folds import kfold_splits
+from pipeline.group_index import broadcast_to_rows, build_group_index, group_count, group_mean
+from pipeline.headless import is_headless
+from pipeline.keys import compact_keys
 
 
 # Load encoded customer ID dataset from CSV
@@ -51,43 +60,43 @@ def prepare_and_validate_data_for_encoding(dataframe):
 # Perform 2-fold target encoding for Item column
 # Splits data into 2 folds, encodes each fold using means from opposite fold
 # Returns dataframe with new Item Target Encoded column
-def perform_two_fold_target_encoding(dataframe):
-    # Initialize KFold with 2 splits, shuffling, and a random state for reproducibility
-    kfold_splitter = KFold(n_splits=N_SPLITS, shuffle=SHUFFLE, random_state=RANDOM_STATE)
-
+def perform_two_fold_target_encoding(dataframe, group_index):
     # Calculate global mean of the target
     global_target_mean = dataframe[TARGET_COL].mean()
 
     # Prepare a Series to hold the encoded values with the same index as df
     encoded_values_series = pd.Series(index=dataframe.index, dtype=float)
 
+    # Fold means are computed with bincount over the Item group codes
+    item_entry = group_index[ITEM]
+    target_values = dataframe[TARGET_COL].to_numpy(dtype=np.float64)
+
     print(f"\nPerforming 2-Fold Target Encoding (Global mean fallback: {global_target_mean:.6f})...\n")
 
     # Perform 2-Fold target encoding
     # fold variables: train_idx, val_idx
     # start=1 to make fold count human-friendly (1, 2, ...)
-    # kfold_splitter.split separates df into training and validation fold
-    for fold_number, (train_indices, validation_indices) in enumerate(kfold_splitter.split(dataframe), start=1):
+    # kfold_splits separates df into training and validation fold (2 splits, shuffled, fixed random state)
+    for fold_number, (train_indices, validation_indices) in enumerate(kfold_splits(len(dataframe), N_SPLITS, RANDOM_STATE), start=1):
         # For 2-fold: 'train_indices' is the opposite fold used to compute means
         # 'validation_indices' is the fold we encode
-        training_fold = dataframe.iloc[train_indices]  # opposite fold
-        validation_fold = dataframe.iloc[validation_indices]  # current fold to encode
+        # Calculate mean target per Item in training fold (opposite fold)
+        item_means = group_mean(item_entry, target_values, rows=train_indices)
 
-        # Calculate mean target per Item in training fold
-        item_mean_mapping = training_fold.groupby(ITEM)[TARGET_COL].mean()
-
-        # Map means to validation fold, fill NaN with global mean
-        encoded_fold_values = validation_fold[ITEM].map(item_mean_mapping).fillna(global_target_mean)
+        # Map means to validation fold (current fold to encode), fill NaN with global mean
+        encoded_fold_values = broadcast_to_rows(item_entry, item_means, rows=validation_indices)
+        encoded_fold_values = np.where(np.isnan(encoded_fold_values), global_target_mean, encoded_fold_values)
 
         # Assign encoded values to the correct positions in the encoded Series
-        encoded_values_series.iloc[validation_indices] = encoded_fold_values.values
+        encoded_values_series.iloc[validation_indices] = encoded_fold_values
 
         # Diagnostics
-        unique_items_in_training = item_mean_mapping.index.nunique()
+        unique_items_in_training = (group_count(item_entry, rows=train_indices) > 0).sum()
         print(f"Fold {fold_number}: opposite(train)={len(train_indices)} encode(val)={len(validation_indices)} | unique Items in opposite={unique_items_in_training}")
 
-    # Attach encoded feature
+    # Attach encoded feature, stored as float32 (see pipeline.dtype_plan)
     dataframe[ENCODED_COL] = encoded_values_series
+    dataframe = apply_dtype_plan(dataframe, columns=[ENCODED_COL])
 
     # Diagnostics
     print("\nEncoded summary:")
@@ -99,6 +108,12 @@ def perform_two_fold_target_encoding(dataframe):
 # Visualize the distribution of encoded Item values using violin plot
 # Shows the spread of mean Total Spent values associated with each item
 def visualize_item_encoding_distribution(dataframe):
+    if is_headless():
+        return
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(8, 4))
     sns.violinplot(
         data=dataframe[[ENCODED_COL]],
@@ -116,12 +131,10 @@ def visualize_item_encoding_distribution(dataframe):
 
 # Save the encoded dataset to CSV file
 # Creates output directory if it doesn't exist
-def save_item_encoded_dataset(dataframe, output_csv_path):
-    # Ensure output directory exists
-    output_csv_path.parent.mkdir(parents=True, exist_ok=True)
-
+# With PIPELINE_WRITE_DELTA set only Transaction ID and the encoded column are written (see pipeline.deltas)
+def save_item_encoded_dataset(dataframe, output_csv_path, base_csv_path):
     # Save encoded dataset
-    dataframe.to_csv(output_csv_path, index=False)
+    save_stage_output(dataframe, output_csv_path, base_csv_path)
 
     global_mean_value = dataframe[TARGET_COL].mean()
     print(f"\n Saved encoded dataset: {output_csv_path.resolve()}")
@@ -135,15 +148,17 @@ def main():
 
     # Step 2: Prepare and validate data
     prepared_dataframe = prepare_and_validate_data_for_encoding(input_dataframe)
+    # Group on the compact integer item codes instead of hashing the key strings
+    group_index = build_group_index(prepared_dataframe, columns=(ITEM,), keys=compact_keys(prepared_dataframe, columns=(ITEM,)))
 
     # Step 3: Perform 2-fold target encoding
-    encoded_dataframe = perform_two_fold_target_encoding(prepared_dataframe)
+    encoded_dataframe = perform_two_fold_target_encoding(prepared_dataframe, group_index)
 
     # Step 4: Visualize distribution
     visualize_item_encoding_distribution(encoded_dataframe)
 
     # Step 5: Save encoded dataset
-    save_item_encoded_dataset(encoded_dataframe, CSV_OUT)
+    save_item_encoded_dataset(encoded_dataframe, CSV_OUT, CSV_IN)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,29 @@
+import sys
 import pandas as pd
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / "../..").resolve()
 CSV_IN = SCRIPT_DIR / "../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
 CSV_OUT = SCRIPT_DIR / "../output_data/2_location/location_binary_encoded.csv"
 LOCATION = "Location"
 ENCODED_COLUMN = "Location_Encoded"
 
+# Shared helpers (dtype plan, validation, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load the cleaned dataset and create a working copy
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import planned_dtype
+from pipeline.validation import binary, display_validation_report, mapping, not_null, validate_frame
+
+
+# Load the cleaned dataset
 # Returns dataframe ready for location encoding
 def load_cleaned_dataset_for_location_encoding(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
     return working_dataframe
 
 
@@ -22,8 +31,8 @@ def load_cleaned_dataset_for_location_encoding(input_csv_path):
 # Encoding rule: In-store = 0, Online = 1
 # Returns dataframe with new Location_Encoded column
 def apply_binary_encoding_to_location(dataframe):
-    # Apply binary encoding: In-store = 0, Online = 1
-    dataframe[ENCODED_COLUMN] = (dataframe[LOCATION] == 'Online').astype(int)
+    # Apply binary encoding: In-store = 0, Online = 1 (uint8, see pipeline.dtype_plan)
+    dataframe[ENCODED_COLUMN] = (dataframe[LOCATION] == 'Online').astype(planned_dtype(ENCODED_COLUMN))
 
     print(f"\nOriginal Location vs Encoded:")
     print(dataframe[[LOCATION, ENCODED_COLUMN]].head(10))
@@ -37,38 +46,29 @@ def apply_binary_encoding_to_location(dataframe):
 # Validate binary encoding correctness through multiple checks
 # Ensures: only 0/1 values, no missing values, correct mapping (In-store�0, Online�1)
 def validate_binary_encoding_correctness(dataframe):
-    # 1. Check only contains 0/1 values
-    valid_values = dataframe[ENCODED_COLUMN].isin([0, 1]).all()
-    print(f"\n1. Only contains 0/1 values: {valid_values}")
-
-    # 2. Check no missing values
-    no_missing = dataframe[ENCODED_COLUMN].isna().sum() == 0
-    print(f"2. No missing values: {no_missing}")
-
-    # 3. Verify mapping correctness
-    in_store_check = (dataframe[dataframe[LOCATION] == 'In-store'][ENCODED_COLUMN] == 0).all()
-    online_check = (dataframe[dataframe[LOCATION] == 'Online'][ENCODED_COLUMN] == 1).all()
-    print(f"3. In-store - 0 mapping correct: {in_store_check}")
-    print(f"4. Online - 1 mapping correct: {online_check}")
-
-    # 5. Display distribution statistics
+    # 1-3. Only 0/1 values, no missing values, In-store -> 0 / Online -> 1 on every row (one pass)
+    report = validate_frame(dataframe, [
+        binary([ENCODED_COLUMN], name="Only contains 0/1 values"),
+        not_null([ENCODED_COLUMN], name="No missing values"),
+        mapping(LOCATION, ENCODED_COLUMN, {'In-store': 0, 'Online': 1}, name="In-store - 0 / Online - 1 mapping correct"),
+    ])
+    display_validation_report(report)
+
+    # 4. Display distribution statistics
     print(f"\nDistribution statistics:")
     total_rows = len(dataframe)
-    in_store_count = (dataframe[ENCODED_COLUMN] == 0).sum()
-    online_count = (dataframe[ENCODED_COLUMN] == 1).sum()
+    online_count = int(dataframe[ENCODED_COLUMN].sum())
+    in_store_count = total_rows - online_count
     print(f"  In-store (0): {in_store_count} ({in_store_count/total_rows*100:.2f}%)")
     print(f"  Online (1): {online_count} ({online_count/total_rows*100:.2f}%)")
 
 
 # Save the encoded dataset to CSV file
 # Creates output directory if it doesn't exist
-def save_location_encoded_dataset(dataframe, output_csv_path):
-    # Create output directory if it doesn't exist
-    output_path = Path(output_csv_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
+# With PIPELINE_WRITE_DELTA set only Transaction ID and Location_Encoded are written (see pipeline.deltas)
+def save_location_encoded_dataset(dataframe, output_csv_path, base_csv_path):
     # Save the encoded dataset
-    dataframe.to_csv(output_path, index=False)
+    save_stage_output(dataframe, output_csv_path, base_csv_path)
 
 
 
@@ -76,7 +76,7 @@ def main():
     working_data = load_cleaned_dataset_for_location_encoding(CSV_IN)
     encoded_data = apply_binary_encoding_to_location(working_data)
     validate_binary_encoding_correctness(encoded_data)
-    save_location_encoded_dataset(encoded_data, CSV_OUT)
+    save_location_encoded_dataset(encoded_data, CSV_OUT, CSV_IN)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+import sys
 import pandas as pd
 import os
 from pathlib import Path
@@ -5,43 +6,54 @@ from pathlib import Path
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV_PATH = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
 OUTPUT_CSV_PATH = SCRIPT_DIR / '../output_data/3_payment_method/encoded_payment_method_dataset.csv'
 PAYMENT_METHOD_COLUMN = 'Payment Method'
 ENCODING_PREFIX = 'Payment'
 
+# Shared helpers (factorized group index, validation, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load the cleaned dataset and create a working copy
+from pipeline.deltas import save_stage_output
+from pipeline.group_index import build_group_index, group_sizes, one_hot
+from pipeline.validation import binary, display_validation_report, not_null, one_hot_group, validate_frame
+
+
+# Load the cleaned dataset
 # Returns a dataframe ready for encoding operations
 def load_cleaned_dataset(input_file_path):
-    original_dataframe = pd.read_csv(input_file_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_file_path)
     return working_dataframe
 
 
 # Analyze payment method distribution and check data quality
 # Displays unique values, percentage distribution, and missing value count
-def analyze_payment_method_distribution(dataframe):
+def analyze_payment_method_distribution(group_index):
+    payment_entry = group_index[PAYMENT_METHOD_COLUMN]
+
     print("Unique Payment Methods:")
-    print(dataframe[PAYMENT_METHOD_COLUMN].value_counts())
+    print(group_sizes(payment_entry))
 
     print("\nDistribution (%):")
-    print(dataframe[PAYMENT_METHOD_COLUMN].value_counts(normalize=True) * 100)
+    print(group_sizes(payment_entry, normalize=True) * 100)
 
-    print(f"\nTotal unique values: {dataframe[PAYMENT_METHOD_COLUMN].nunique()}")
-    print(f"Missing values: {dataframe[PAYMENT_METHOD_COLUMN].isna().sum()}")
+    print(f"\nTotal unique values: {len(payment_entry['uniques'])}")
+    print(f"Missing values: {payment_entry['missing']}")
 
 
 # Apply one-hot encoding to Payment Method column
 # Creates binary columns for each payment method category
 # Returns encoded dataframe with columns: Payment_Cash, Payment_Credit Card, Payment_Digital Wallet
-def apply_one_hot_encoding_to_payment_method(dataframe):
-    # Apply one-hot encoding using pd.get_dummies
-    # drop_first=False to keep all 3 columns for interpretability
-    payment_method_encoded = pd.get_dummies(
-        dataframe[PAYMENT_METHOD_COLUMN],
-        prefix=ENCODING_PREFIX,
-        drop_first=False
+def apply_one_hot_encoding_to_payment_method(dataframe, group_index):
+    # Apply one-hot encoding from the factorized codes (boolean columns in sorted order, like pd.get_dummies)
+    # drop_first=False equivalent: keep all 3 columns for interpretability
+    payment_entry = group_index[PAYMENT_METHOD_COLUMN]
+    payment_method_encoded = pd.DataFrame(
+        one_hot(payment_entry, dtype=bool),
+        columns=[f'{ENCODING_PREFIX}_{payment_method}' for payment_method in payment_entry['uniques']],
+        index=dataframe.index
     )
 
     print(payment_method_encoded.columns.tolist())
@@ -53,28 +65,24 @@ def apply_one_hot_encoding_to_payment_method(dataframe):
 
 # Validate one-hot encoding correctness through multiple checks
 # Ensures: row sums equal 1, only binary values, no missing values, distribution matches original
-def validate_one_hot_encoding(dataframe, encoded_dataframe):
-    # Validation 1: Each row should sum to exactly 1 (one payment method per transaction)
-    row_sums = encoded_dataframe.sum(axis=1)
-    print("Row sum validation:")
-    print(f"All rows sum to 1: {(row_sums == 1).all()}")
-    print(f"Min sum: {row_sums.min()}, Max sum: {row_sums.max()}")
-
-    # Validation 2: Only binary values (0 or 1)
-    print("\nBinary validation:")
-    for column_name in encoded_dataframe.columns:
-        unique_values = encoded_dataframe[column_name].unique()
-        print(f"{column_name}: {sorted(unique_values)}")
-
-    # Validation 3: No missing values
-    print(f"\nMissing values: {encoded_dataframe.isna().sum().sum()}")
+def validate_one_hot_encoding(dataframe, encoded_dataframe, group_index):
+    # Validations 1-3 in one pass: each row sums to exactly 1 (one payment method per transaction),
+    # only binary values, no missing values
+    encoded_columns = list(encoded_dataframe.columns)
+    report = validate_frame(encoded_dataframe, [
+        one_hot_group(PAYMENT_METHOD_COLUMN, encoded_columns),
+        binary(encoded_columns),
+        not_null(encoded_columns),
+    ])
+    display_validation_report(report)
 
     # Validation 4: Total counts match original distribution
     print("\nDistribution check:")
+    original_counts = group_sizes(group_index[PAYMENT_METHOD_COLUMN])
     for column_name in encoded_dataframe.columns:
         original_payment_method = column_name.replace(f'{ENCODING_PREFIX}_', '')
         encoded_count = encoded_dataframe[column_name].sum()
-        original_count = (dataframe[PAYMENT_METHOD_COLUMN] == original_payment_method).sum()
+        original_count = original_counts.get(original_payment_method, 0)
         match_status = encoded_count == original_count
         print(f"{original_payment_method}: Encoded={encoded_count}, Original={original_count}, Match={match_status}")
 
@@ -96,26 +104,24 @@ def combine_encoded_with_original_dataset(original_dataframe, encoded_dataframe)
 
 # Save the encoded dataset to CSV file
 # Creates output directory if it doesn't exist and saves the final encoded dataset
-def save_encoded_dataset_to_csv(dataframe, output_file_path):
-    # Create output directory if it doesn't exist
-    output_directory = output_file_path.parent
-    output_directory.mkdir(parents=True, exist_ok=True)
-
+# With PIPELINE_WRITE_DELTA set only Transaction ID and the Payment_ columns are written (see pipeline.deltas)
+def save_encoded_dataset_to_csv(dataframe, output_file_path, base_file_path):
     # Save the encoded dataset
-    dataframe.to_csv(output_file_path, index=False)
+    save_stage_output(dataframe, output_file_path, base_file_path)
 
 def main():
     working_data = load_cleaned_dataset(INPUT_CSV_PATH)
+    group_index = build_group_index(working_data, columns=(PAYMENT_METHOD_COLUMN,))
 
-    analyze_payment_method_distribution(working_data)
+    analyze_payment_method_distribution(group_index)
 
-    encoded_payment_data = apply_one_hot_encoding_to_payment_method(working_data)
+    encoded_payment_data = apply_one_hot_encoding_to_payment_method(working_data, group_index)
 
-    validate_one_hot_encoding(working_data, encoded_payment_data)
+    validate_one_hot_encoding(working_data, encoded_payment_data, group_index)
 
     final_encoded_dataset = combine_encoded_with_original_dataset(working_data, encoded_payment_data)
 
-    save_encoded_dataset_to_csv(final_encoded_dataset, OUTPUT_CSV_PATH)
+    save_encoded_dataset_to_csv(final_encoded_dataset, OUTPUT_CSV_PATH, INPUT_CSV_PATH)
 
 
 if __name__ == "__main__":
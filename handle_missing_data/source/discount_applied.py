@@ -1,3 +1,4 @@
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -5,16 +6,22 @@ from pathlib import Path
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../output_data/3_item/item_imputed.csv'
 OUTPUT_CSV = SCRIPT_DIR / '../output_data/4_discount_applied/final_cleaned_dataset.csv'
 DISCOUNT_APPLIED_COLUMN = 'Discount Applied'
 
+# Shared helpers (factorized group index) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load dataset from previous step (Item imputation) and create working copy
+from pipeline.group_index import build_group_index, group_count, group_share
+
+
+# Load dataset from previous step (Item imputation)
 # Returns dataframe ready for Discount Applied handling
 def load_dataset_after_item_imputation(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
     print(f'Dataset loaded successfully from: {input_csv_path}')
     print(f'Rows: {len(working_dataframe)}')
@@ -49,21 +56,21 @@ def quantify_missing_discount_applied(dataframe):
 
 # Analyze missingness patterns across categories to determine if MCAR, MAR, or MNAR
 # Returns tuple of (category_cv, category_summary, payment_share, location_share)
-def analyze_missingness_mechanism(dataframe, missing_discount):
+def analyze_missingness_mechanism(group_index, missing_discount):
     print('MISSINGNESS MECHANISM ANALYSIS')
 
     # Analyze missingness patterns across categories
-    summary = dataframe.assign(missing_discount=missing_discount).groupby('Category')['missing_discount'].mean().sort_values(ascending=False)
+    summary = group_share(group_index['Category'], missing_discount, name='missing_discount').sort_values(ascending=False)
     print('Share of Discount Applied missing by Category:')
     print(summary)
 
     # Analyze missingness patterns across payment methods
-    payment_share = dataframe.assign(missing_discount=missing_discount).groupby('Payment Method')['missing_discount'].mean().sort_values(ascending=False)
+    payment_share = group_share(group_index['Payment Method'], missing_discount, name='missing_discount').sort_values(ascending=False)
     print('\nShare of Discount Applied missing by Payment Method:')
     print(payment_share)
 
     # Analyze missingness patterns across locations
-    location_share = dataframe.assign(missing_discount=missing_discount).groupby('Location')['missing_discount'].mean().sort_values(ascending=False)
+    location_share = group_share(group_index['Location'], missing_discount, name='missing_discount').sort_values(ascending=False)
     print('\nShare of Discount Applied missing by Location:')
     print(location_share)
 
@@ -196,7 +203,7 @@ def validate_complete_dataset(dataframe):
 
 
 # Display sample of rows after handling to verify Unknown category applied correctly
-def display_handled_sample(dataframe, missing_discount):
+def display_handled_sample(dataframe, missing_discount, group_index):
     print('\n' + '=' * 80)
     print('SAMPLE AFTER HANDLING')
     print('=' * 80)
@@ -205,10 +212,9 @@ def display_handled_sample(dataframe, missing_discount):
     print(sample_handled)
 
     print('\nVerification by Category:')
-    for category in dataframe['Category'].unique():
-        category_data = dataframe[dataframe['Category'] == category]
-        unknown_count = (category_data[DISCOUNT_APPLIED_COLUMN] == 'Unknown').sum()
-        total_count = len(category_data)
+    category_entry = group_index['Category']
+    unknown_counts = group_count(category_entry, dataframe[DISCOUNT_APPLIED_COLUMN] == 'Unknown')
+    for category, unknown_count, total_count in zip(category_entry['uniques'], unknown_counts, category_entry['sizes']):
         unknown_pct = (unknown_count / total_count) * 100 if total_count > 0 else 0
         print(f'  {category:40s}: {unknown_count:4d} Unknown out of {total_count:5d} ({unknown_pct:5.2f}%)')
 
@@ -232,10 +238,11 @@ def save_final_cleaned_dataset(dataframe, output_csv_path):
 
 def main():
     working_data = load_dataset_after_item_imputation(INPUT_CSV)
+    group_index = build_group_index(working_data, columns=('Category', 'Payment Method', 'Location'))
 
     missing_count, missing_percentage, missing_discount = quantify_missing_discount_applied(working_data)
 
-    cv_category, summary, payment_share, location_share = analyze_missingness_mechanism(working_data, missing_discount)
+    cv_category, summary, payment_share, location_share = analyze_missingness_mechanism(group_index, missing_discount)
 
     true_count, false_count, balance_ratio = analyze_observed_value_distribution(working_data)
 
@@ -245,7 +252,7 @@ def main():
 
     all_complete = validate_complete_dataset(working_data)
 
-    display_handled_sample(working_data, missing_discount)
+    display_handled_sample(working_data, missing_discount, group_index)
 
     save_final_cleaned_dataset(working_data, OUTPUT_CSV)
 
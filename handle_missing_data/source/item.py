@@ -1,9 +1,12 @@
+import sys
 import pandas as pd
+import numpy as np
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../output_data/2_price_per_unit/price_per_unit_reconstructed.csv'
 OUTPUT_CSV = SCRIPT_DIR / '../output_data/3_item/item_imputed.csv'
 
@@ -17,12 +20,20 @@ LOCATION = 'Location'
 ITEM = 'Item'
 TRANSACTION_ID = 'Transaction ID'
 
+# Shared helpers (factorized group index) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load dataset from previous step (Price Per Unit reconstruction) and create working copy
+from pipeline.group_index import (
+    MISSING_GROUP, assign_group_codes, broadcast_to_rows, build_group_index, group_count, group_mode,
+    group_share, group_value_counts,
+)
+
+
+# Load dataset from previous step (Price Per Unit reconstruction)
 # Returns dataframe ready for Item imputation
 def load_dataset_after_price_reconstruction(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
     return working_dataframe
 
@@ -48,21 +59,21 @@ def quantify_missing_item(dataframe):
 
 # Analyze missingness patterns across categories to determine if MAR
 # Returns summary of missing percentages by category, payment method, and location
-def analyze_missingness_mechanism(dataframe, missing_item):
+def analyze_missingness_mechanism(group_index, missing_item):
     print('MISSINGNESS MECHANISM ANALYSIS')
 
     # Analyze missingness patterns across categories
-    summary = dataframe.assign(missing_item=missing_item).groupby(CATEGORY)['missing_item'].mean().sort_values(ascending=False) * 100
+    summary = group_share(group_index[CATEGORY], missing_item, name='missing_item').sort_values(ascending=False) * 100
     print('Share of Item missing by Category:')
     print(summary.round(2).astype(str) + '%')
 
     # Analyze missingness patterns across payment methods
-    payment_share = dataframe.assign(missing_item=missing_item).groupby(PAYMENT_METHOD)['missing_item'].mean().sort_values(ascending=False) * 100
+    payment_share = group_share(group_index[PAYMENT_METHOD], missing_item, name='missing_item').sort_values(ascending=False) * 100
     print('\nShare of Item missing by Payment Method:')
     print(payment_share.round(2).astype(str) + '%')
 
     # Analyze missingness patterns across locations
-    location_share = dataframe.assign(missing_item=missing_item).groupby(LOCATION)['missing_item'].mean().sort_values(ascending=False) * 100
+    location_share = group_share(group_index[LOCATION], missing_item, name='missing_item').sort_values(ascending=False) * 100
     print('\nShare of Item missing by Location:')
     print(location_share.round(2).astype(str) + '%')
 
@@ -92,21 +103,29 @@ def verify_category_coverage(dataframe, missing_item):
 
 # Analyze Item distribution within each Category to determine mode for imputation
 # Returns dictionary of category to mode item mapping
-def analyze_item_distribution_by_category(dataframe, missing_item):
+def analyze_item_distribution_by_category(group_index, missing_item):
     print('ITEM DISTRIBUTION ANALYSIS')
 
     print('Most frequent Item per Category (Mode):')
 
+    category_entry = group_index[CATEGORY]
+    item_entry = group_index[ITEM]
+
+    # One Category x Item count table gives the mode, its frequency and the item variety
+    category_item_counts = group_value_counts(category_entry, item_entry)
+    mode_codes = group_mode(category_entry, item_entry)
+    missing_per_category = group_count(category_entry, missing_item)
+
     category_mode_map = {}
 
-    for category in dataframe[CATEGORY].unique():
-        category_data = dataframe[(dataframe[CATEGORY] == category) & (dataframe[ITEM].notna())]
+    for category_code, category in enumerate(category_entry['uniques']):
+        observed_count = category_item_counts[category_code].sum()
 
-        if len(category_data) > 0:
-            mode_item = category_data[ITEM].mode()[0]
-            mode_count = (category_data[ITEM] == mode_item).sum()
-            mode_pct = (mode_count / len(category_data)) * 100
-            to_impute = ((dataframe[CATEGORY] == category) & missing_item).sum()
+        if observed_count > 0:
+            mode_item = item_entry['uniques'][mode_codes[category_code]]
+            mode_count = category_item_counts[category_code, mode_codes[category_code]]
+            mode_pct = (mode_count / observed_count) * 100
+            to_impute = missing_per_category[category_code]
 
             print(f'{category:40s}: {mode_item:20s} (appears {mode_count:4d} times, {mode_pct:5.1f}%) -> will impute {to_impute} rows')
 
@@ -114,7 +133,7 @@ def analyze_item_distribution_by_category(dataframe, missing_item):
 
     # Show unique item counts per category
     print('Item variety per Category:')
-    item_variety = dataframe[dataframe[ITEM].notna()].groupby(CATEGORY)[ITEM].nunique().sort_values(ascending=False)
+    item_variety = pd.Series((category_item_counts > 0).sum(axis=1), index=category_entry['uniques']).sort_values(ascending=False)
     for category, count in item_variety.items():
         print(f'{category:40s}: {count:3d} unique items')
 
@@ -131,30 +150,33 @@ def display_missing_sample(dataframe, missing_item):
 
 # Perform mode imputation by Category for missing Item values
 # Returns dataframe with all missing Item values imputed
-def impute_item_by_category_mode(dataframe, missing_item, category_mode_map):
+def impute_item_by_category_mode(dataframe, missing_item, category_mode_map, group_index):
     print('PERFORMING MODE IMPUTATION BY CATEGORY')
 
     item_missing_before = missing_item.sum()
     print(f'Item missing before imputation: {item_missing_before}')
 
-    imputation_details = []
+    category_entry = group_index[CATEGORY]
+    item_entry = group_index[ITEM]
 
-    for category in dataframe[CATEGORY].unique():
-        category_mask = (dataframe[CATEGORY] == category) & missing_item
-        missing_in_category = category_mask.sum()
+    # Mode Item code of every Category (from the analysis step's map), broadcast to the rows
+    item_labels = pd.Index(item_entry['uniques'])
+    mode_codes = item_labels.get_indexer([category_mode_map.get(category) for category in category_entry['uniques']])
+    row_mode_codes = broadcast_to_rows(category_entry, mode_codes, fill=MISSING_GROUP)
 
-        if missing_in_category > 0:
-            category_items = dataframe[(dataframe[CATEGORY] == category) & (dataframe[ITEM].notna())][ITEM]
+    # Fill rows whose Item is missing and whose Category has an observed mode
+    fill_rows = missing_item.to_numpy() & (row_mode_codes != MISSING_GROUP)
+    dataframe.loc[fill_rows, ITEM] = np.asarray(item_entry['uniques'])[row_mode_codes[fill_rows]]
 
-            if len(category_items) > 0:
-                mode_item = category_items.mode()[0]
-                dataframe.loc[category_mask, ITEM] = mode_item
+    # Keep the Item entry of the group index in sync with the imputed values
+    assign_group_codes(item_entry, fill_rows, row_mode_codes[fill_rows])
 
-                imputation_details.append({
-                    'Category': category,
-                    'Missing Count': missing_in_category,
-                    'Imputed With': mode_item
-                })
+    missing_per_category = group_count(category_entry, fill_rows)
+    imputation_details = [
+        {'Category': category, 'Missing Count': missing_count, 'Imputed With': item_entry['uniques'][mode_code]}
+        for category, missing_count, mode_code in zip(category_entry['uniques'], missing_per_category, mode_codes)
+        if missing_count > 0
+    ]
 
     item_missing_after = dataframe[ITEM].isna().sum()
     values_imputed = item_missing_before - item_missing_after
@@ -172,7 +194,7 @@ def impute_item_by_category_mode(dataframe, missing_item, category_mode_map):
 
 # Verify imputation correctness and Category-Item consistency
 # Returns tuple of (all_complete, consistency_issues_count)
-def validate_imputation_correctness(dataframe):
+def validate_imputation_correctness(dataframe, group_index):
     print('VALIDATION - IMPUTATION CORRECTNESS')
 
     print('Missing value check after imputation:')
@@ -185,8 +207,6 @@ def validate_imputation_correctness(dataframe):
     # Category-Item consistency check
     print('Category-Item Consistency Validation:')
 
-    consistency_issues = 0
-
     category_codes = {
         'Food': 'FOOD',
         'Furniture': 'FUR',
@@ -198,18 +218,23 @@ def validate_imputation_correctness(dataframe):
         'Patisserie': 'PAT'
     }
 
-    for idx, row in dataframe.iterrows():
-        item = row[ITEM]
-        category = row[CATEGORY]
+    category_entry = group_index[CATEGORY]
+    item_entry = group_index[ITEM]
+
+    # Check every (Category, Item) pair once instead of every row
+    item_suffixes = pd.Series(item_entry['uniques']).str.split('_').str[-1].to_numpy(dtype=object)
+    expected_suffixes = pd.Series(category_entry['uniques']).map(category_codes).fillna('').to_numpy(dtype=object)
+    mismatched_pairs = expected_suffixes[:, None] != item_suffixes[None, :]
 
-        if pd.notna(item) and pd.notna(category):
-            item_category_code = item.split('_')[-1]
-            expected_code = category_codes.get(category, '')
+    # Rows with both Item and Category present whose pair does not match
+    category_row_codes = category_entry['codes']
+    item_row_codes = item_entry['codes']
+    both_present = (category_row_codes != MISSING_GROUP) & (item_row_codes != MISSING_GROUP)
+    issue_rows = np.flatnonzero(both_present)[mismatched_pairs[category_row_codes[both_present], item_row_codes[both_present]]]
 
-            if item_category_code != expected_code:
-                consistency_issues += 1
-                if consistency_issues <= 5:
-                    print(f'  Issue {consistency_issues}: Row {idx} - Item "{item}" does not match Category "{category}"')
+    consistency_issues = len(issue_rows)
+    for issue_number, position in enumerate(issue_rows[:5], start=1):
+        print(f'  Issue {issue_number}: Row {dataframe.index[position]} - Item "{dataframe[ITEM].iat[position]}" does not match Category "{dataframe[CATEGORY].iat[position]}"')
 
     print(f'\nTotal consistency issues: {consistency_issues}')
     if consistency_issues == 0:
@@ -273,20 +298,21 @@ def save_item_imputed_dataset(dataframe, output_csv_path):
 
 def main():
     working_data = load_dataset_after_price_reconstruction(INPUT_CSV)
+    group_index = build_group_index(working_data, columns=(CATEGORY, PAYMENT_METHOD, LOCATION, ITEM))
 
     missing_count, missing_percentage, missing_item = quantify_missing_item(working_data)
 
-    summary, payment_share, location_share = analyze_missingness_mechanism(working_data, missing_item)
+    summary, payment_share, location_share = analyze_missingness_mechanism(group_index, missing_item)
 
     items_and_category_missing, category_coverage = verify_category_coverage(working_data, missing_item)
 
-    category_mode_map = analyze_item_distribution_by_category(working_data, missing_item)
+    category_mode_map = analyze_item_distribution_by_category(group_index, missing_item)
 
     display_missing_sample(working_data, missing_item)
 
-    working_data = impute_item_by_category_mode(working_data, missing_item, category_mode_map)
+    working_data = impute_item_by_category_mode(working_data, missing_item, category_mode_map, group_index)
 
-    all_complete, consistency_issues = validate_imputation_correctness(working_data)
+    all_complete, consistency_issues = validate_imputation_correctness(working_data, group_index)
 
     display_imputed_sample(working_data, missing_item)
 
@@ -1,3 +1,4 @@
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -5,6 +6,7 @@ from pathlib import Path
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../output_data/1_total_spent/total_spent_cleaned.csv'
 OUTPUT_CSV = SCRIPT_DIR / '../output_data/2_price_per_unit/price_per_unit_reconstructed.csv'
 
@@ -21,12 +23,17 @@ TRANSACTION_ID = 'Transaction ID'
 # Error handling
 COERCE_ERRORS = 'coerce'
 
+# Shared helpers (factorized group index) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load dataset from previous step (Total Spent cleaned) and create working copy
+from pipeline.group_index import build_group_index, group_share
+
+
+# Load dataset from previous step (Total Spent cleaned)
 # Returns dataframe ready for Price Per Unit reconstruction
 def load_dataset_after_total_spent_cleaning(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
     return working_dataframe
 
@@ -55,21 +62,21 @@ def quantify_missing_price_per_unit(dataframe):
 
 # Analyze missingness patterns across categories, payment methods, and locations
 # Returns tuple of (category_summary, payment_share, location_share)
-def analyze_missingness_mechanism(dataframe, missing_price):
+def analyze_missingness_mechanism(group_index, missing_price):
     print('MISSINGNESS MECHANISM ANALYSIS')
 
     # Analyze missingness patterns across categories
-    summary = dataframe.assign(missing_price=missing_price).groupby(CATEGORY)['missing_price'].mean().sort_values(ascending=False) * 100
+    summary = group_share(group_index[CATEGORY], missing_price, name='missing_price').sort_values(ascending=False) * 100
     print('Share of Price Per Unit missing by Category:')
     print(summary.round(2))
 
     # Analyze missingness patterns across payment methods
-    payment_share = dataframe.assign(missing_price=missing_price).groupby(PAYMENT_METHOD)['missing_price'].mean().sort_values(ascending=False) * 100
+    payment_share = group_share(group_index[PAYMENT_METHOD], missing_price, name='missing_price').sort_values(ascending=False) * 100
     print('\nShare of Price Per Unit missing by Payment Method:')
     print(payment_share.round(2))
 
     # Analyze missingness patterns across locations
-    location_share = dataframe.assign(missing_price=missing_price).groupby(LOCATION)['missing_price'].mean().sort_values(ascending=False) * 100
+    location_share = group_share(group_index[LOCATION], missing_price, name='missing_price').sort_values(ascending=False) * 100
     print('\nShare of Price Per Unit missing by Location:')
     print(location_share.round(2))
 
@@ -168,22 +175,28 @@ def validate_reconstruction_correctness(dataframe):
     # Mathematical consistency check
     print('Mathematical Consistency Validation:')
 
+    # Scratch arithmetic runs on NumPy arrays, so no frame copy or helper columns are created
+    price = dataframe[PRICE_PER_UNIT].to_numpy(dtype=np.float64)
+    quantity = dataframe[QUANTITY].to_numpy(dtype=np.float64)
+    total_spent = dataframe[TOTAL_SPENT].to_numpy(dtype=np.float64)
+
     # Create filter for rows with all three fields present
-    complete_rows = dataframe[[PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]].notna().all(axis=1)
-    data_complete = dataframe[complete_rows].copy()
+    complete_rows = ~(np.isnan(price) | np.isnan(quantity) | np.isnan(total_spent))
+    complete_count = int(complete_rows.sum())
 
-    print(f'Rows with complete numeric fields: {len(data_complete)} out of {len(dataframe)}')
+    print(f'Rows with complete numeric fields: {complete_count} out of {len(dataframe)}')
 
     # Calculate expected Total Spent using reconstructed prices
-    data_complete['Calculated Total'] = data_complete[PRICE_PER_UNIT] * data_complete[QUANTITY]
+    calculated_total = price * quantity
 
     # Calculate absolute difference between actual and calculated
-    data_complete['Difference'] = (data_complete[TOTAL_SPENT] - data_complete['Calculated Total']).abs()
+    difference = np.abs(total_spent - calculated_total)
 
     # Count rows with significant differences (> 0.01 to account for floating point precision)
-    inconsistent = (data_complete['Difference'] > 0.01).sum()
+    inconsistent_rows = complete_rows & (difference > 0.01)
+    inconsistent = int(inconsistent_rows.sum())
 
-    consistency_rate = ((len(data_complete) - inconsistent) / len(data_complete) * 100) if len(data_complete) > 0 else 0.0
+    consistency_rate = ((complete_count - inconsistent) / complete_count * 100) if complete_count > 0 else 0.0
     print(f'Rows with mathematical inconsistency (diff > 0.01): {inconsistent}')
     print(f'Mathematical consistency rate: {consistency_rate:.2f}%')
 
@@ -192,7 +205,9 @@ def validate_reconstruction_correctness(dataframe):
     else:
         print(f'\nWarning: {inconsistent} rows have inconsistent calculations')
         print('Sample of inconsistent rows:')
-        print(data_complete[data_complete['Difference'] > 0.01][[PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT, 'Calculated Total', 'Difference']].head())
+        sample_rows = dataframe.loc[inconsistent_rows, [PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]].head()
+        sample_positions = np.flatnonzero(inconsistent_rows)[:len(sample_rows)]
+        print(sample_rows.assign(**{'Calculated Total': calculated_total[sample_positions], 'Difference': difference[sample_positions]}))
 
     return dataframe[PRICE_PER_UNIT].isna().sum() == 0, consistency_rate, inconsistent
 
@@ -251,10 +266,11 @@ def save_price_reconstructed_dataset(dataframe, output_csv_path):
 
 def main():
     working_data = load_dataset_after_total_spent_cleaning(INPUT_CSV)
+    group_index = build_group_index(working_data, columns=(CATEGORY, PAYMENT_METHOD, LOCATION))
 
     missing_count, missing_percentage, missing_price = quantify_missing_price_per_unit(working_data)
 
-    summary, payment_share, location_share = analyze_missingness_mechanism(working_data, missing_price)
+    summary, payment_share, location_share = analyze_missingness_mechanism(group_index, missing_price)
 
     item_overlap, overlap_percentage, perfect_overlap = analyze_co_missingness_with_item(working_data, missing_price)
 
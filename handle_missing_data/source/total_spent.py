@@ -1,9 +1,12 @@
+import sys
 import pandas as pd
+import numpy as np
 from pathlib import Path
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../../datasource/Deliverable1Dataset.csv'
 OUTPUT_CSV = SCRIPT_DIR / '../output_data/1_total_spent/total_spent_cleaned.csv'
 
@@ -20,12 +23,17 @@ TRANSACTION_ID = 'Transaction ID'
 # Error handling
 COERCE_ERRORS = 'coerce'
 
+# Shared helpers (factorized group index) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-# Load original dataset and create working copy
+from pipeline.group_index import build_group_index, group_share
+
+
+# Load original dataset
 # Returns dataframe ready for Total Spent analysis
 def load_original_dataset(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
 
     return working_dataframe
@@ -51,21 +59,23 @@ def quantify_missing_total_spent(dataframe):
 
 # Analyze missingness patterns across categories, payment methods, and locations
 # Returns tuple of (category_summary, payment_summary, location_summary)
-def analyze_missingness_mechanism(dataframe):
+def analyze_missingness_mechanism(dataframe, group_index):
     print('MISSINGNESS MECHANISM ANALYSIS')
 
+    missing_total_spent = dataframe[TOTAL_SPENT].isna()
+
     # Missingness by Category
-    by_category = dataframe.groupby(CATEGORY)[TOTAL_SPENT].apply(lambda x: x.isna().mean()).sort_values(ascending=False) * 100
+    by_category = group_share(group_index[CATEGORY], missing_total_spent, name=TOTAL_SPENT).sort_values(ascending=False) * 100
     print('\nMissing Total Spent by Category (%):')
     print(by_category.round(2))
 
     # Missingness by Payment Method
-    by_payment = dataframe.groupby(PAYMENT_METHOD)[TOTAL_SPENT].apply(lambda x: x.isna().mean()).sort_values(ascending=False) * 100
+    by_payment = group_share(group_index[PAYMENT_METHOD], missing_total_spent, name=TOTAL_SPENT).sort_values(ascending=False) * 100
     print('\nMissing Total Spent by Payment Method (%):')
     print(by_payment.round(2))
 
     # Missingness by Location
-    by_location = dataframe.groupby(LOCATION)[TOTAL_SPENT].apply(lambda x: x.isna().mean()).sort_values(ascending=False) * 100
+    by_location = group_share(group_index[LOCATION], missing_total_spent, name=TOTAL_SPENT).sort_values(ascending=False) * 100
     print('\nMissing Total Spent by Location (%):')
     print(by_location.round(2))
 
@@ -175,22 +185,28 @@ def validate_deletion_side_benefits(dataframe):
 def validate_mathematical_consistency(dataframe):
     print('MATHEMATICAL CONSISTENCY CHECK')
 
+    # Scratch arithmetic runs on NumPy arrays, so no frame copy or helper columns are created
+    price = dataframe[PRICE_PER_UNIT].to_numpy(dtype=np.float64)
+    quantity = dataframe[QUANTITY].to_numpy(dtype=np.float64)
+    total_spent = dataframe[TOTAL_SPENT].to_numpy(dtype=np.float64)
+
     # Create filter for rows where all three numeric fields are present
-    complete_rows = dataframe[[PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]].notna().all(axis=1)
-    complete_data = dataframe[complete_rows].copy()
+    complete_rows = ~(np.isnan(price) | np.isnan(quantity) | np.isnan(total_spent))
+    complete_count = int(complete_rows.sum())
 
-    print(f'Rows with complete Price, Quantity, and Total Spent: {len(complete_data)}')
+    print(f'Rows with complete Price, Quantity, and Total Spent: {complete_count}')
 
     # Calculate expected Total Spent using the formula
-    complete_data['Calculated Total'] = complete_data['Price Per Unit'] * complete_data['Quantity']
+    calculated_total = price * quantity
 
     # Calculate absolute difference between actual and calculated
-    complete_data['Difference'] = abs(complete_data['Total Spent'] - complete_data['Calculated Total'])
+    difference = np.abs(total_spent - calculated_total)
 
     # Count rows with significant differences (> 0.01 to account for floating point precision)
-    inconsistent = (complete_data['Difference'] > 0.01).sum()
+    inconsistent_rows = complete_rows & (difference > 0.01)
+    inconsistent = int(inconsistent_rows.sum())
 
-    consistency_rate = ((len(complete_data) - inconsistent) / len(complete_data) * 100) if len(complete_data) > 0 else 0
+    consistency_rate = ((complete_count - inconsistent) / complete_count * 100) if complete_count > 0 else 0
     print(f'Rows with mathematical inconsistency (diff > 0.01): {inconsistent}')
     print(f'Mathematical consistency rate: {consistency_rate:.2f}%')
 
@@ -199,9 +215,11 @@ def validate_mathematical_consistency(dataframe):
     else:
         print(f'\nWarning: {inconsistent} rows have inconsistent calculations')
         print('\nSample of inconsistent rows:')
-        print(complete_data[complete_data['Difference'] > 0.01][[PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT, 'Calculated Total', 'Difference']].head())
+        sample_rows = dataframe.loc[inconsistent_rows, [PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]].head()
+        sample_positions = np.flatnonzero(inconsistent_rows)[:len(sample_rows)]
+        print(sample_rows.assign(**{'Calculated Total': calculated_total[sample_positions], 'Difference': difference[sample_positions]}))
 
-    return len(complete_data), inconsistent, consistency_rate
+    return complete_count, inconsistent, consistency_rate
 
 
 # Analyze impact of deletion on remaining missing values (Item and Price Per Unit)
@@ -251,10 +269,11 @@ def save_total_spent_cleaned_dataset(dataframe, output_csv_path):
 
 def main():
     working_data = load_original_dataset(INPUT_CSV)
+    group_index = build_group_index(working_data, columns=(CATEGORY, PAYMENT_METHOD, LOCATION))
 
     total_row, missing_value, missing_percent = quantify_missing_total_spent(working_data)
 
-    by_category, by_payment, by_location = analyze_missingness_mechanism(working_data)
+    by_category, by_payment, by_location = analyze_missingness_mechanism(working_data, group_index)
 
     qty_overlap, price_overlap, item_overlap, item_overlap_pct = analyze_co_missingness_patterns(working_data, missing_value)
 
@@ -1,22 +1,33 @@
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
 OUTPUT_DIR = SCRIPT_DIR / '../output_data/price_per_unit'
 PRICE_PER_UNIT_COLUMN = 'Price Per Unit'
 
+# Rows left after the missing-data phase (final_cleaned_dataset.csv)
+EXPECTED_ROWS = 11971
+
+# Shared helpers (dtype plan, validation, NumPy scalers, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.scalers import min_max_scale, robust_scale, standard_scale
+from pipeline.validation import correlation, display_validation_report, not_null, product_equals, row_count, validate_frame, value_range
+
 
 # Load the cleaned dataset from the missing data handling phase
-# Returns a copy of the dataframe ready for rescaling operations
+# Returns the dataframe ready for rescaling operations
 def load_cleaned_dataset_for_rescaling(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
     print(f"Dataset loaded successfully")
     print(f"Shape: {working_dataframe.shape}")
@@ -84,8 +95,7 @@ def analyze_price_per_unit_distribution_and_outliers(dataframe):
 # Formula: (X - X_min) / (X_max - X_min)
 # Returns dataframe with new 'PricePerUnit_Normalized' column in range [0, 1]
 def apply_min_max_normalization_to_price_per_unit(dataframe):
-    min_max_scaler = MinMaxScaler()
-    dataframe['PricePerUnit_Normalized'] = min_max_scaler.fit_transform(dataframe[[PRICE_PER_UNIT_COLUMN]])
+    dataframe['PricePerUnit_Normalized'] = min_max_scale(dataframe[PRICE_PER_UNIT_COLUMN])
 
 
     print("MIN-MAX NORMALIZATION")
@@ -105,8 +115,7 @@ def apply_min_max_normalization_to_price_per_unit(dataframe):
 # Formula: (X - �) / �
 # Returns dataframe with new 'PricePerUnit_Standardized' column (mean=0, std=1)
 def apply_z_score_standardization_to_price_per_unit(dataframe):
-    standard_scaler = StandardScaler()
-    dataframe['PricePerUnit_Standardized'] = standard_scaler.fit_transform(dataframe[[PRICE_PER_UNIT_COLUMN]])
+    dataframe['PricePerUnit_Standardized'] = standard_scale(dataframe[PRICE_PER_UNIT_COLUMN])
 
     print("Z-SCORE STANDARDIZATION")
     print(f"\nOriginal mean: ${dataframe[PRICE_PER_UNIT_COLUMN].mean():.2f}")
@@ -123,8 +132,7 @@ def apply_z_score_standardization_to_price_per_unit(dataframe):
 # Formula: (X - median) / IQR
 # Returns dataframe with new 'PricePerUnit_Robust' column (median=0, IQR=1)
 def apply_robust_scaling_to_price_per_unit(dataframe):
-    robust_scaler = RobustScaler()
-    dataframe['PricePerUnit_Robust'] = robust_scaler.fit_transform(dataframe[[PRICE_PER_UNIT_COLUMN]])
+    dataframe['PricePerUnit_Robust'] = robust_scale(dataframe[PRICE_PER_UNIT_COLUMN])
 
     IQR = dataframe[PRICE_PER_UNIT_COLUMN].quantile(0.75) - dataframe[PRICE_PER_UNIT_COLUMN].quantile(0.25)
 
@@ -208,77 +216,35 @@ def analyze_price_interpretability(dataframe):
 
 # Save all three rescaled datasets to separate CSV files
 # Creates output directory if needed and saves norm, std, robust versions
-def save_all_rescaled_datasets(dataframe, output_directory):
-    # Create output directory if it doesn't exist
+# With PIPELINE_WRITE_DELTA set the three share one delta of Transaction ID and the rescaled columns (see pipeline.deltas)
+def save_all_rescaled_datasets(dataframe, output_directory, base_csv_path):
     output_path = Path(output_directory)
-    output_path.mkdir(parents=True, exist_ok=True)
 
-    # Save all three versions
+    # Save all three versions (normalized version recommended)
     output_files = {
         'normalization': output_path / 'data_rescaling_norm_price_per_unit.csv',
         'standardization': output_path / 'data_rescaling_std_price_per_unit.csv',
         'robust': output_path / 'data_rescaling_robust_price_per_unit.csv'
     }
 
-    # Save normalized version (recommended)
-    dataframe.to_csv(output_files['normalization'], index=False)
-
-    # Save standardized version
-    dataframe.to_csv(output_files['standardization'], index=False)
-
-    # Save robust scaled version
-    dataframe.to_csv(output_files['robust'], index=False)
+    save_stage_output(dataframe, list(output_files.values()), base_csv_path)
 
 # Validate all rescaled columns for correctness and data integrity
 # Checks ranges, missing values, row count preservation, correlation, and mathematical consistency
 def validate_rescaled_data_quality(dataframe):
-    print("VALIDATION CHECKS")
-
-    # 1. Range validation
-    print("\n1. RANGE VALIDATION:")
-    norm_in_range = (dataframe['PricePerUnit_Normalized'] >= 0).all() and (dataframe['PricePerUnit_Normalized'] <= 1).all()
-    print(f"Normalization in [0, 1]: {norm_in_range}")
-
-    std_min = dataframe['PricePerUnit_Standardized'].min()
-    std_max = dataframe['PricePerUnit_Standardized'].max()
-    print(f"Standardization range: [{std_min:.2f}, {std_max:.2f}]")
-
-    robust_min = dataframe['PricePerUnit_Robust'].min()
-    robust_max = dataframe['PricePerUnit_Robust'].max()
-    print(f"Robust scaling range: [{robust_min:.2f}, {robust_max:.2f}]")
-
-    # 2. Missing values check
-    print("\n2. MISSING VALUES CHECK:")
-    print(f"Normalized missing: {dataframe['PricePerUnit_Normalized'].isna().sum()}")
-    print(f"Standardized missing: {dataframe['PricePerUnit_Standardized'].isna().sum()}")
-    print(f"Robust missing: {dataframe['PricePerUnit_Robust'].isna().sum()}")
-
-    # 3. Row count preservation
-    print("\n3. ROW COUNT PRESERVATION:")
-    expected_rows = 11971
-    actual_rows = len(dataframe)
-    print(f"Expected: {expected_rows} rows")
-    print(f"Actual: {actual_rows} rows")
-    print(f"Match: {actual_rows == expected_rows}")
-
-    # 4. Correlation with original
-    print("\n4. CORRELATION WITH ORIGINAL (Should be 1.0):")
-    corr_norm = dataframe[PRICE_PER_UNIT_COLUMN].corr(dataframe['PricePerUnit_Normalized'])
-    corr_std = dataframe[PRICE_PER_UNIT_COLUMN].corr(dataframe['PricePerUnit_Standardized'])
-    corr_robust = dataframe[PRICE_PER_UNIT_COLUMN].corr(dataframe['PricePerUnit_Robust'])
-
-    print(f"Normalization correlation: {corr_norm:.6f}")
-    print(f"Standardization correlation: {corr_std:.6f}")
-    print(f"Robust correlation: {corr_robust:.6f}")
-
-    # 5. Mathematical consistency check (Total Spent = Price � Quantity)
-    print("\n5. MATHEMATICAL CONSISTENCY:")
-    if 'Quantity' in dataframe.columns and 'Total Spent' in dataframe.columns:
-        reconstructed = dataframe[PRICE_PER_UNIT_COLUMN] * dataframe['Quantity']
-        consistency = (abs(dataframe['Total Spent'] - reconstructed) < 0.01).all()
-        print(f"Total Spent = Price Per Unit - Quantity: {consistency}")
-    else:
-        print("Cannot verify (Quantity or Total Spent column not found)")
+    # range, missing values, row count, correlation with the original and Total Spent = Price Per Unit x Quantity, in one pass
+    report = validate_frame(dataframe, [
+        value_range('PricePerUnit_Normalized', 0, 1, name="Normalization in [0, 1]"),
+        value_range('PricePerUnit_Standardized', name="Standardization range"),
+        value_range('PricePerUnit_Robust', name="Robust scaling range"),
+        not_null(['PricePerUnit_Normalized', 'PricePerUnit_Standardized', 'PricePerUnit_Robust'], name="No missing rescaled values"),
+        row_count(EXPECTED_ROWS),
+        correlation(PRICE_PER_UNIT_COLUMN, 'PricePerUnit_Normalized', name="Normalization correlation = 1"),
+        correlation(PRICE_PER_UNIT_COLUMN, 'PricePerUnit_Standardized', name="Standardization correlation = 1"),
+        correlation(PRICE_PER_UNIT_COLUMN, 'PricePerUnit_Robust', name="Robust correlation = 1"),
+        product_equals('Total Spent', PRICE_PER_UNIT_COLUMN, 'Quantity', tolerance=1e-5),
+    ])
+    display_validation_report(report)
 
 
 
@@ -291,11 +257,14 @@ def main():
     working_data = apply_z_score_standardization_to_price_per_unit(working_data)
     working_data = apply_robust_scaling_to_price_per_unit(working_data)
 
+    # Store the scaled columns as float32 (see pipeline.dtype_plan)
+    working_data = apply_dtype_plan(working_data, columns=['PricePerUnit_Normalized', 'PricePerUnit_Standardized', 'PricePerUnit_Robust'])
+
     compare_all_rescaling_methods(working_data)
 
     analyze_price_interpretability(working_data)
 
-    save_all_rescaled_datasets(working_data, OUTPUT_DIR)    # Step 8: Validate results
+    save_all_rescaled_datasets(working_data, OUTPUT_DIR, INPUT_CSV)    # Step 8: Validate results
     validate_rescaled_data_quality(working_data)
 
 
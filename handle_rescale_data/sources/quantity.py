@@ -1,22 +1,33 @@
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
 OUTPUT_DIR = SCRIPT_DIR / '../output_data/quantity'
 QUANTITY_COLUMN = 'Quantity'
 
+# Rows left after the missing-data phase (final_cleaned_dataset.csv)
+EXPECTED_ROWS = 11971
+
+# Shared helpers (dtype plan, validation, NumPy scalers, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.scalers import min_max_scale, robust_scale, standard_scale
+from pipeline.validation import correlation, display_validation_report, not_null, row_count, validate_frame, value_range
+
 
 # Load the cleaned dataset from the missing data handling phase
-# Returns a copy of the dataframe ready for rescaling operations
+# Returns the dataframe ready for rescaling operations
 def load_cleaned_dataset_for_rescaling(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
     return working_dataframe
 
@@ -58,8 +69,7 @@ def analyze_quantity_distribution_and_outliers(dataframe):
 # Returns dataframe with new 'Quantity_Normalized' column in range [0, 1]
 def apply_min_max_normalization_to_quantity(dataframe):
     print("MIN-MAX NORMALIZATION")
-    min_max_scaler = MinMaxScaler()
-    dataframe['Quantity_Normalized'] = min_max_scaler.fit_transform(dataframe[[QUANTITY_COLUMN]])
+    dataframe['Quantity_Normalized'] = min_max_scale(dataframe[QUANTITY_COLUMN])
 
     print(f"\nOriginal range: [{dataframe[QUANTITY_COLUMN].min()}, {dataframe[QUANTITY_COLUMN].max()}]")
     print(f"Scaled range: [{dataframe['Quantity_Normalized'].min():.6f}, {dataframe['Quantity_Normalized'].max():.6f}]")
@@ -74,8 +84,7 @@ def apply_min_max_normalization_to_quantity(dataframe):
 # Returns dataframe with new 'Quantity_Standardized' column (mean=0, std=1)
 def apply_z_score_standardization_to_quantity(dataframe):
     print("Z-SCORE STANDARDIZATION")
-    standard_scaler = StandardScaler()
-    dataframe['Quantity_Standardized'] = standard_scaler.fit_transform(dataframe[[QUANTITY_COLUMN]])
+    dataframe['Quantity_Standardized'] = standard_scale(dataframe[QUANTITY_COLUMN])
 
     print(f"\nOriginal mean: {dataframe[QUANTITY_COLUMN].mean():.6f}")
     print(f"Original std: {dataframe[QUANTITY_COLUMN].std():.6f}")
@@ -92,8 +101,7 @@ def apply_z_score_standardization_to_quantity(dataframe):
 # Returns dataframe with new 'Quantity_Robust' column (median=0, IQR=1)
 def apply_robust_scaling_to_quantity(dataframe):
     print("ROBUST SCALING")
-    robust_scaler = RobustScaler()
-    dataframe['Quantity_Robust'] = robust_scaler.fit_transform(dataframe[[QUANTITY_COLUMN]])
+    dataframe['Quantity_Robust'] = robust_scale(dataframe[QUANTITY_COLUMN])
 
     print(f"\nOriginal median: {dataframe[QUANTITY_COLUMN].median():.6f}")
 
@@ -154,69 +162,35 @@ def compare_all_rescaling_methods(dataframe):
 
 # Save all three rescaled datasets to separate CSV files
 # Creates output directory if needed and saves norm, std, robust versions
-def save_all_rescaled_datasets(dataframe, output_directory):
-    # Create output directory if it doesn't exist
+# With PIPELINE_WRITE_DELTA set the three share one delta of Transaction ID and the rescaled columns (see pipeline.deltas)
+def save_all_rescaled_datasets(dataframe, output_directory, base_csv_path):
     output_path = Path(output_directory)
-    output_path.mkdir(parents=True, exist_ok=True)
 
-    # Save all three versions
+    # Save all three versions (robust scaled version recommended)
     output_files = {
         'normalization': output_path / 'data_rescaling_norm_quantity.csv',
         'standardization': output_path / 'data_rescaling_std_quantity.csv',
         'robust': output_path / 'data_rescaling_robust_quantity.csv'
     }
 
-    # Save normalized version
-    dataframe.to_csv(output_files['normalization'], index=False)
-
-    # Save standardized version
-    dataframe.to_csv(output_files['standardization'], index=False)
-
-    # Save robust scaled version (recommended)
-    dataframe.to_csv(output_files['robust'], index=False)
+    save_stage_output(dataframe, list(output_files.values()), base_csv_path)
 
 
 # Validate all rescaled columns for correctness and data integrity
 # Checks ranges, missing values, row count preservation, and correlation with original
 def validate_rescaled_data_quality(dataframe):
-    print("VALIDATION CHECKS")
-
-    # 1. Range validation
-    print("\n1. RANGE VALIDATION:")
-    norm_in_range = (dataframe['Quantity_Normalized'] >= 0).all() and (dataframe['Quantity_Normalized'] <= 1).all()
-    print(f"   Normalization in [0, 1]: {norm_in_range}")
-
-    std_min = dataframe['Quantity_Standardized'].min()
-    std_max = dataframe['Quantity_Standardized'].max()
-    print(f"   Standardization range: [{std_min:.2f}, {std_max:.2f}]")
-
-    robust_min = dataframe['Quantity_Robust'].min()
-    robust_max = dataframe['Quantity_Robust'].max()
-    print(f"   Robust scaling range: [{robust_min:.2f}, {robust_max:.2f}]")
-
-    # 2. Missing values check
-    print("\n2. MISSING VALUES CHECK:")
-    print(f"   Normalized missing: {dataframe['Quantity_Normalized'].isna().sum()}")
-    print(f"   Standardized missing: {dataframe['Quantity_Standardized'].isna().sum()}")
-    print(f"   Robust missing: {dataframe['Quantity_Robust'].isna().sum()}")
-
-    # 3. Row count preservation
-    print("\n3. ROW COUNT PRESERVATION:")
-    expected_rows = 11971
-    actual_rows = len(dataframe)
-    print(f"   Expected: {expected_rows} rows")
-    print(f"   Actual: {actual_rows} rows")
-    print(f"   Match: {actual_rows == expected_rows}")
-
-    # 4. Correlation with original
-    print("\n4. CORRELATION WITH ORIGINAL:")
-    corr_norm = dataframe[QUANTITY_COLUMN].corr(dataframe['Quantity_Normalized'])
-    corr_std = dataframe[QUANTITY_COLUMN].corr(dataframe['Quantity_Standardized'])
-    corr_robust = dataframe[QUANTITY_COLUMN].corr(dataframe['Quantity_Robust'])
-
-    print(f"   Normalization correlation: {corr_norm:.6f}")
-    print(f"   Standardization correlation: {corr_std:.6f}")
-    print(f"   Robust correlation: {corr_robust:.6f}")
+    # range, missing values, row count and correlation with the original, in one pass
+    report = validate_frame(dataframe, [
+        value_range('Quantity_Normalized', 0, 1, name="Normalization in [0, 1]"),
+        value_range('Quantity_Standardized', name="Standardization range"),
+        value_range('Quantity_Robust', name="Robust scaling range"),
+        not_null(['Quantity_Normalized', 'Quantity_Standardized', 'Quantity_Robust'], name="No missing rescaled values"),
+        row_count(EXPECTED_ROWS),
+        correlation(QUANTITY_COLUMN, 'Quantity_Normalized', name="Normalization correlation = 1"),
+        correlation(QUANTITY_COLUMN, 'Quantity_Standardized', name="Standardization correlation = 1"),
+        correlation(QUANTITY_COLUMN, 'Quantity_Robust', name="Robust correlation = 1"),
+    ])
+    display_validation_report(report)
 
 
 
@@ -229,10 +203,13 @@ def main():
     working_data = apply_z_score_standardization_to_quantity(working_data)
     working_data = apply_robust_scaling_to_quantity(working_data)
 
+    # Store the scaled columns as float32 (see pipeline.dtype_plan)
+    working_data = apply_dtype_plan(working_data, columns=['Quantity_Normalized', 'Quantity_Standardized', 'Quantity_Robust'])
+
     compare_all_rescaling_methods(working_data)
 
 
-    save_all_rescaled_datasets(working_data, OUTPUT_DIR)
+    save_all_rescaled_datasets(working_data, OUTPUT_DIR, INPUT_CSV)
 
     validate_rescaled_data_quality(working_data)
 
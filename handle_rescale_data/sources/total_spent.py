@@ -1,22 +1,29 @@
+import sys
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler
 
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
 OUTPUT_DIR = SCRIPT_DIR / '../output_data/total_spent'
 TOTAL_SPENT_COLUMN = 'Total Spent'
 
+# Shared helpers (dtype plan, validation, NumPy scalers, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.scalers import min_max_scale, robust_scale, standard_scale
+from pipeline.validation import correlation, display_validation_report, not_null, product_equals, validate_frame, value_range
+
 
 # Load the cleaned dataset from the missing data handling phase
-# Returns a copy of the dataframe ready for rescaling operations
+# Returns the dataframe ready for rescaling operations
 def load_cleaned_dataset_for_rescaling(input_csv_path):
-    original_dataframe = pd.read_csv(input_csv_path)
-    working_dataframe = original_dataframe.copy()
+    working_dataframe = pd.read_csv(input_csv_path)
 
 
     return working_dataframe
@@ -87,8 +94,7 @@ def analyze_total_spent_distribution_and_outliers(dataframe):
 # Returns dataframe with new 'TotalSpent_Normalized' column in range [0, 1]
 def apply_min_max_normalization_to_total_spent(dataframe):
     print("APPLYING MIN-MAX METHOD")
-    min_max_scaler = MinMaxScaler()
-    dataframe['TotalSpent_Normalized'] = min_max_scaler.fit_transform(dataframe[[TOTAL_SPENT_COLUMN]])
+    dataframe['TotalSpent_Normalized'] = min_max_scale(dataframe[TOTAL_SPENT_COLUMN])
 
     return dataframe
 
@@ -99,8 +105,7 @@ def apply_min_max_normalization_to_total_spent(dataframe):
 def apply_z_score_standardization_to_total_spent(dataframe):
     print("APPLYING Z-Score METHOD")
 
-    standard_scaler = StandardScaler()
-    dataframe['TotalSpent_Standardized'] = standard_scaler.fit_transform(dataframe[[TOTAL_SPENT_COLUMN]])
+    dataframe['TotalSpent_Standardized'] = standard_scale(dataframe[TOTAL_SPENT_COLUMN])
 
     return dataframe
 
@@ -111,8 +116,7 @@ def apply_z_score_standardization_to_total_spent(dataframe):
 def apply_robust_scaling_to_total_spent(dataframe):
     print("APPLYING Robust Scaling METHOD")
 
-    robust_scaler = RobustScaler()
-    dataframe['TotalSpent_Robust'] = robust_scaler.fit_transform(dataframe[[TOTAL_SPENT_COLUMN]])
+    dataframe['TotalSpent_Robust'] = robust_scale(dataframe[TOTAL_SPENT_COLUMN])
 
     return dataframe
 
@@ -218,75 +222,43 @@ def analyze_outlier_impact(dataframe, outlier_count, outliers):
 
 # Save all three rescaled datasets to separate CSV files
 # Creates output directory if needed and saves norm, std, robust versions
-def save_all_rescaled_datasets(dataframe, output_directory):
-    # Create output directory if it doesn't exist
+# With PIPELINE_WRITE_DELTA set the three share one delta of Transaction ID and the rescaled columns (see pipeline.deltas)
+def save_all_rescaled_datasets(dataframe, output_directory, base_csv_path):
     output_path = Path(output_directory)
-    output_path.mkdir(parents=True, exist_ok=True)
 
-    # Save all three versions
+    # Save all three versions (robust scaled version recommended)
     output_files = {
         'normalization': output_path / 'data_rescaling_norm_total_spent.csv',
         'standardization': output_path / 'data_rescaling_std_total_spent.csv',
         'robust': output_path / 'data_rescaling_robust_total_spent.csv'
     }
 
-    # Save normalized version
-    dataframe.to_csv(output_files['normalization'], index=False)
-
-    # Save standardized version
-    dataframe.to_csv(output_files['standardization'], index=False)
-
-    # Save robust scaled version (recommended)
-    dataframe.to_csv(output_files['robust'], index=False)
+    save_stage_output(dataframe, list(output_files.values()), base_csv_path)
 
 
 # Validate all rescaled columns for correctness and data integrity
-# Checks ranges, missing values, row count preservation, correlation, and mathematical consistency
+# Checks ranges, missing values, correlation, and mathematical consistency; reports spread statistics
 def validate_rescaled_data_quality(dataframe):
-    print("VALIDATION CHECKS")
-
-    # 1. Range validation
-    print("\n1. RANGE VALIDATION")
-    norm_in_range = (dataframe['TotalSpent_Normalized'] >= 0).all() and (dataframe['TotalSpent_Normalized'] <= 1).all()
-    print(f"Normalization in [0, 1]: {norm_in_range}")
-    print(f"Actual range: [{dataframe['TotalSpent_Normalized'].min():.6f}, {dataframe['TotalSpent_Normalized'].max():.6f}]")
+    # range, missing values, correlation with the original and Total Spent = Price Per Unit x Quantity, in one pass
+    report = validate_frame(dataframe, [
+        value_range('TotalSpent_Normalized', 0, 1, name="Normalization in [0, 1]"),
+        value_range('TotalSpent_Standardized', name="Standardization range"),
+        value_range('TotalSpent_Robust', name="Robust scaling range"),
+        not_null(['TotalSpent_Normalized', 'TotalSpent_Standardized', 'TotalSpent_Robust'], name="No missing rescaled values"),
+        correlation(TOTAL_SPENT_COLUMN, 'TotalSpent_Normalized', name="Normalization correlation = 1"),
+        correlation(TOTAL_SPENT_COLUMN, 'TotalSpent_Standardized', name="Standardization correlation = 1"),
+        correlation(TOTAL_SPENT_COLUMN, 'TotalSpent_Robust', name="Robust correlation = 1"),
+        product_equals(TOTAL_SPENT_COLUMN, 'Price Per Unit', 'Quantity', tolerance=1e-5),
+    ])
+    display_validation_report(report)
 
     std_range = dataframe['TotalSpent_Standardized'].abs().quantile(0.997)
     print(f"Standardization ~99.7% within [-3, 3]: {std_range:.4f}")
-    print(f"Actual range: [{dataframe['TotalSpent_Standardized'].min():.4f}, {dataframe['TotalSpent_Standardized'].max():.4f}]")
-
-    robust_iqr = dataframe['TotalSpent_Robust'].quantile(0.75) - dataframe['TotalSpent_Robust'].quantile(0.25)
-    print(f"Robust Scaling IQR H 1: {robust_iqr:.6f}")
-    print(f"Median: {dataframe['TotalSpent_Robust'].median():.6f}")
-
-    # 2. Missing values check
-    print("\n2. MISSING VALUES CHECK")
-    print(f"Normalized missing: {dataframe['TotalSpent_Normalized'].isna().sum()}")
-    print(f"Standardized missing: {dataframe['TotalSpent_Standardized'].isna().sum()}")
-    print(f"Robust missing: {dataframe['TotalSpent_Robust'].isna().sum()}")
-
-    # 3. Correlation with original
-    print("\n3. CORRELATION WITH ORIGINAL (Should be 1.0)")
-    corr_norm = dataframe[TOTAL_SPENT_COLUMN].corr(dataframe['TotalSpent_Normalized'])
-    corr_std = dataframe[TOTAL_SPENT_COLUMN].corr(dataframe['TotalSpent_Standardized'])
-    corr_robust = dataframe[TOTAL_SPENT_COLUMN].corr(dataframe['TotalSpent_Robust'])
-
-    print(f"Normalization correlation: {corr_norm:.6f}")
-    print(f"Standardization correlation: {corr_std:.6f}")
-    print(f"Robust correlation: {corr_robust:.6f}")
-
-    # 4. Mathematical consistency (Total Spent = Quantity � Price Per Unit)
-    print("\n4. MATHEMATICAL CONSISTENCY CHECK")
-    if 'Quantity' in dataframe.columns and 'Price Per Unit' in dataframe.columns:
-        calculated_total = dataframe['Quantity'] * dataframe['Price Per Unit']
-        consistency_check = np.allclose(dataframe[TOTAL_SPENT_COLUMN], calculated_total, rtol=1e-5)
-        print(f"Total Spent = Quantity - Price Per Unit: {consistency_check}")
-
-        if not consistency_check:
-            max_diff = (dataframe[TOTAL_SPENT_COLUMN] - calculated_total).abs().max()
-            print(f"Maximum difference: ${max_diff:.6f}")
-    else:
-        print("Cannot verify (Quantity or Price Per Unit column not found)")
+
+    robust_quartiles = dataframe['TotalSpent_Robust'].quantile([0.25, 0.5, 0.75])
+    print(f"Robust Scaling IQR H 1: {robust_quartiles[0.75] - robust_quartiles[0.25]:.6f}")
+    print(f"Median: {robust_quartiles[0.5]:.6f}")
+
 
 
 def main():
@@ -300,12 +272,15 @@ def main():
     working_data = apply_z_score_standardization_to_total_spent(working_data)
     working_data = apply_robust_scaling_to_total_spent(working_data)
 
+    # Store the scaled columns as float32 (see pipeline.dtype_plan)
+    working_data = apply_dtype_plan(working_data, columns=['TotalSpent_Normalized', 'TotalSpent_Standardized', 'TotalSpent_Robust'])
+
     compare_all_rescaling_methods(working_data)
 
     analyze_outlier_impact(working_data, outlier_count, outliers)
 
 
-    save_all_rescaled_datasets(working_data, OUTPUT_DIR)
+    save_all_rescaled_datasets(working_data, OUTPUT_DIR, INPUT_CSV)
 
     validate_rescaled_data_quality(working_data)
 
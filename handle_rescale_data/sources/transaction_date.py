@@ -27,6 +27,7 @@ Why Min-Max for Transaction Date?
 - Preserves chronological ordering and relative temporal distances
 """
 
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -34,12 +35,21 @@ from pathlib import Path
 
 # Configuration - use paths relative to this script's location
 SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
 INPUT_CSV = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
 OUTPUT_DIR = SCRIPT_DIR / '../output_data/transaction_date'
 DATE_COLUMN = 'Transaction Date'
 DATE_NUMERIC_COLUMN = 'Transaction Date Numeric'
 DATE_SCALED_COLUMN = 'Transaction Date Scaled'
 
+# Shared helpers (dtype plan, validation, delta outputs) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.deltas import save_stage_output
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.validation import correlation, not_null, report_result, validate_frame, value_range
+
 
 def convert_date_to_unix_timestamp(date_series: pd.Series) -> pd.Series:
     """
@@ -51,7 +61,7 @@ def convert_date_to_unix_timestamp(date_series: pd.Series) -> pd.Series:
     Returns:
         Pandas Series with Unix timestamps (int64 seconds)
     """
-    return pd.to_datetime(date_series).astype(np.int64) // 10**9
+    return pd.to_datetime(date_series).astype('datetime64[s]').astype(np.int64)
 
 
 def min_max_normalize(numeric_series: pd.Series) -> pd.Series:
@@ -87,34 +97,25 @@ def validate_scaled_date(
     Returns:
         Dictionary with validation results
     """
-    results = {}
-
-    # 1. Range check: all values in [0, 1]
-    results['range_check'] = (scaled_series.min() >= 0) and (scaled_series.max() <= 1)
-    results['min_value'] = scaled_series.min()
-    results['max_value'] = scaled_series.max()
-
-    # 2. No missing values
-    results['no_missing'] = scaled_series.isna().sum() == 0
-    results['nan_count'] = scaled_series.isna().sum()
-
-    # 3. No infinite values
-    results['no_infinite'] = np.isfinite(scaled_series).all()
-
-    # 4. Chronological order preserved (perfect correlation)
-    results['correlation'] = numeric_series.corr(scaled_series)
-    results['order_preserved'] = results['correlation'] == 1.0
-
-    # 5. Row count unchanged
-    results['row_count'] = len(scaled_series)
+    # Range, missing/infinite values and chronological order, checked in one pass
+    checked = pd.DataFrame({'numeric': numeric_series, 'scaled': scaled_series})
+    report = validate_frame(checked, [
+        value_range('scaled', 0, 1, name='range_check'),
+        not_null(['scaled'], name='no_missing'),
+        not_null(['scaled'], finite=True, name='no_infinite'),
+        correlation('numeric', 'scaled', name='order_preserved'),
+    ])
+
+    results = {name: report_result(report, name)['violations'] == 0
+               for name in ('range_check', 'no_missing', 'no_infinite', 'order_preserved')}
+    results['min_value'] = report_result(report, 'range_check')['detail']['minimum']
+    results['max_value'] = report_result(report, 'range_check')['detail']['maximum']
+    results['nan_count'] = report_result(report, 'no_missing')['violations']
+    results['correlation'] = report_result(report, 'order_preserved')['detail']['correlation']
+    results['row_count'] = report['rows']
 
     # Overall pass
-    results['all_passed'] = (
-        results['range_check'] and
-        results['no_missing'] and
-        results['no_infinite'] and
-        results['order_preserved']
-    )
+    results['all_passed'] = report['passed']
 
     return results
 
@@ -179,8 +180,10 @@ def process_transaction_date_rescaling(
 
     # Step 5: Save output
     print(f"\n[5/6] Saving output to: {output_csv}")
-    output_csv.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_csv, index=False)
+    # Store the scaled date as float32 (see pipeline.dtype_plan)
+    df = apply_dtype_plan(df, columns=[date_scaled_col])
+    # With PIPELINE_WRITE_DELTA set only Transaction ID and the two new date columns are written (see pipeline.deltas)
+    save_stage_output(df, output_csv, input_csv)
     print(f"      Saved: {len(df)} rows, {len(df.columns)} columns")
 
     # Step 6: Summary
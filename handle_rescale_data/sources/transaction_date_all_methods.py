@@ -10,15 +10,23 @@ This script implements all three rescaling methods for Transaction Date:
 Then generates comprehensive analysis to determine the best method.
 """
 
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
+from pathlib import Path
 
-# Set style for better visualizations
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (15, 10)
+# Paths are relative to this script, so it runs from any working directory
+SCRIPT_DIR = Path(__file__).parent
+REPO_ROOT = (SCRIPT_DIR / '../..').resolve()
+INPUT_CSV = SCRIPT_DIR / '../../handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv'
+OUTPUT_DIR = SCRIPT_DIR / '../output_data/transaction_date'
+VISUALIZATION_PATH = SCRIPT_DIR / '../docs/transaction_date/transaction_date_all_methods_comparison.png'
+
+# Shared helpers (headless switch) live in the repository-level pipeline package
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.headless import is_headless
 
 # ============================================================================
 # STEP 1: Load Dataset and Convert Transaction Date to Numeric
@@ -29,7 +37,7 @@ print("TRANSACTION DATE RESCALING - ALL METHODS COMPARISON")
 print("="*80)
 
 # Load the cleaned dataset (BEFORE encoding, as per NUMERICAL_RESCALING_ANALYSIS.md)
-input_file = "handle_missing_data/output_data/4_discount_applied/final_cleaned_dataset.csv"
+input_file = INPUT_CSV
 df = pd.read_csv(input_file)
 
 print(f"\n[1] Dataset Loaded: {len(df)} rows")
@@ -39,7 +47,7 @@ print(f"    Source: {input_file}")
 df['Transaction Date'] = pd.to_datetime(df['Transaction Date'])
 
 # Convert to Unix timestamp (seconds since 1970-01-01)
-df['Transaction_Date_Numeric'] = df['Transaction Date'].astype(np.int64) // 10**9
+df['Transaction_Date_Numeric'] = df['Transaction Date'].astype('datetime64[s]').astype(np.int64)
 
 print(f"\n[2] Transaction Date Conversion:")
 print(f"    Original format: String (YYYY-MM-DD)")
@@ -150,71 +158,83 @@ print("\n" + "="*80)
 print("CREATING VISUALIZATIONS")
 print("="*80)
 
-fig, axes = plt.subplots(3, 2, figsize=(16, 12))
-fig.suptitle('Transaction Date Rescaling Methods Comparison', fontsize=16, fontweight='bold')
-
-# Row 1: Histograms
-axes[0, 0].hist(df['TD_Normalized'], bins=50, color='skyblue', edgecolor='black', alpha=0.7)
-axes[0, 0].set_title('Min-Max Normalization\nDistribution', fontweight='bold')
-axes[0, 0].set_xlabel('Normalized Value [0, 1]')
-axes[0, 0].set_ylabel('Frequency')
-axes[0, 0].axvline(df['TD_Normalized'].mean(), color='red', linestyle='--', label=f'Mean: {df["TD_Normalized"].mean():.3f}')
-axes[0, 0].legend()
-
-axes[0, 1].hist(df['TD_Standardized'], bins=50, color='lightcoral', edgecolor='black', alpha=0.7)
-axes[0, 1].set_title('Z-Score Standardization\nDistribution', fontweight='bold')
-axes[0, 1].set_xlabel('Standardized Value')
-axes[0, 1].set_ylabel('Frequency')
-axes[0, 1].axvline(df['TD_Standardized'].mean(), color='red', linestyle='--', label=f'Mean: {df["TD_Standardized"].mean():.3e}')
-axes[0, 1].legend()
-
-# Row 2: Box plots
-axes[1, 0].boxplot([df['TD_Normalized'], df['TD_Standardized'], df['TD_Robust']],
-                    labels=['Normalized', 'Standardized', 'Robust'],
-                    patch_artist=True,
-                    boxprops=dict(facecolor='lightgreen', alpha=0.7))
-axes[1, 0].set_title('Box Plot Comparison', fontweight='bold')
-axes[1, 0].set_ylabel('Scaled Value')
-axes[1, 0].grid(True, alpha=0.3)
-
-axes[1, 1].hist(df['TD_Robust'], bins=50, color='lightgreen', edgecolor='black', alpha=0.7)
-axes[1, 1].set_title('Robust Scaling\nDistribution', fontweight='bold')
-axes[1, 1].set_xlabel('Robust Scaled Value')
-axes[1, 1].set_ylabel('Frequency')
-axes[1, 1].axvline(df['TD_Robust'].median(), color='red', linestyle='--', label=f'Median: {df["TD_Robust"].median():.3e}')
-axes[1, 1].legend()
-
-# Row 3: Time series plots
-sample_size = min(500, len(df))
-sample_indices = np.random.choice(df.index, size=sample_size, replace=False)
-sample_df = df.loc[sample_indices].sort_values('Transaction Date')
-
-axes[2, 0].scatter(sample_df['Transaction Date'], sample_df['TD_Normalized'],
-                   alpha=0.5, s=10, color='blue', label='Normalized')
-axes[2, 0].set_title('Min-Max Normalization Over Time', fontweight='bold')
-axes[2, 0].set_xlabel('Transaction Date')
-axes[2, 0].set_ylabel('Normalized Value [0, 1]')
-axes[2, 0].tick_params(axis='x', rotation=45)
-axes[2, 0].grid(True, alpha=0.3)
-
-# Comparison of all three methods over time
-axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Normalized'],
-                   alpha=0.4, s=10, color='blue', label='Normalized [0,1]')
-axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Standardized'],
-                   alpha=0.4, s=10, color='red', label='Standardized')
-axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Robust'],
-                   alpha=0.4, s=10, color='green', label='Robust')
-axes[2, 1].set_title('All Methods Comparison Over Time', fontweight='bold')
-axes[2, 1].set_xlabel('Transaction Date')
-axes[2, 1].set_ylabel('Scaled Value')
-axes[2, 1].tick_params(axis='x', rotation=45)
-axes[2, 1].legend()
-axes[2, 1].grid(True, alpha=0.3)
-
-plt.tight_layout()
-output_viz_path = "handle_rescale_data/docs/transaction_date/transaction_date_all_methods_comparison.png"
-plt.savefig(output_viz_path, dpi=300, bbox_inches='tight')
-print(f"\n✓ Visualization saved: {output_viz_path}")
+# Plotting libraries are imported only when plots are drawn (see pipeline.headless)
+if is_headless():
+    print("\nSkipped (PIPELINE_HEADLESS is set)")
+else:
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Set style for better visualizations
+    sns.set_style("whitegrid")
+    plt.rcParams['figure.figsize'] = (15, 10)
+
+    fig, axes = plt.subplots(3, 2, figsize=(16, 12))
+    fig.suptitle('Transaction Date Rescaling Methods Comparison', fontsize=16, fontweight='bold')
+
+    # Row 1: Histograms
+    axes[0, 0].hist(df['TD_Normalized'], bins=50, color='skyblue', edgecolor='black', alpha=0.7)
+    axes[0, 0].set_title('Min-Max Normalization\nDistribution', fontweight='bold')
+    axes[0, 0].set_xlabel('Normalized Value [0, 1]')
+    axes[0, 0].set_ylabel('Frequency')
+    axes[0, 0].axvline(df['TD_Normalized'].mean(), color='red', linestyle='--', label=f'Mean: {df["TD_Normalized"].mean():.3f}')
+    axes[0, 0].legend()
+
+    axes[0, 1].hist(df['TD_Standardized'], bins=50, color='lightcoral', edgecolor='black', alpha=0.7)
+    axes[0, 1].set_title('Z-Score Standardization\nDistribution', fontweight='bold')
+    axes[0, 1].set_xlabel('Standardized Value')
+    axes[0, 1].set_ylabel('Frequency')
+    axes[0, 1].axvline(df['TD_Standardized'].mean(), color='red', linestyle='--', label=f'Mean: {df["TD_Standardized"].mean():.3e}')
+    axes[0, 1].legend()
+
+    # Row 2: Box plots
+    axes[1, 0].boxplot([df['TD_Normalized'], df['TD_Standardized'], df['TD_Robust']],
+                        patch_artist=True,
+                        boxprops=dict(facecolor='lightgreen', alpha=0.7))
+    # Tick labels set separately: boxplot's labels= argument was renamed tick_labels= in matplotlib 3.9
+    axes[1, 0].set_xticks([1, 2, 3], ['Normalized', 'Standardized', 'Robust'])
+    axes[1, 0].set_title('Box Plot Comparison', fontweight='bold')
+    axes[1, 0].set_ylabel('Scaled Value')
+    axes[1, 0].grid(True, alpha=0.3)
+
+    axes[1, 1].hist(df['TD_Robust'], bins=50, color='lightgreen', edgecolor='black', alpha=0.7)
+    axes[1, 1].set_title('Robust Scaling\nDistribution', fontweight='bold')
+    axes[1, 1].set_xlabel('Robust Scaled Value')
+    axes[1, 1].set_ylabel('Frequency')
+    axes[1, 1].axvline(df['TD_Robust'].median(), color='red', linestyle='--', label=f'Median: {df["TD_Robust"].median():.3e}')
+    axes[1, 1].legend()
+
+    # Row 3: Time series plots
+    sample_size = min(500, len(df))
+    sample_indices = np.random.choice(df.index, size=sample_size, replace=False)
+    sample_df = df.loc[sample_indices].sort_values('Transaction Date')
+
+    axes[2, 0].scatter(sample_df['Transaction Date'], sample_df['TD_Normalized'],
+                       alpha=0.5, s=10, color='blue', label='Normalized')
+    axes[2, 0].set_title('Min-Max Normalization Over Time', fontweight='bold')
+    axes[2, 0].set_xlabel('Transaction Date')
+    axes[2, 0].set_ylabel('Normalized Value [0, 1]')
+    axes[2, 0].tick_params(axis='x', rotation=45)
+    axes[2, 0].grid(True, alpha=0.3)
+
+    # Comparison of all three methods over time
+    axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Normalized'],
+                       alpha=0.4, s=10, color='blue', label='Normalized [0,1]')
+    axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Standardized'],
+                       alpha=0.4, s=10, color='red', label='Standardized')
+    axes[2, 1].scatter(sample_df['Transaction Date'], sample_df['TD_Robust'],
+                       alpha=0.4, s=10, color='green', label='Robust')
+    axes[2, 1].set_title('All Methods Comparison Over Time', fontweight='bold')
+    axes[2, 1].set_xlabel('Transaction Date')
+    axes[2, 1].set_ylabel('Scaled Value')
+    axes[2, 1].tick_params(axis='x', rotation=45)
+    axes[2, 1].legend()
+    axes[2, 1].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    output_viz_path = VISUALIZATION_PATH
+    plt.savefig(output_viz_path, dpi=300, bbox_inches='tight')
+    print(f"\n✓ Visualization saved: {output_viz_path}")
 
 # ============================================================================
 # STEP 6: Interpretability Analysis
@@ -292,37 +312,34 @@ print("SAVING OUTPUTS")
 print("="*80)
 
 # Save individual method outputs
-output_base = "handle_rescale_data/output_data/transaction_date/"
+output_base = OUTPUT_DIR
 
 # Method 1: Normalization
-df_norm = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Normalized']].copy()
-df_norm.rename(columns={'TD_Normalized': 'Transaction_Date_Scaled'}, inplace=True)
-output_norm = output_base + "data_rescaling_norm_transaction_date.csv"
+df_norm = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Normalized']].rename(columns={'TD_Normalized': 'Transaction_Date_Scaled'})
+output_norm = output_base / "data_rescaling_norm_transaction_date.csv"
 df_norm.to_csv(output_norm, index=False)
 print(f"\n✓ Normalization output: {output_norm}")
 
 # Method 2: Standardization
-df_std = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Standardized']].copy()
-df_std.rename(columns={'TD_Standardized': 'Transaction_Date_Scaled'}, inplace=True)
-output_std = output_base + "data_rescaling_std_transaction_date.csv"
+df_std = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Standardized']].rename(columns={'TD_Standardized': 'Transaction_Date_Scaled'})
+output_std = output_base / "data_rescaling_std_transaction_date.csv"
 df_std.to_csv(output_std, index=False)
 print(f"✓ Standardization output: {output_std}")
 
 # Method 3: Robust
-df_robust = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Robust']].copy()
-df_robust.rename(columns={'TD_Robust': 'Transaction_Date_Scaled'}, inplace=True)
-output_robust = output_base + "data_rescaling_robust_transaction_date.csv"
+df_robust = df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric', 'TD_Robust']].rename(columns={'TD_Robust': 'Transaction_Date_Scaled'})
+output_robust = output_base / "data_rescaling_robust_transaction_date.csv"
 df_robust.to_csv(output_robust, index=False)
 print(f"✓ Robust scaling output: {output_robust}")
 
 # Save comparison dataset
-comparison_output = output_base + "transaction_date_all_methods_comparison.csv"
+comparison_output = output_base / "transaction_date_all_methods_comparison.csv"
 df[['Transaction ID', 'Transaction Date', 'Transaction_Date_Numeric',
     'TD_Normalized', 'TD_Standardized', 'TD_Robust']].to_csv(comparison_output, index=False)
 print(f"✓ Comparison dataset: {comparison_output}")
 
 # Save statistical comparison
-stats_output = output_base + "statistical_comparison.csv"
+stats_output = output_base / "statistical_comparison.csv"
 comparison_stats.to_csv(stats_output, index=False)
 print(f"✓ Statistical comparison: {stats_output}")
 
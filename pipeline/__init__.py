@@ -0,0 +1,22 @@
+"""
+Pipeline tooling for the CP610 transaction dataset
+
+Shared helpers that drive the stage scripts under submission/sources
+(missing data -> encoding -> combine -> rescale) from Python instead of
+invoking each script by hand. Run the whole pipeline with python -m pipeline.
+
+Importing the package turns on pandas Copy-on-Write (enable_copy_on_write),
+so every script that imports a pipeline helper runs under it.
+"""
+
+import pandas as pd
+
+
+# Copy-on-Write: selections and filters share memory with their parent until written to
+# (always enabled from pandas 3.0, opt-in on older versions)
+def enable_copy_on_write():
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+enable_copy_on_write()
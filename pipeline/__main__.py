@@ -0,0 +1,352 @@
+"""
+Pipeline Command-Line Interface
+
+Runs the submission pipeline (missing data -> encoding -> combine -> rescale)
+as one command instead of fifteen scripts started by hand. The stage graph
+comes from pipeline.stages: a stage depends on the stages that write the
+files it reads.
+
+  missing_total_spent -> missing_price_per_unit -> missing_item -> missing_discount_applied
+      -> encode_customer_id, encode_item, encode_category, encode_location,
+         encode_payment_method, encode_discount_applied -> combine_all
+      -> rescale_transaction_date, rescale_quantity, rescale_price_per_unit, rescale_total_spent
+
+Options:
+  --stages    stage names or phases (missing, encoding, combine, rescale); default: every stage.
+              Upstream stages are added when their outputs are missing (with --cache: always,
+              and skipped again when up to date).
+  --jobs N    run up to N independent stages at the same time, each in its own process
+  --cache     skip a stage when its script, the pipeline package and its input files are
+              unchanged since its last successful run and its outputs are untouched
+              (fingerprints in output/.stage_cache.json)
+  --format    summary as an aligned table or as JSON
+  --profile   record per-step timings (pipeline.instrumentation) and list the slowest steps
+  --delta     encoders and rescalers write only Transaction ID plus the columns they add
+              (pipeline.deltas); the summary lists the bytes every stage wrote
+  --sample F  run on a stratified sample (missingness pattern x Category) of a fraction F of the
+              submission dataset, written to the workdir's datasource/, and report how far its
+              missing rates, category mix, encoding means and scaler parameters are from the
+              full run in submission/ (pipeline.sampling)
+
+A workdir without datasource/Deliverable1Dataset.csv gets a copy of the
+submission dataset first, so any empty directory can be used as --workdir.
+
+Every stage runs headless (no plots) in a fresh interpreter, so peak RSS
+belongs to that stage alone. The exit status is 1 when a stage fails.
+
+Usage:
+    python -m pipeline
+    python -m pipeline --stages rescale --cache --jobs 4
+    python -m pipeline --stages encode_item combine_all --workdir /tmp/run --profile --format json
+    python -m pipeline --workdir /tmp/run --delta
+    python -m pipeline --workdir /tmp/sample --sample 0.1 --sample-seed 7
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from pipeline.deltas import DELTA_VARIABLE, output_exists, stage_output_files, write_delta_enabled
+from pipeline.headless import HEADLESS_VARIABLE
+from pipeline.sampling import DEFAULT_SEED, compare_statistics, dataset_statistics, format_comparison, write_raw_sample
+from pipeline.stages import RAW_DATASET, REPO_ROOT, SOURCES_DIR, STAGES, STAGES_BY_NAME, SUBMISSION_DIR, stage_dependencies, stage_inputs
+
+
+PHASES = ('missing', 'encoding', 'combine', 'rescale')
+SUMMARY_FORMATS = ('table', 'json')
+CACHE_FILE = 'output/.stage_cache.json'
+PIPELINE_DIR = REPO_ROOT / 'pipeline'
+
+# Steps listed per stage in the --profile summary
+PROFILE_TOP_STEPS = 3
+
+
+# Expand stage names and phase names into stage names, in execution order
+# Raises KeyError for names that are neither
+def resolve_stage_names(names):
+    requested = set()
+
+    for name in names:
+        if name in PHASES:
+            requested.update(stage['name'] for stage in STAGES if stage['phase'] == name)
+        elif name in STAGES_BY_NAME:
+            requested.add(name)
+        else:
+            raise KeyError(f'Unknown stage or phase {name!r}; expected one of {list(PHASES) + list(STAGES_BY_NAME)}')
+
+    return [stage['name'] for stage in STAGES if stage['name'] in requested]
+
+
+# Add the upstream stages the requested ones need
+# Without the cache an upstream stage is only added when one of its outputs is missing;
+# with the cache every upstream stage is added and skipped at run time when it is up to date
+# Returns stage names in execution order
+def plan_stages(requested, workdir, use_cache):
+    planned = set(requested)
+    queue = list(requested)
+
+    while queue:
+        for dependency in stage_dependencies(STAGES_BY_NAME[queue.pop()]):
+            if dependency in planned:
+                continue
+            outputs_missing = any(not output_exists(workdir / output) for output in STAGES_BY_NAME[dependency]['outputs'])
+            if use_cache or outputs_missing:
+                planned.add(dependency)
+                queue.append(dependency)
+
+    return [stage['name'] for stage in STAGES if stage['name'] in planned]
+
+
+# SHA-256 of a file's content
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+# Digest of the pipeline package sources, which every stage script imports helpers from
+def pipeline_code_digest():
+    digest = hashlib.sha256()
+    for source_path in sorted(PIPELINE_DIR.glob('*.py')):
+        digest.update(source_path.name.encode())
+        digest.update(file_digest(source_path).encode())
+
+    return digest.hexdigest()
+
+
+# Digest of the files holding an output, wide or delta (see pipeline.deltas)
+def output_file_digest(output_path):
+    files = stage_output_files(output_path)
+    if not files:
+        raise FileNotFoundError(f'{output_path} exists neither as a wide file nor as a delta')
+
+    return '+'.join(file_digest(path) for path in files)
+
+
+# Fingerprint of everything a stage's outputs depend on: its script, the pipeline package, its input files
+# and whether it writes deltas
+def stage_fingerprint(stage, workdir, code_digest, delta=False):
+    digest = hashlib.sha256()
+    digest.update(code_digest.encode())
+    digest.update(file_digest(SOURCES_DIR / stage['script']).encode())
+    digest.update(b'delta' if delta else b'wide')
+    for relative_path in stage_inputs(stage):
+        digest.update(relative_path.encode())
+        digest.update(output_file_digest(workdir / relative_path).encode())
+
+    return digest.hexdigest()
+
+
+def load_cache(workdir):
+    cache_path = workdir / CACHE_FILE
+    return json.loads(cache_path.read_text()) if cache_path.exists() else {}
+
+
+def save_cache(workdir, cache):
+    cache_path = workdir / CACHE_FILE
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps(cache, indent=2))
+
+
+# Digests of a stage's outputs, or None when one of them is missing
+def output_digests(stage, workdir):
+    if any(not output_exists(workdir / output) for output in stage['outputs']):
+        return None
+    return {output: output_file_digest(workdir / output) for output in stage['outputs']}
+
+
+# Whether a cache entry still describes the stage: same fingerprint and untouched outputs
+def cache_hit(entry, stage, workdir, fingerprint):
+    return entry is not None and entry['fingerprint'] == fingerprint and entry['outputs'] == output_digests(stage, workdir)
+
+
+# Run one stage in a child interpreter through pipeline.stages and read back its metrics report
+# Returns the metrics dictionary, with 'error' set when the stage failed
+def run_stage_process(stage_name, workdir, report_dir, profile=False, delta=False):
+    report_path = report_dir / f'{stage_name}.json'
+    command = [sys.executable, '-m', 'pipeline.stages', stage_name, '--workdir', str(workdir), '--report', str(report_path)]
+    if profile:
+        command.append('--trace')
+
+    environment = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')])))
+    environment.setdefault(HEADLESS_VARIABLE, '1')
+    environment[DELTA_VARIABLE] = '1' if delta else '0'
+    completed = subprocess.run(command, cwd=REPO_ROOT, env=environment, capture_output=True, text=True)
+
+    if completed.returncode != 0:
+        return {'stage': stage_name, 'error': (completed.stderr.strip().splitlines() or ['unknown error'])[-1]}
+
+    return json.loads(report_path.read_text())
+
+
+# Run one stage unless the cache says it is up to date (called on a worker thread)
+# Returns result dictionary with status 'ran', 'cached' or 'failed', plus the new cache entry when it ran
+def execute_stage(stage_name, workdir, report_dir, cache_entry, code_digest, profile, delta=False):
+    stage = STAGES_BY_NAME[stage_name]
+    start = time.perf_counter()
+
+    fingerprint = None
+    if code_digest is not None:
+        fingerprint = stage_fingerprint(stage, workdir, code_digest, delta)
+        if cache_hit(cache_entry, stage, workdir, fingerprint):
+            return {'stage': stage_name, 'status': 'cached', 'wall_seconds': time.perf_counter() - start}
+
+    metrics = run_stage_process(stage_name, workdir, report_dir, profile, delta)
+    if 'error' in metrics:
+        return {'stage': stage_name, 'status': 'failed', 'wall_seconds': time.perf_counter() - start, 'error': metrics['error']}
+
+    result = dict(metrics, status='ran')
+    if fingerprint is not None:
+        result['cache_entry'] = {'fingerprint': fingerprint, 'outputs': output_digests(stage, workdir)}
+
+    return result
+
+
+# Run the planned stages, up to jobs at a time, each as soon as the stages it depends on have finished
+# Stages downstream of a failure are skipped; with use_cache the cache file is updated after every stage
+# With delta set, encoders and rescalers write delta outputs (see pipeline.deltas)
+# Returns list of result dictionaries in execution order
+def run_pipeline(stage_names, workdir, jobs=1, use_cache=False, profile=False, delta=False):
+    workdir = Path(workdir)
+    cache = load_cache(workdir) if use_cache else {}
+    code_digest = pipeline_code_digest() if use_cache else None
+
+    results = {}
+    pending = list(stage_names)
+
+    with tempfile.TemporaryDirectory(prefix='pipeline_reports_') as report_dir, ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = {}
+
+        while pending or running:
+            for stage_name in list(pending):
+                dependencies = [name for name in stage_dependencies(STAGES_BY_NAME[stage_name]) if name in stage_names]
+                if any(results.get(name, {}).get('status') in ('failed', 'skipped') for name in dependencies):
+                    results[stage_name] = {'stage': stage_name, 'status': 'skipped', 'wall_seconds': 0.0}
+                    pending.remove(stage_name)
+                elif all(name in results for name in dependencies) and len(running) < jobs:
+                    future = executor.submit(execute_stage, stage_name, workdir, Path(report_dir), cache.get(stage_name), code_digest,
+                                             profile, delta)
+                    running[future] = stage_name
+                    pending.remove(stage_name)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                results[running.pop(future)] = result
+
+                if 'cache_entry' in result:
+                    cache[result['stage']] = result.pop('cache_entry')
+                    save_cache(workdir, cache)
+
+    return [results[stage_name] for stage_name in stage_names]
+
+
+# Slowest top-level steps of a profiled stage
+def slowest_steps(result, count=PROFILE_TOP_STEPS):
+    steps = [step for step in result.get('steps', []) if step['depth'] == 0]
+    return sorted(steps, key=lambda step: step['wall_seconds'], reverse=True)[:count]
+
+
+# Per-stage timing summary as aligned text
+def format_summary_table(results, total_seconds):
+    lines = [f"{'stage':28s} {'status':8s} {'wall s':>8s} {'cpu s':>8s} {'peak MB':>9s} {'rows out':>10s} {'KB out':>9s}"]
+
+    for result in results:
+        if result['status'] == 'ran':
+            lines.append(f"{result['stage']:28s} {result['status']:8s} {result['wall_seconds']:8.2f} {result['cpu_seconds']:8.2f} "
+                         f"{result['peak_rss_mb']:9.1f} {result['rows_out']:10d} {result['bytes_out'] / 1024:9.1f}")
+            for step in slowest_steps(result):
+                lines.append(f"{'':4s}{step['function']:40s} {step['wall_seconds']:8.3f}s")
+        else:
+            lines.append(f"{result['stage']:28s} {result['status']:8s} {result['wall_seconds']:8.2f}")
+            if 'error' in result:
+                lines.append(f"{'':4s}{result['error']}")
+
+    bytes_out = sum(result['bytes_out'] for result in results if result['status'] == 'ran')
+    lines.append(f"{'total':28s} {'':8s} {total_seconds:8.2f} {'':8s} {'':9s} {'':10s} {bytes_out / 1024:9.1f}")
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m pipeline', description='Run the missing -> encoding -> combine -> rescale pipeline.')
+    parser.add_argument('--stages', nargs='+', default=list(PHASES), metavar='STAGE',
+                        help=f'stage names or phases ({", ".join(PHASES)}); default: every stage')
+    parser.add_argument('--workdir', type=Path, default=SUBMISSION_DIR,
+                        help='directory holding datasource/ and output/ (default: submission/)')
+    parser.add_argument('--jobs', type=int, default=1, help='independent stages run at the same time (default: 1)')
+    parser.add_argument('--cache', action='store_true', help='skip stages whose script, code and inputs are unchanged')
+    parser.add_argument('--format', choices=SUMMARY_FORMATS, default='table', dest='summary_format', help='summary format (default: table)')
+    parser.add_argument('--profile', action='store_true', help='record per-step timings of every stage')
+    parser.add_argument('--delta', action='store_true',
+                        help='encoders and rescalers write only the columns they add (default: on when PIPELINE_WRITE_DELTA is set)')
+    parser.add_argument('--sample', type=float, metavar='FRACTION',
+                        help='run on a stratified sample of this share of the submission dataset and compare it with the full run')
+    parser.add_argument('--sample-seed', type=int, default=DEFAULT_SEED, help=f'random seed of --sample (default: {DEFAULT_SEED})')
+    arguments = parser.parse_args()
+
+    if arguments.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if arguments.sample is not None:
+        if not 0 < arguments.sample <= 1:
+            parser.error('--sample must be in (0, 1]')
+        if arguments.workdir.resolve() == SUBMISSION_DIR.resolve():
+            parser.error('--sample would overwrite the submission dataset; pass another --workdir')
+    try:
+        requested = resolve_stage_names(arguments.stages)
+    except KeyError as error:
+        parser.error(error.args[0])
+
+    if arguments.sample is not None:
+        strata_table = write_raw_sample(SUBMISSION_DIR / RAW_DATASET, arguments.workdir / RAW_DATASET, arguments.sample, arguments.sample_seed)
+        if arguments.summary_format == 'table':
+            print(f"Sampled {strata_table['sample'].sum()} of {strata_table['population'].sum()} rows "
+                  f"from {len(strata_table)} strata (missingness pattern x Category)")
+    elif not (arguments.workdir / RAW_DATASET).exists():
+        (arguments.workdir / RAW_DATASET).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(SUBMISSION_DIR / RAW_DATASET, arguments.workdir / RAW_DATASET)
+        if arguments.summary_format == 'table':
+            print(f'Copied the submission dataset to {arguments.workdir / RAW_DATASET}')
+
+    stage_names = plan_stages(requested, arguments.workdir, arguments.cache)
+
+    start = time.perf_counter()
+    results = run_pipeline(stage_names, arguments.workdir, arguments.jobs, arguments.cache, arguments.profile,
+                           arguments.delta or write_delta_enabled())
+    total_seconds = time.perf_counter() - start
+
+    comparison = None
+    if arguments.sample is not None:
+        comparison = compare_statistics(dataset_statistics(SUBMISSION_DIR), dataset_statistics(arguments.workdir))
+
+    if arguments.summary_format == 'json':
+        summary = {'workdir': str(arguments.workdir), 'jobs': arguments.jobs, 'total_seconds': total_seconds, 'stages': results}
+        if comparison is not None:
+            summary['sample'] = {'fraction': arguments.sample, 'seed': arguments.sample_seed, 'comparison': comparison}
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_summary_table(results, total_seconds))
+        if comparison is not None:
+            print()
+            print(format_comparison(comparison))
+
+    if any(result['status'] in ('failed', 'skipped') for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
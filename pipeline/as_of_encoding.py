@@ -0,0 +1,293 @@
+"""
+As-Of Target Encoding
+
+The Customer ID encoding (leave-one-out over all rows) and the Item encoding
+(2-fold) both use transactions dated after a row to encode it, which leaks
+when a model is trained and validated on time-ordered data. The as-of
+encoder only looks back:
+
+  encoding = (S + m * prior) / (C + m)
+
+  S, C   sum and count of Total Spent of the key's transactions dated strictly
+         before the row's Transaction Date (same-day rows never see each other)
+  prior  as-of global mean: mean Total Spent of every transaction dated
+         before the row; initial_prior for rows of the first day
+  m      smoothing: rows with few earlier transactions lean towards the prior
+
+Offline, one sort by (key, day) and cumulative sums give S and C for every
+row (O(N log N)); the global prior comes from per-day totals (np.bincount).
+Online, the state keeps per key the totals up to and including its latest
+day and as of the start of that day, so a batch of new rows (dated no earlier
+than the newest day seen) is encoded with the same vectorized code seeded by
+the state. The offline encoder is that code run on an empty state.
+
+Sums are kept as whole multiples of resolution (cents for Total Spent) in
+int64, so they do not depend on the order rows are added in: online and
+offline encodings are bit-identical however the rows were batched.
+
+Usage:
+    python -m pipeline.as_of_encoding encode --output /tmp/as_of_encoded.csv --state /tmp/as_of_state.json
+    python -m pipeline.as_of_encoding update new_days.csv --state /tmp/as_of_state.json --output /tmp/new_encoded.csv
+    python -m pipeline.as_of_encoding check --batches 50
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import date_day_numbers
+from pipeline.out_of_core import CUSTOMER_ID, ITEM, TARGET, TRANSACTION_DATE, TRANSACTION_ID
+from pipeline.stages import CLEANED_DATASET, SUBMISSION_DIR
+from pipeline.windows import split_by_days
+
+
+STATE_FORMAT_VERSION = 1
+
+DEFAULT_COLUMNS = (CUSTOMER_ID, ITEM)
+DEFAULT_SMOOTHING = 10.0
+# Total Spent is an amount of money: sums are kept in whole cents
+DEFAULT_RESOLUTION = 0.01
+
+# Day of a key (or the global totals) that has no rows yet
+NO_DAY = -(2 ** 62)
+
+
+# Name of the encoded column of a key column
+def encoded_column(column):
+    return f'{column} As-Of Encoded'
+
+
+# Empty encoder state: no key seen yet
+def new_encoder_state(smoothing=DEFAULT_SMOOTHING, initial_prior=np.nan, resolution=DEFAULT_RESOLUTION):
+    return {
+        'smoothing': float(smoothing),
+        'initial_prior': float(initial_prior),
+        'resolution': float(resolution),
+        # label -> [latest day, units before that day, count before that day, units in total, count in total]
+        'keys': {},
+        'global': [NO_DAY, 0, 0, 0, 0],
+    }
+
+
+# Target values as whole multiples of resolution
+# Raises ValueError for missing values or values off the grid
+def target_units(values, resolution):
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).any():
+        raise ValueError(f'{int(np.isnan(values).sum())} rows have no {TARGET}; drop them before encoding')
+
+    units = np.rint(values / resolution).astype(np.int64)
+    off_grid = np.abs(units * resolution - values) > resolution * 1e-6
+    if off_grid.any():
+        raise ValueError(f'{int(off_grid.sum())} {TARGET} values are not multiples of {resolution}')
+
+    return units
+
+
+# Per row, the units and count of the rows of the same group dated strictly earlier in this batch
+# One sort by (group, day); rows without a group (code -1) get zeros
+# Returns tuple of (units, counts, per group the row index of one of its latest-day rows)
+def earlier_day_totals(codes, days, units, group_count):
+    order = np.lexsort((days, codes))
+    sorted_codes, sorted_days = codes[order], days[order]
+    positions = np.arange(len(order))
+
+    # Inclusive cumulative sums with a leading zero, the first position of every group and of every (group, day) run
+    cumulative = np.concatenate([[0], np.cumsum(units[order])])
+    new_group = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    new_run = new_group | np.r_[True, sorted_days[1:] != sorted_days[:-1]]
+    group_first = np.maximum.accumulate(np.where(new_group, positions, 0))
+    run_first = np.maximum.accumulate(np.where(new_run, positions, 0))
+
+    earlier_units, earlier_counts = np.zeros(len(order), dtype=np.int64), np.zeros(len(order), dtype=np.int64)
+    earlier_units[order] = cumulative[run_first] - cumulative[group_first]
+    earlier_counts[order] = run_first - group_first
+
+    group_last = np.r_[sorted_codes[1:] != sorted_codes[:-1], True] & (sorted_codes != -1)
+    latest_rows = np.full(group_count, -1, dtype=np.int64)
+    latest_rows[sorted_codes[group_last]] = order[group_last]
+
+    grouped_rows = codes != -1
+    return np.where(grouped_rows, earlier_units, 0), np.where(grouped_rows, earlier_counts, 0), latest_rows
+
+
+# Smoothed encoding from as-of key totals and the as-of global totals
+def smoothed_encoding(key_units, key_counts, global_units, global_counts, state):
+    resolution, smoothing = state['resolution'], state['smoothing']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prior = np.where(global_counts > 0, (global_units * resolution) / global_counts, state['initial_prior'])
+        encoded = (key_units * resolution + smoothing * prior) / (key_counts + smoothing)
+
+    return np.where(key_counts + smoothing > 0, encoded, prior)
+
+
+# Encode a batch of rows with the state and add the batch to the state
+# Rows dated before the newest day already in the state are rejected (they would change emitted encodings)
+# Returns float64 array, one encoding per row
+def update_as_of_encoding(state, keys, days, target):
+    days = np.asarray(days, dtype=np.int64)
+    units = target_units(target, state['resolution'])
+    if not len(days):
+        return np.zeros(0)
+
+    global_day, global_before_units, global_before_count, global_units, global_count = state['global']
+    if days.min() < global_day:
+        raise ValueError(f'{int((days < global_day).sum())} rows are dated before the newest day already encoded; '
+                         f're-encode offline instead')
+
+    keys = pd.Series(keys)
+    codes, uniques = pd.factorize(keys)
+    labels = [str(label) for label in uniques]
+    seeds = np.array([state['keys'].get(label, [NO_DAY, 0, 0, 0, 0]) for label in labels] + [[NO_DAY, 0, 0, 0, 0]], dtype=np.int64)
+
+    # Key totals: state before / after the key's latest day, plus earlier days of this batch
+    earlier_units, earlier_counts, latest_rows = earlier_day_totals(codes, days, units, len(labels))
+    seed = seeds[codes]
+    after_seed_day = days > seed[:, 0]
+    key_units = np.where(after_seed_day, seed[:, 3], seed[:, 1]) + earlier_units
+    key_counts = np.where(after_seed_day, seed[:, 4], seed[:, 2]) + earlier_counts
+    key_units, key_counts = np.where(codes != -1, key_units, 0), np.where(codes != -1, key_counts, 0)
+
+    # Global totals: per-day sums of this batch, exclusive cumulative over days, seeded the same way
+    day_offsets = days - days.min()
+    day_units = np.bincount(day_offsets, weights=units).astype(np.int64)
+    day_counts = np.bincount(day_offsets)
+    earlier_global_units = (np.cumsum(day_units) - day_units)[day_offsets]
+    earlier_global_counts = (np.cumsum(day_counts) - day_counts)[day_offsets]
+    after_global_day = days > global_day
+    all_units = np.where(after_global_day, global_units, global_before_units) + earlier_global_units
+    all_counts = np.where(after_global_day, global_count, global_before_count) + earlier_global_counts
+
+    encoded = smoothed_encoding(key_units, key_counts, all_units, all_counts, state)
+
+    # New state: a key's latest row holds its totals as of the start of its latest day
+    grouped = codes != -1
+    batch_units = np.bincount(codes[grouped], weights=units[grouped], minlength=len(labels)).astype(np.int64)
+    batch_counts = np.bincount(codes[grouped], minlength=len(labels))
+    for code, label in enumerate(labels):
+        row = latest_rows[code]
+        total_units, total_count = seeds[code, 3] + batch_units[code], seeds[code, 4] + batch_counts[code]
+        state['keys'][label] = [int(days[row]), int(key_units[row]), int(key_counts[row]), int(total_units), int(total_count)]
+
+    latest = int(np.argmax(days))
+    state['global'] = [int(days[latest]), int(all_units[latest]), int(all_counts[latest]),
+                       int(global_units + units.sum()), int(global_count + len(units))]
+
+    return encoded
+
+
+# Offline as-of encoding of a whole key column: the batch update run on an empty state
+# Returns float64 array, one encoding per row
+def as_of_target_encoding(keys, days, target, smoothing=DEFAULT_SMOOTHING, initial_prior=np.nan, resolution=DEFAULT_RESOLUTION):
+    return update_as_of_encoding(new_encoder_state(smoothing, initial_prior, resolution), keys, days, target)
+
+
+# As-of encode key columns of a dataframe with per-column states (updated in place)
+# Returns DataFrame of Transaction ID and one encoded column per key column
+def encode_columns(dataframe, states):
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE).astype(np.int64)
+    encoded = {TRANSACTION_ID: dataframe[TRANSACTION_ID].to_numpy()}
+    for column, state in states.items():
+        encoded[encoded_column(column)] = update_as_of_encoding(state, dataframe[column], days, dataframe[TARGET])
+
+    return pd.DataFrame(encoded)
+
+
+def save_encoder_states(states, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps({'format_version': STATE_FORMAT_VERSION, 'columns': states}))
+
+
+def load_encoder_states(input_path):
+    stored = json.loads(Path(input_path).read_text())
+
+    if stored.get('format_version') != STATE_FORMAT_VERSION:
+        raise ValueError(f'{input_path} is not an as-of encoder state of format {STATE_FORMAT_VERSION}')
+
+    return stored['columns']
+
+
+# Check the encoder on a dataset:
+#   streaming  date-ordered batches through the online update give the offline encodings bit for bit
+#   leakage    encoding only the rows before a cutoff day gives those rows the same encodings
+# Returns dictionary of timings and results
+def check_as_of_encoding(dataframe, columns=DEFAULT_COLUMNS, batches=50, smoothing=DEFAULT_SMOOTHING, initial_prior=np.nan):
+    def fresh_states():
+        return {column: new_encoder_state(smoothing, initial_prior) for column in columns}
+
+    start = time.perf_counter()
+    offline = encode_columns(dataframe, fresh_states())
+    offline_seconds = time.perf_counter() - start
+
+    states = fresh_states()
+    start = time.perf_counter()
+    online = pd.concat([encode_columns(part, states) for part in split_by_days(dataframe, batches)])
+    online_seconds = time.perf_counter() - start
+    online = online.set_index(TRANSACTION_ID).loc[offline[TRANSACTION_ID]].reset_index()
+
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE)
+    cutoff = np.median(days)
+    before_cutoff = days < cutoff
+    truncated = encode_columns(dataframe[before_cutoff], fresh_states())
+
+    encoded_columns = [encoded_column(column) for column in columns]
+    return {
+        'rows': len(dataframe),
+        'batches': batches,
+        'offline_seconds': offline_seconds,
+        'online_seconds': online_seconds,
+        'online_matches_offline': bool(online[encoded_columns].equals(offline[encoded_columns])),
+        'unchanged_without_future_rows': bool(truncated[encoded_columns].reset_index(drop=True)
+                                              .equals(offline.loc[before_cutoff, encoded_columns].reset_index(drop=True))),
+        'state_keys': {column: len(state['keys']) for column, state in states.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Leakage-free as-of target encoding of key columns.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in [('encode', 'encode a whole dataset offline'), ('update', 'encode new days from a saved state'),
+                            ('check', 'compare online batches with offline encoding and check for leakage')]:
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('input', type=Path, nargs='?' if name != 'update' else None, default=SUBMISSION_DIR / CLEANED_DATASET,
+                               help='cleaned transactions (default: the submission final_cleaned_dataset.csv)')
+        if name != 'update':
+            subparser.add_argument('--columns', nargs='+', default=list(DEFAULT_COLUMNS), help='key columns to encode')
+            subparser.add_argument('--smoothing', type=float, default=DEFAULT_SMOOTHING, help=f'prior weight m (default: {DEFAULT_SMOOTHING})')
+            subparser.add_argument('--initial-prior', type=float, default=np.nan,
+                                   help='encoding of first-day rows, which have no history (default: empty)')
+        if name == 'check':
+            subparser.add_argument('--batches', type=int, default=50, help='date-ordered online batches (default: 50)')
+        else:
+            subparser.add_argument('--output', type=Path, required=True, help='CSV of Transaction ID and the encoded columns')
+            subparser.add_argument('--state', type=Path, required=name == 'update', help='encoder state to write (encode) or update (update)')
+    arguments = parser.parse_args()
+
+    dataframe = pd.read_csv(arguments.input)
+
+    if arguments.command == 'check':
+        print(json.dumps(check_as_of_encoding(dataframe, arguments.columns, arguments.batches, arguments.smoothing, arguments.initial_prior), indent=2))
+        return
+
+    if arguments.command == 'encode':
+        states = {column: new_encoder_state(arguments.smoothing, arguments.initial_prior) for column in arguments.columns}
+    else:
+        states = load_encoder_states(arguments.state)
+
+    encoded = encode_columns(dataframe, states)
+    arguments.output.parent.mkdir(parents=True, exist_ok=True)
+    encoded.to_csv(arguments.output, index=False)
+    if arguments.state:
+        save_encoder_states(states, arguments.state)
+    print(f"Wrote {len(encoded)} rows of {', '.join(encoded.columns[1:])} to {arguments.output}")
+
+
+if __name__ == '__main__':
+    main()
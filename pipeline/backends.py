@@ -0,0 +1,228 @@
+"""
+Pluggable Execution Backends
+
+Runs the stage operations of the whole pipeline (missing -> encoding ->
+rescale) through an interchangeable backend module:
+
+  pandas  pipeline.pandas_backend  in-memory pandas, the reference (stage script semantics)
+  polars  pipeline.polars_backend  Polars lazy frames on a multi-threaded columnar engine
+                                   (optional: pip install polars)
+
+Every backend module exposes the same operations (see pipeline.pandas_backend),
+so the plan below is written once:
+
+  listwise deletion of missing Total Spent, Price Per Unit = Total Spent / Quantity,
+  Item mode per Category, Discount Applied 'Unknown' fill,
+  leave-one-out Customer ID encoding, 2-fold Item encoding (KFold shuffle, seed 42),
+  one-hot Category / Payment Method / Discount Applied, binary Location,
+  min-max / z-score / robust scaling of Quantity, Price Per Unit and Total Spent
+
+The parity check runs the plan on two backends and compares every column;
+the benchmark times the full plan per backend.
+
+Usage:
+    python -m pipeline.backends submission/datasource/Deliverable1Dataset.csv --check
+    python -m pipeline.backends big.csv --benchmark --backends pandas polars --repeat 3 --report backends.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import planned_dtype
+from pipeline.folds import kfold_assignment
+
+
+BACKENDS = {
+    'pandas': 'pipeline.pandas_backend',
+    'polars': 'pipeline.polars_backend',
+}
+
+# Column names
+CUSTOMER_ID = 'Customer ID'
+CATEGORY = 'Category'
+ITEM = 'Item'
+PRICE_PER_UNIT = 'Price Per Unit'
+QUANTITY = 'Quantity'
+TOTAL_SPENT = 'Total Spent'
+PAYMENT_METHOD = 'Payment Method'
+LOCATION = 'Location'
+DISCOUNT_APPLIED = 'Discount Applied'
+
+# One-hot encoded column -> prefix of its dummy columns
+ONE_HOT_PREFIXES = {
+    CATEGORY: 'cat',
+    PAYMENT_METHOD: 'Payment',
+    DISCOUNT_APPLIED: 'Discount',
+}
+
+# Rescaled numeric -> prefix of its rescaled columns (as in the rescale stage scripts)
+RESCALE_PREFIXES = {
+    QUANTITY: 'Quantity',
+    PRICE_PER_UNIT: 'PricePerUnit',
+    TOTAL_SPENT: 'TotalSpent',
+}
+
+# Largest relative difference accepted between backends for float columns
+PARITY_TOLERANCE = 1e-9
+
+
+# Import a backend module by name
+# Raises KeyError for unknown names and ImportError naming the missing package for optional backends
+def get_backend(backend_name):
+    if backend_name not in BACKENDS:
+        raise KeyError(f'Unknown backend {backend_name!r}; expected one of {list(BACKENDS)}')
+
+    try:
+        return importlib.import_module(BACKENDS[backend_name])
+    except ImportError as error:
+        raise ImportError(f'The {backend_name} backend requires {error.name} (pip install {error.name})') from error
+
+
+# Run the whole missing -> encoding -> rescale plan on one backend
+# The frame is materialized after the missing-data phase, where the stage scripts write final_cleaned_dataset.csv
+# Returns the backend's frame (convert with backend.to_pandas)
+def run_plan(backend, input_csv):
+    frame = backend.read_csv(input_csv)
+
+    frame = backend.listwise_delete(frame, TOTAL_SPENT)
+    frame = backend.reconstruct_ratio(frame, PRICE_PER_UNIT, TOTAL_SPENT, QUANTITY)
+    frame = backend.impute_group_mode(frame, ITEM, CATEGORY)
+    frame = backend.fill_unknown(frame, DISCOUNT_APPLIED, 'Unknown')
+    frame = backend.materialize(frame)
+
+    frame = backend.loo_target_encode(frame, CUSTOMER_ID, TOTAL_SPENT, 'Customer ID Target Encoded')
+    frame = backend.kfold_target_encode(frame, ITEM, TOTAL_SPENT, 'Item Target Encoded', kfold_assignment(backend.row_count(frame)))
+    for column, prefix in ONE_HOT_PREFIXES.items():
+        frame = backend.one_hot_encode(frame, column, prefix, dtype=planned_dtype(f'{prefix}_{column}'))
+    frame = backend.binary_encode(frame, LOCATION, 'Online', 'Location_Encoded')
+
+    for column, prefix in RESCALE_PREFIXES.items():
+        frame = backend.min_max_scale(frame, column, f'{prefix}_Normalized')
+        frame = backend.standard_scale(frame, column, f'{prefix}_Standardized')
+        frame = backend.robust_scale(frame, column, f'{prefix}_Robust')
+
+    return backend.materialize(frame)
+
+
+# Text form of a column for comparisons: missing values become '' (NaN and None alike)
+def normalized_text(series):
+    return series.astype(str).where(series.notna(), '')
+
+
+# Compare two pipeline results column by column
+# Float columns are compared with a relative tolerance, everything else as text
+# Returns dictionary with missing/extra columns, row counts and per-column differences, plus passed
+def compare_frames(reference, candidate, tolerance=PARITY_TOLERANCE):
+    comparison = {
+        'rows': {'reference': len(reference), 'candidate': len(candidate)},
+        'missing_columns': [column for column in reference.columns if column not in candidate.columns],
+        'extra_columns': [column for column in candidate.columns if column not in reference.columns],
+        'columns': {},
+    }
+
+    if len(reference) == len(candidate):
+        for column in reference.columns.intersection(candidate.columns):
+            expected, actual = reference[column], candidate[column]
+            if pd.api.types.is_float_dtype(expected):
+                expected = expected.to_numpy(dtype=np.float64)
+                actual = actual.to_numpy(dtype=np.float64, na_value=np.nan)
+                mismatched = ~np.isclose(actual, expected, rtol=tolerance, atol=tolerance, equal_nan=True)
+            else:
+                mismatched = (normalized_text(expected) != normalized_text(actual)).to_numpy()
+
+            comparison['columns'][column] = int(mismatched.sum())
+
+    comparison['passed'] = (
+        len(reference) == len(candidate)
+        and not comparison['missing_columns']
+        and not comparison['extra_columns']
+        and not any(comparison['columns'].values())
+    )
+
+    return comparison
+
+
+# Run the plan on both backends and compare the results
+def check_parity(input_csv, reference_name='pandas', candidate_name='polars'):
+    reference_backend, candidate_backend = get_backend(reference_name), get_backend(candidate_name)
+
+    reference = reference_backend.to_pandas(run_plan(reference_backend, input_csv))
+    candidate = candidate_backend.to_pandas(run_plan(candidate_backend, input_csv))
+
+    return compare_frames(reference, candidate)
+
+
+# Time the full plan on every backend (best and median wall time over repeat runs)
+# Returns dictionary of backend name to timings
+def benchmark_backends(input_csv, backend_names, repeat=3):
+    results = {}
+
+    for backend_name in backend_names:
+        backend = get_backend(backend_name)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            backend.to_pandas(run_plan(backend, input_csv))
+            timings.append(time.perf_counter() - start)
+
+        results[backend_name] = {'best_seconds': min(timings), 'median_seconds': float(np.median(timings)), 'runs': timings}
+
+    return results
+
+
+# Versions and core count, so benchmark numbers can be compared across machines
+def collect_environment_info(backend_names):
+    info = {'python': platform.python_version(), 'cpu_count': os.cpu_count(), 'pandas': pd.__version__}
+    if 'polars' in backend_names:
+        import polars as pl
+        info['polars'] = pl.__version__
+        info['polars_threads'] = pl.thread_pool_size()
+
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the pipeline plan on interchangeable backends.')
+    parser.add_argument('input', type=Path, help='raw transaction CSV (e.g. submission/datasource/Deliverable1Dataset.csv)')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--check', action='store_true', help='compare the first backend (reference) with the others')
+    parser.add_argument('--benchmark', action='store_true', help='time the full plan on every backend')
+    parser.add_argument('--repeat', type=int, default=3, help='benchmark runs per backend (default: 3)')
+    parser.add_argument('--report', type=Path, help='write the results to this JSON file')
+    arguments = parser.parse_args()
+
+    results = {'input': str(arguments.input)}
+
+    if arguments.check:
+        reference_name = arguments.backends[0]
+        results['parity'] = {name: check_parity(arguments.input, reference_name, name) for name in arguments.backends[1:]}
+        for name, comparison in results['parity'].items():
+            print(f"{reference_name} vs {name}: passed={comparison['passed']} rows={comparison['rows']}")
+            for column, mismatches in comparison['columns'].items():
+                if mismatches:
+                    print(f'  {column}: {mismatches} mismatching rows')
+            for key in ('missing_columns', 'extra_columns'):
+                if comparison[key]:
+                    print(f'  {key}: {comparison[key]}')
+
+    if arguments.benchmark:
+        results['environment'] = collect_environment_info(arguments.backends)
+        results['benchmark'] = benchmark_backends(arguments.input, arguments.backends, arguments.repeat)
+        for name, timing in results['benchmark'].items():
+            print(f"{name:8s} best {timing['best_seconds']:.3f}s  median {timing['median_seconds']:.3f}s")
+
+    if arguments.report:
+        arguments.report.parent.mkdir(parents=True, exist_ok=True)
+        arguments.report.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
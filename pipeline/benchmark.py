@@ -0,0 +1,213 @@
+"""
+Scalable Benchmark Suite for Every Pipeline Stage
+
+Runs every stage (missing data, each encoder, combine_all, each rescaler) on
+the raw dataset scaled to 1x, 10x, 100x and 1000x its original size, and
+records wall time, CPU time, peak RSS and rows/second per stage.
+
+The scaled input is either the real file tiled with fresh Transaction IDs
+(--source tiled) or synthetic rows with the same schema and missingness
+(--source synthetic, see pipeline.synthetic_data).
+
+Each stage runs in a fresh Python process so peak RSS belongs to that stage
+alone. Results are written as JSON so runs can be diffed against each other.
+
+Usage:
+    python -m pipeline.benchmark --scales 1 10 100 1000 --output benchmark_results.json
+    python -m pipeline.benchmark --scales 1 10 --baseline previous_results.json
+    python -m pipeline.benchmark --scales 1000 --source synthetic
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline.stages import REPO_ROOT, SUBMISSION_DIR, RAW_DATASET, STAGES, count_csv_rows
+from pipeline.synthetic_data import write_synthetic_dataset
+
+
+DEFAULT_SCALES = [1, 10, 100, 1000]
+DEFAULT_OUTPUT = Path('benchmark_results.json')
+DATA_SOURCES = ('tiled', 'synthetic')
+TRANSACTION_ID = 'Transaction ID'
+TRANSACTION_PREFIX = 'TXN_'
+
+# Copies of the dataset get Transaction IDs shifted by this step so keys stay unique
+TRANSACTION_ID_STEP = 10_000_000
+
+
+# Write the raw dataset repeated scale times, one copy at a time
+# Every copy receives fresh Transaction IDs so the output keeps a unique key
+# Returns number of rows written
+def write_scaled_dataset(source_csv_path, output_csv_path, scale):
+    source_dataframe = pd.read_csv(source_csv_path, dtype=str, keep_default_na=False)
+    transaction_numbers = source_dataframe[TRANSACTION_ID].str.slice(len(TRANSACTION_PREFIX)).astype('int64')
+
+    output_path = Path(output_csv_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    for copy_number in range(scale):
+        shifted_numbers = transaction_numbers + copy_number * TRANSACTION_ID_STEP
+        source_dataframe[TRANSACTION_ID] = TRANSACTION_PREFIX + shifted_numbers.astype(str)
+        source_dataframe.to_csv(output_path, index=False, mode='w' if copy_number == 0 else 'a', header=copy_number == 0)
+
+    return len(source_dataframe) * scale
+
+
+# Run one stage in a child interpreter and read back its metrics report
+# Returns the metrics dictionary, with 'error' set when the stage failed
+def run_stage_in_subprocess(stage_name, workdir, trace=False):
+    report_path = Path(workdir) / 'reports' / f'{stage_name}.json'
+    command = [sys.executable, '-m', 'pipeline.stages', stage_name, '--workdir', str(workdir), '--report', str(report_path)]
+    if trace:
+        command.append('--trace')
+
+    environment = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run(command, cwd=REPO_ROOT, env=environment, capture_output=True, text=True)
+
+    if completed.returncode != 0:
+        return {'stage': stage_name, 'error': completed.stderr.strip().splitlines()[-1:] or ['unknown error']}
+
+    return json.loads(report_path.read_text())
+
+
+# Run the whole stage chain at one scale inside a temporary working directory
+# Returns list of per-stage metric dictionaries
+def benchmark_scale(scale, stage_names, work_root, keep_outputs=False, source='tiled', seed=0, trace=False):
+    workdir = Path(tempfile.mkdtemp(prefix=f'scale_{scale}x_', dir=work_root))
+
+    generation_start = time.perf_counter()
+    if source == 'synthetic':
+        base_rows = count_csv_rows(SUBMISSION_DIR / RAW_DATASET)
+        total_rows = write_synthetic_dataset(workdir / RAW_DATASET, base_rows * scale, seed=seed)
+    else:
+        total_rows = write_scaled_dataset(SUBMISSION_DIR / RAW_DATASET, workdir / RAW_DATASET, scale)
+    print(f'Scale {scale}x: {total_rows} rows generated in {time.perf_counter() - generation_start:.2f}s')
+
+    results = []
+    for stage in STAGES:
+        if stage['name'] not in stage_names:
+            continue
+
+        metrics = run_stage_in_subprocess(stage['name'], workdir, trace)
+        metrics['scale'] = scale
+        results.append(metrics)
+
+        if 'error' in metrics:
+            print(f"  {stage['name']:28s} FAILED: {metrics['error'][0]}")
+            break
+
+        print(f"  {stage['name']:28s} {metrics['wall_seconds']:9.3f}s  {metrics['peak_rss_mb']:9.1f} MB  {metrics['rows_per_second']:12,.0f} rows/s")
+
+    if not keep_outputs:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+# Describe the machine and library versions the benchmark ran with
+def collect_environment_info():
+    import numpy as np
+
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# Compare two benchmark runs stage by stage at matching scales
+# Returns list of dictionaries with wall time and peak RSS changes
+def compare_with_baseline(results, baseline_results):
+    baseline_lookup = {
+        (record['scale'], record['stage']): record
+        for record in baseline_results
+        if 'error' not in record
+    }
+
+    comparison = []
+    for record in results:
+        baseline = baseline_lookup.get((record.get('scale'), record['stage']))
+        if baseline is None or 'error' in record:
+            continue
+
+        comparison.append({
+            'scale': record['scale'],
+            'stage': record['stage'],
+            'wall_seconds_before': baseline['wall_seconds'],
+            'wall_seconds_after': record['wall_seconds'],
+            'wall_change_pct': (record['wall_seconds'] / baseline['wall_seconds'] - 1) * 100,
+            'peak_rss_mb_before': baseline['peak_rss_mb'],
+            'peak_rss_mb_after': record['peak_rss_mb'],
+            'peak_rss_change_pct': (record['peak_rss_mb'] / baseline['peak_rss_mb'] - 1) * 100,
+        })
+
+    return comparison
+
+
+# Print the baseline comparison as a table
+def display_baseline_comparison(comparison):
+    print('COMPARISON WITH BASELINE')
+    if not comparison:
+        print('No matching stages found in baseline')
+        return
+
+    print(pd.DataFrame(comparison).to_string(index=False, float_format=lambda value: f'{value:.2f}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every pipeline stage at increasing data sizes.')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='multiples of Deliverable1Dataset.csv to benchmark (default: 1 10 100 1000)')
+    parser.add_argument('--stages', nargs='+', default=[stage['name'] for stage in STAGES],
+                        choices=[stage['name'] for stage in STAGES], metavar='STAGE',
+                        help='subset of stages to run; upstream stages must be included')
+    parser.add_argument('--source', choices=DATA_SOURCES, default='tiled',
+                        help='tile the real dataset or generate synthetic rows (default: tiled)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for --source synthetic')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='JSON file for the results')
+    parser.add_argument('--baseline', type=Path, help='earlier results file to compare against')
+    parser.add_argument('--work-root', type=Path, help='directory for scaled datasets (default: system temp)')
+    parser.add_argument('--keep-outputs', action='store_true', help='keep the generated working directories')
+    parser.add_argument('--trace', action='store_true', help='record per-step timings inside every stage')
+    arguments = parser.parse_args()
+
+    if arguments.work_root:
+        arguments.work_root.mkdir(parents=True, exist_ok=True)
+
+    all_results = []
+    for scale in arguments.scales:
+        all_results.extend(benchmark_scale(scale, set(arguments.stages), arguments.work_root, arguments.keep_outputs, arguments.source, arguments.seed, arguments.trace))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': collect_environment_info(),
+        'scales': arguments.scales,
+        'source': arguments.source,
+        'results': all_results,
+    }
+
+    if arguments.baseline:
+        baseline_report = json.loads(arguments.baseline.read_text())
+        report['baseline'] = str(arguments.baseline)
+        report['comparison'] = compare_with_baseline(all_results, baseline_report['results'])
+        display_baseline_comparison(report['comparison'])
+
+    arguments.output.parent.mkdir(parents=True, exist_ok=True)
+    arguments.output.write_text(json.dumps(report, indent=2))
+    print(f'Results written to {arguments.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Delta Stage Outputs
+
+Every encoder and rescaler writes the whole cleaned dataset again with its
+own columns appended: location_binary_encoded.csv is the cleaned dataset plus
+Location_Encoded, each rescaled quantity file is the cleaned dataset plus
+three columns, and so on. With PIPELINE_WRITE_DELTA set, a stage writes a
+narrow delta instead:
+
+  <output>.delta.csv.gz  Transaction ID plus the columns the stage added,
+                         gzip-compressed (level 1: as fast to write as plain CSV)
+  <output>.delta.json    manifest: the base file (the stage's input), the key,
+                         the full column order and the delta columns
+
+Outputs written together from the same frame (the norm / std / robust copies
+of a rescaler) share one delta file, each with its own manifest.
+
+Consumers read stage outputs through read_stage_output, which returns the
+wide file when it exists and otherwise overlays the delta on its base (bases
+may themselves be deltas), restricted to the requested columns, so only the
+files holding those columns are parsed. materialize_output writes the wide
+CSV back, byte-identical to the one the stage would have written.
+
+Usage:
+    python -m pipeline --workdir /tmp/run --delta
+    python -m pipeline.deltas sizes --workdir /tmp/run
+    python -m pipeline.deltas materialize /tmp/run/output/2_handle_encoding_data/location_binary_encoded.csv
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.concurrent_io import read_csv
+from pipeline.keys import TRANSACTION_ID
+
+
+DELTA_VARIABLE = 'PIPELINE_WRITE_DELTA'
+DELTA_SUFFIX = '.delta.csv.gz'
+# mtime 0 keeps the compressed bytes identical between runs (stage cache digests)
+DELTA_COMPRESSION = {'method': 'gzip', 'compresslevel': 1, 'mtime': 0}
+MANIFEST_SUFFIX = '.delta.json'
+
+
+# Whether stages should write deltas: PIPELINE_WRITE_DELTA is set to anything but '', '0', 'false' or 'no'
+def write_delta_enabled():
+    return os.environ.get(DELTA_VARIABLE, '').strip().lower() not in ('', '0', 'false', 'no')
+
+
+# Paths of the delta CSV and manifest that stand in for a wide output
+# Returns tuple of (delta CSV path, manifest path)
+def delta_paths(output_path):
+    output_path = Path(output_path)
+    stem = output_path.name[:-len(output_path.suffix)] if output_path.suffix else output_path.name
+
+    return output_path.with_name(stem + DELTA_SUFFIX), output_path.with_name(stem + MANIFEST_SUFFIX)
+
+
+# Manifest of a delta output, or None when the output is not stored as a delta
+def load_delta_manifest(output_path):
+    _, manifest_path = delta_paths(output_path)
+    if not manifest_path.exists():
+        return None
+
+    return json.loads(manifest_path.read_text())
+
+
+# Files that hold an output: the wide CSV, or the delta manifest and its delta CSV
+# Returns list of existing paths (empty when the output is missing)
+def stage_output_files(output_path):
+    output_path = Path(output_path)
+    if output_path.exists():
+        return [output_path]
+
+    manifest = load_delta_manifest(output_path)
+    if manifest is None:
+        return []
+
+    _, manifest_path = delta_paths(output_path)
+    return [manifest_path, manifest_path.parent / manifest['delta']]
+
+
+def output_exists(output_path):
+    return bool(stage_output_files(output_path))
+
+
+# Column names of an output (header of the wide file or the manifest's column order)
+def output_columns(output_path):
+    manifest = load_delta_manifest(output_path) if not Path(output_path).exists() else None
+    if manifest is not None:
+        return manifest['columns']
+
+    return list(pd.read_csv(output_path, nrows=0).columns)
+
+
+# Data rows of an output
+def count_output_rows(output_path):
+    manifest = load_delta_manifest(output_path) if not Path(output_path).exists() else None
+    if manifest is not None:
+        return manifest['rows']
+
+    with open(output_path, 'rb') as handle:
+        line_count = sum(block.count(b'\n') for block in iter(lambda: handle.read(1 << 20), b''))
+
+    return max(line_count - 1, 0)
+
+
+# Remove a stale file left by a run in the other mode
+def remove_if_exists(path):
+    if path.exists():
+        path.unlink()
+
+
+# Write a stage's frame to one or more outputs
+# Wide mode writes the whole frame to every output; delta mode writes the key plus the columns
+# the frame adds to its base once, next to the first output, and a manifest per output
+# delta overrides PIPELINE_WRITE_DELTA; the base must hold every other column of the frame
+# Returns list of written paths
+def save_stage_output(dataframe, output_paths, base_path, key=TRANSACTION_ID, delta=None):
+    output_paths = [Path(output_paths)] if isinstance(output_paths, (str, Path)) else [Path(path) for path in output_paths]
+    delta = write_delta_enabled() if delta is None else delta
+
+    for output_path in output_paths:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not delta:
+        for output_path in output_paths:
+            dataframe.to_csv(output_path, index=False)
+            for stale_path in delta_paths(output_path):
+                remove_if_exists(stale_path)
+        return output_paths
+
+    base_columns = set(output_columns(base_path))
+    if key not in base_columns or key not in dataframe.columns:
+        raise ValueError(f'Both the frame and its base {base_path} need a {key} column to key the delta')
+    delta_columns = [col for col in dataframe.columns if col not in base_columns]
+
+    delta_csv_path, _ = delta_paths(output_paths[0])
+    dataframe[[key] + delta_columns].to_csv(delta_csv_path, index=False, compression=DELTA_COMPRESSION)
+    written = [delta_csv_path]
+
+    for output_path in output_paths:
+        _, manifest_path = delta_paths(output_path)
+        manifest = {
+            'base': os.path.relpath(base_path, manifest_path.parent),
+            'delta': os.path.relpath(delta_csv_path, manifest_path.parent),
+            'key': key,
+            'rows': len(dataframe),
+            'columns': list(dataframe.columns),
+            'delta_columns': delta_columns,
+        }
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        written.append(manifest_path)
+
+        remove_if_exists(output_path)
+        if output_path != output_paths[0]:
+            remove_if_exists(delta_paths(output_path)[0])
+
+    return written
+
+
+# File that holds the key and every requested column of an output on its own: the wide CSV,
+# or the delta CSV when all columns are delta columns
+# Raises ValueError when only the overlay (read_stage_output) has them all
+def column_source(output_path, columns):
+    output_path = Path(output_path)
+    if output_path.exists():
+        return output_path
+
+    manifest = load_delta_manifest(output_path)
+    if manifest is None:
+        raise FileNotFoundError(f'{output_path} exists neither as a wide file nor as a delta')
+    if set(columns) <= set([manifest['key']] + manifest['delta_columns']):
+        return delta_paths(output_path)[1].parent / manifest['delta']
+
+    raise ValueError(f'{output_path} is a delta without {sorted(set(columns) - set(manifest["delta_columns"]) - {manifest["key"]})}; '
+                     f'read it with read_stage_output')
+
+
+# Read a delta CSV; its columns were computed by the stage and written with full precision,
+# so the C parser has to parse floats exactly (round_trip) to give back the same values
+def read_delta_csv(path, usecols, dtype=None, engine='c'):
+    if engine == 'c':
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, float_precision='round_trip')
+
+    return read_csv(path, usecols=usecols, dtype=dtype, engine=engine)
+
+
+# Read an output as a wide frame: the wide CSV, or the delta overlaid on its base
+# Only the requested columns (all by default) are read; dtype maps columns to parse dtypes
+# The C parser is used unless engine says otherwise, so values parse exactly as with pd.read_csv
+# Raises ValueError when the delta's keys are not the base's keys
+def read_stage_output(output_path, usecols=None, dtype=None, engine='c'):
+    output_path = Path(output_path)
+    if output_path.exists():
+        return read_csv(output_path, usecols=usecols, dtype=dtype, engine=engine)
+
+    manifest = load_delta_manifest(output_path)
+    if manifest is None:
+        raise FileNotFoundError(f'{output_path} exists neither as a wide file nor as a delta')
+
+    manifest_dir = delta_paths(output_path)[1].parent
+    key = manifest['key']
+    columns = manifest['columns'] if usecols is None else [col for col in manifest['columns'] if col in set(usecols)]
+    delta_columns = [col for col in columns if col in set(manifest['delta_columns'])]
+    base_columns = [col for col in columns if col not in set(manifest['delta_columns'])]
+
+    def column_dtypes(selected):
+        return None if dtype is None else {col: dtype[col] for col in selected if col in dtype}
+
+    delta_frame = read_delta_csv(manifest_dir / manifest['delta'], usecols=[key] + delta_columns,
+                                 dtype=column_dtypes([key] + delta_columns), engine=engine)
+    base_frame = read_stage_output((manifest_dir / manifest['base']).resolve(), usecols=list(dict.fromkeys([key] + base_columns)),
+                                   dtype=column_dtypes([key] + base_columns), engine=engine)
+
+    # Stages keep their input's row order, so the keys usually line up; otherwise join on the key
+    if len(base_frame) == len(delta_frame) and np.array_equal(base_frame[key].to_numpy(), delta_frame[key].to_numpy()):
+        positions = None
+    else:
+        positions = pd.Index(base_frame[key]).get_indexer(delta_frame[key])
+        if (positions < 0).any():
+            raise ValueError(f'{output_path}: {int((positions < 0).sum())} delta {key} values are not in the base')
+
+    combined = {}
+    for col in columns:
+        if col == key or col in delta_columns:
+            combined[col] = delta_frame[col]
+        else:
+            combined[col] = base_frame[col] if positions is None else base_frame[col].iloc[positions].reset_index(drop=True)
+
+    return pd.DataFrame(combined, columns=columns)
+
+
+# Write the wide CSV of an output stored as a delta (next to it by default)
+# Returns the written path
+def materialize_output(output_path, destination=None):
+    destination = Path(destination or output_path)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    read_stage_output(output_path).to_csv(destination, index=False)
+
+    return destination
+
+
+# Bytes on disk of every stage output under a working directory, wide or delta
+# Returns dictionary of output path (relative to workdir) -> bytes; shared delta files count once
+def output_sizes(workdir, output_paths):
+    workdir = Path(workdir)
+    sizes = {}
+    seen = set()
+
+    for relative_path in output_paths:
+        files = [path for path in stage_output_files(workdir / relative_path) if path.resolve() not in seen]
+        seen.update(path.resolve() for path in files)
+        sizes[relative_path] = sum(path.stat().st_size for path in files)
+
+    return sizes
+
+
+def main():
+    # pipeline.stages counts rows through this module, so the registry is imported here
+    from pipeline.stages import STAGES, SUBMISSION_DIR
+
+    parser = argparse.ArgumentParser(description='Inspect and materialize delta stage outputs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sizes_parser = subparsers.add_parser('sizes', help='bytes on disk of every stage output')
+    sizes_parser.add_argument('--workdir', type=Path, default=SUBMISSION_DIR,
+                              help='directory holding datasource/ and output/ (default: submission/)')
+
+    materialize_parser = subparsers.add_parser('materialize', help='write the wide CSV of delta outputs')
+    materialize_parser.add_argument('outputs', nargs='+', type=Path, help='wide output paths stored as deltas')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'materialize':
+        for output_path in arguments.outputs:
+            print(f'Wrote {materialize_output(output_path)}')
+        return
+
+    outputs = [output for stage in STAGES for output in stage['outputs'] if output.endswith('.csv')]
+    sizes = output_sizes(arguments.workdir, outputs)
+    for output, size in sizes.items():
+        kind = 'delta' if load_delta_manifest(arguments.workdir / output) and not (arguments.workdir / output).exists() else 'wide'
+        print(f'{output:70s} {kind:5s} {size / 1024:9.1f} KB')
+    print(f"{'total':70s} {'':5s} {sum(sizes.values()) / 1024:9.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
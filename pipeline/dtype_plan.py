@@ -0,0 +1,122 @@
+"""
+Dtype Plan for Encoded Datasets
+
+One explicit dtype per column family of the encoding stage, applied by each
+encoder to the columns it writes and by combine_all when it reads them back:
+
+  cat_*, Location_Encoded              uint8    one-hot / binary 0-1 integers
+  Payment_*, Discount_*                bool     one-hot flags (written as True/False)
+  * Target Encoded                     float32  target encodings
+  *_Normalized, *_Standardized,
+  *_Robust, * Scaled                   float32  rescaled values
+  Price Per Unit, Quantity,
+  Total Spent                          float32  raw numerics (exact: multiples of 0.5 below 2**24)
+  Transaction Date                     int32    days since 1970-01-01 (in memory only)
+
+Values only change by float32 rounding. Dates stay ISO text in every CSV:
+date_text() turns the day numbers back into YYYY-MM-DD when a frame is saved.
+
+Usage:
+    dataframe = apply_dtype_plan(dataframe)
+    dataframe = pd.read_csv(path, dtype=read_csv_dtypes(columns))
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+DATE_COLUMNS = ('Transaction Date',)
+
+# (pattern, dtype) rules, first match wins; patterns are matched against the full column name
+DTYPE_PLAN = [
+    (r'cat_.+', 'uint8'),
+    (r'Location_Encoded', 'uint8'),
+    (r'(Payment|Discount)_.+', 'bool'),
+    (r'.+ Target Encoded', 'float32'),
+    (r'.+_(Normalized|Standardized|Robust)', 'float32'),
+    (r'.+ Scaled', 'float32'),
+    (r'Price Per Unit|Quantity|Total Spent', 'float32'),
+    (r'Transaction Date', 'int32'),
+]
+
+
+# Look up the planned dtype of a column name
+# Returns dtype string, or None when the plan does not cover the column
+def planned_dtype(column_name):
+    for pattern, dtype in DTYPE_PLAN:
+        if re.fullmatch(pattern, column_name):
+            return dtype
+
+    return None
+
+
+# Convert ISO date text (or datetimes) to int32 days since 1970-01-01
+# Raises ValueError when a value is missing or not a date
+def date_day_numbers(values, column_name='date'):
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    if dates.isna().any():
+        raise ValueError(f'{column_name} has {int(dates.isna().sum())} missing or unparseable dates')
+
+    return (dates.to_numpy().astype('datetime64[D]') - EPOCH).astype(np.int32)
+
+
+# Convert int32 day numbers back to YYYY-MM-DD text
+def date_text(day_numbers):
+    return (EPOCH + np.asarray(day_numbers, dtype=np.int64)).astype(str)
+
+
+# Cast every planned column of a dataframe to its planned dtype
+# columns limits the cast to those names (e.g. only the columns an encoder adds)
+# Integer and bool casts are checked to be lossless; raises ValueError otherwise
+# Returns dataframe with the planned dtypes
+def apply_dtype_plan(dataframe, columns=None):
+    columns = dataframe.columns if columns is None else columns
+    casts = {}
+
+    for column_name in columns:
+        dtype = planned_dtype(column_name)
+        if dtype is None or dataframe[column_name].dtype == dtype:
+            continue
+
+        series = dataframe[column_name]
+        if column_name in DATE_COLUMNS:
+            casts[column_name] = date_day_numbers(series, column_name)
+            continue
+
+        if dtype in ('uint8', 'bool') and not series.isin([0, 1]).all():
+            raise ValueError(f'{column_name} holds values other than 0/1 and cannot be stored as {dtype}')
+        casts[column_name] = series.to_numpy(dtype=dtype)
+
+    if not casts:
+        return dataframe
+
+    return dataframe.assign(**casts)
+
+
+# Dtype mapping for pd.read_csv covering the planned columns of a file
+# Date columns are left out: they are read as text and converted with apply_dtype_plan
+def read_csv_dtypes(columns):
+    return {
+        column_name: planned_dtype(column_name)
+        for column_name in columns
+        if planned_dtype(column_name) is not None and column_name not in DATE_COLUMNS
+    }
+
+
+# Copy of a dataframe with day-number date columns turned back into ISO date text (for saving)
+def with_date_text(dataframe):
+    dates = {
+        column_name: date_text(dataframe[column_name])
+        for column_name in DATE_COLUMNS
+        if column_name in dataframe.columns and pd.api.types.is_integer_dtype(dataframe[column_name])
+    }
+
+    return dataframe.assign(**dates) if dates else dataframe
+
+
+# Deep memory use of a dataframe in megabytes
+def memory_megabytes(dataframe):
+    return dataframe.memory_usage(deep=True).sum() / (1024 * 1024)
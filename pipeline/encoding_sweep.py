@@ -0,0 +1,328 @@
+"""
+Encoding-Strategy Sweep
+
+CATEGORICAL_ENCODING_STRATEGY.md picks leave-one-out for Customer ID, 2-fold
+target encoding for Item and one-hot for Category by argument. The sweep
+measures the choice instead: every combination of a grid of encodings per
+column is built from the same cleaned dataset and fed to one fixed baseline
+model. Strategies:
+
+  onehot            one 0/1 column per training value (unseen values: all zeros)
+  binary            the training value's rank (1..n, 0 unseen) in ceil(log2(n + 1)) bits
+  frequency         share of training rows with the value
+  hashing:n=N       one-hot over N buckets of a stable hash of the value
+  loo               leave-one-out mean Total Spent on training rows, training mean on test rows
+  kfold:k=K:m=M     out-of-fold smoothed mean Total Spent (K shuffled folds, prior weight M) on
+                    training rows, smoothed training mean on test rows
+
+Evaluation: the cleaned rows are split by date (the last 20% of days are the
+test set), every encoder is fitted on the training rows only, and the
+baseline is a ridge regression (standardized features, alpha 1, NumPy) of
+Total Spent on the encoded categorical columns alone, so the score reflects
+how much of the spend the encodings carry. Per variant the sweep records
+feature width, matrix size, peak memory of the encoding step (tracemalloc),
+encode time, the baseline's fit time and test R^2 / RMSE.
+
+The cleaned dataset is reduced once to factorized codes, target and split
+and cached as an .npz file; each worker of the process pool loads it once,
+and the variants are spread over the pool.
+
+Usage:
+    python -m pipeline.encoding_sweep --jobs 4
+    python -m pipeline.encoding_sweep --grid "Item=onehot,frequency,kfold:k=2:m=0,kfold:k=5:m=10" "Customer ID=loo,frequency" --report sweep.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import date_day_numbers
+from pipeline.folds import RANDOM_STATE, kfold_assignment
+from pipeline.stages import CLEANED_DATASET, SUBMISSION_DIR
+
+
+TARGET = 'Total Spent'
+DATE_COLUMN = 'Transaction Date'
+TEST_SHARE = 0.2
+RIDGE_ALPHA = 1.0
+
+STRATEGIES = ('onehot', 'binary', 'frequency', 'hashing', 'loo', 'kfold')
+STRATEGY_DEFAULTS = {'hashing': {'n': 16}, 'kfold': {'k': 5, 'm': 10.0}}
+
+# Default grid: the alternatives for the three columns the strategy document argues about,
+# the other columns fixed to the pipeline's encodings
+DEFAULT_GRID = {
+    'Customer ID': ['loo', 'kfold:k=5:m=10', 'frequency', 'onehot', 'binary'],
+    'Item': ['kfold:k=2:m=0', 'kfold:k=5:m=10', 'loo', 'frequency', 'onehot', 'binary', 'hashing:n=16'],
+    'Category': ['onehot', 'binary', 'frequency', 'hashing:n=4'],
+    'Payment Method': ['onehot'],
+    'Location': ['binary'],
+    'Discount Applied': ['onehot'],
+}
+
+# Dataset loaded by each worker of the pool (see load_shared_dataset)
+SHARED = {}
+
+
+# Parse a strategy spec such as 'kfold:k=5:m=10' into a dictionary with its parameters
+# Raises ValueError for unknown strategies or parameters
+def parse_spec(text):
+    name, *parameters = text.strip().split(':')
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown encoding {name!r}; choose from {", ".join(STRATEGIES)}')
+
+    spec = dict(STRATEGY_DEFAULTS.get(name, {}), strategy=name)
+    for parameter in parameters:
+        key, _, value = parameter.partition('=')
+        if key not in STRATEGY_DEFAULTS.get(name, {}):
+            raise ValueError(f'{name} has no parameter {key!r}')
+        spec[key] = type(STRATEGY_DEFAULTS[name][key])(value)
+
+    return spec
+
+
+# Spec back to its text form (parameters in a fixed order)
+def spec_text(spec):
+    parameters = [f'{key}={spec[key]:g}' for key in STRATEGY_DEFAULTS.get(spec['strategy'], {})]
+    return ':'.join([spec['strategy']] + parameters)
+
+
+# Every combination of one spec per column
+# Returns list of dictionaries of column -> spec
+def expand_grid(grid):
+    columns = list(grid)
+    choices = [[parse_spec(text) for text in grid[column]] for column in columns]
+
+    return [dict(zip(columns, combination)) for combination in itertools.product(*choices)]
+
+
+# Reduce the cleaned dataset to what every variant needs and cache it as an .npz file:
+# factorized codes and labels per column, the target, and the date-based test mask
+# Returns the cache path
+def cache_dataset(cleaned_csv, columns, cache_path, test_share=TEST_SHARE):
+    dataframe = pd.read_csv(cleaned_csv, usecols=list(columns) + [TARGET, DATE_COLUMN])
+
+    days = date_day_numbers(dataframe[DATE_COLUMN], DATE_COLUMN)
+    cutoff = np.quantile(np.unique(days), 1 - test_share)
+
+    arrays = {'target': dataframe[TARGET].to_numpy(dtype=np.float64), 'test': days >= cutoff}
+    for position, column in enumerate(columns):
+        codes, uniques = pd.factorize(dataframe[column], sort=True)
+        arrays[f'codes_{position}'] = codes
+        arrays[f'labels_{position}'] = np.asarray(uniques.astype(str), dtype=str)
+
+    np.savez(cache_path, columns=np.asarray(columns, dtype=str), **arrays)
+    return cache_path
+
+
+# Pool initializer: load the cached dataset once per worker
+def load_shared_dataset(cache_path):
+    with np.load(cache_path) as cached:
+        columns = [str(column) for column in cached['columns']]
+        SHARED.update({
+            'target': cached['target'],
+            'test': cached['test'],
+            'codes': {column: cached[f'codes_{position}'] for position, column in enumerate(columns)},
+            'labels': {column: cached[f'labels_{position}'] for position, column in enumerate(columns)},
+        })
+
+
+# Target sums and counts per code over some rows (codes index labels; -1 rows are skipped)
+def code_totals(codes, target, label_count):
+    present = codes != -1
+    return (np.bincount(codes[present], weights=target[present], minlength=label_count),
+            np.bincount(codes[present], minlength=label_count))
+
+
+# Smoothed mean per code: (sum + m * prior) / (count + m), prior where a code has no rows
+def smoothed_means(sums, counts, prior, smoothing):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (sums + smoothing * prior) / (counts + smoothing)
+
+    return np.where(counts + smoothing > 0, means, prior)
+
+
+# Encode one column with one spec, fitted on the training rows
+# Returns tuple of (training matrix, test matrix), both float64 with one column per feature
+def encode_column(spec, codes, labels, target, test):
+    train_codes, test_codes, train_target = codes[~test], codes[test], target[~test]
+    label_count = len(labels)
+    strategy = spec['strategy']
+
+    if strategy in ('onehot', 'binary'):
+        vocabulary = np.unique(train_codes[train_codes != -1])
+        ranks = np.zeros(label_count + 1, dtype=np.int64)  # last slot: missing values (code -1)
+        ranks[vocabulary] = np.arange(1, len(vocabulary) + 1)
+
+        if strategy == 'onehot':
+            identity = np.vstack([np.zeros(len(vocabulary)), np.eye(len(vocabulary))])
+            return identity[ranks[train_codes]], identity[ranks[test_codes]]
+
+        width = max(1, int(np.ceil(np.log2(len(vocabulary) + 1))))
+        bits = ((np.arange(len(vocabulary) + 1)[:, None] >> np.arange(width)) & 1).astype(np.float64)
+        return bits[ranks[train_codes]], bits[ranks[test_codes]]
+
+    if strategy == 'frequency':
+        shares = np.append(code_totals(train_codes, train_target, label_count)[1] / len(train_codes), 0.0)
+        return shares[train_codes][:, None], shares[test_codes][:, None]
+
+    if strategy == 'hashing':
+        buckets = np.append(pd.util.hash_array(labels.astype(object)) % spec['n'], -1).astype(np.int64)
+        identity = np.vstack([np.eye(spec['n']), np.zeros(spec['n'])])
+        return identity[buckets[train_codes]], identity[buckets[test_codes]]
+
+    prior = train_target.mean()
+    sums, counts = code_totals(train_codes, train_target, label_count)
+
+    if strategy == 'loo':
+        row_sums, row_counts = np.append(sums, 0.0)[train_codes], np.append(counts, 0)[train_codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            train_encoded = np.where(row_counts > 1, (row_sums - train_target) / (row_counts - 1), prior)
+        test_encoded = np.append(smoothed_means(sums, counts, prior, 0.0), prior)[test_codes]
+        return train_encoded[:, None], test_encoded[:, None]
+
+    # kfold: every training row is encoded with the other folds' smoothed means
+    folds = kfold_assignment(len(train_codes), spec['k'], RANDOM_STATE)
+    train_encoded = np.empty(len(train_codes))
+    for fold in range(spec['k']):
+        in_fold = folds == fold
+        fold_sums, fold_counts = code_totals(train_codes[in_fold], train_target[in_fold], label_count)
+        other_means = np.append(smoothed_means(sums - fold_sums, counts - fold_counts, prior, spec['m']), prior)
+        train_encoded[in_fold] = other_means[train_codes[in_fold]]
+    test_encoded = np.append(smoothed_means(sums, counts, prior, spec['m']), prior)[test_codes]
+
+    return train_encoded[:, None], test_encoded[:, None]
+
+
+# Ridge regression with standardized features and an unpenalized intercept (closed form)
+# Returns tuple of (weights, intercept, feature means, feature scales)
+def fit_ridge(features, target, alpha=RIDGE_ALPHA):
+    means = features.mean(axis=0)
+    scales = features.std(axis=0)
+    scales[scales == 0] = 1.0
+    standardized = (features - means) / scales
+
+    gram = standardized.T @ standardized + alpha * np.eye(features.shape[1])
+    weights = np.linalg.solve(gram, standardized.T @ (target - target.mean()))
+
+    return weights, target.mean(), means, scales
+
+
+def predict_ridge(model, features):
+    weights, intercept, means, scales = model
+    return ((features - means) / scales) @ weights + intercept
+
+
+# Build one variant on the shared dataset, fit the baseline and score it on the test rows
+# Returns result dictionary
+def evaluate_variant(variant):
+    target, test = SHARED['target'], SHARED['test']
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    blocks = [encode_column(spec, SHARED['codes'][column], SHARED['labels'][column], target, test) for column, spec in variant.items()]
+    train_features = np.hstack([train for train, _ in blocks])
+    test_features = np.hstack([test_block for _, test_block in blocks])
+    encode_seconds = time.perf_counter() - start
+    encode_peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    model = fit_ridge(train_features, target[~test])
+    fit_seconds = time.perf_counter() - start
+
+    residuals = target[test] - predict_ridge(model, test_features)
+    total = target[test] - target[test].mean()
+
+    return {
+        'variant': {column: spec_text(spec) for column, spec in variant.items()},
+        'width': train_features.shape[1],
+        'matrix_mb': (train_features.nbytes + test_features.nbytes) / (1024 * 1024),
+        'encode_peak_mb': encode_peak_bytes / (1024 * 1024),
+        'encode_seconds': encode_seconds,
+        'fit_seconds': fit_seconds,
+        'test_r2': float(1 - (residuals ** 2).sum() / (total ** 2).sum()),
+        'test_rmse': float(np.sqrt((residuals ** 2).mean())),
+    }
+
+
+# Evaluate every variant of a grid on a process pool sharing one cached dataset
+# Returns list of result dictionaries, best test R^2 first
+def run_sweep(cleaned_csv, grid, jobs=None, test_share=TEST_SHARE):
+    variants = expand_grid(grid)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = cache_dataset(cleaned_csv, list(grid), Path(cache_dir) / 'cleaned_codes.npz', test_share)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=load_shared_dataset, initargs=(cache_path,)) as executor:
+            results = list(executor.map(evaluate_variant, variants, chunksize=max(1, len(variants) // (4 * (jobs or os.cpu_count() or 1)))))
+
+    return sorted(results, key=lambda result: result['test_r2'], reverse=True)
+
+
+# Results as aligned text: the varied columns' encodings, then the measurements
+def format_results(results, grid, limit=None):
+    varied = [column for column, choices in grid.items() if len(choices) > 1]
+    header = ' '.join(f'{column[:16]:16s}' for column in varied)
+    lines = [f"{header} {'width':>5s} {'MB':>6s} {'peak MB':>7s} {'encode ms':>9s} {'fit ms':>7s} {'R^2':>7s} {'RMSE':>8s}"]
+
+    for result in results[:limit]:
+        choices = ' '.join(f"{result['variant'][column][:16]:16s}" for column in varied)
+        lines.append(f"{choices} {result['width']:5d} {result['matrix_mb']:6.2f} {result['encode_peak_mb']:7.2f} "
+                     f"{result['encode_seconds'] * 1000:9.1f} {result['fit_seconds'] * 1000:7.1f} "
+                     f"{result['test_r2']:7.4f} {result['test_rmse']:8.2f}")
+
+    return '\n'.join(lines)
+
+
+# Parse --grid entries 'Column=spec,spec' over the default grid
+def parse_grid(entries):
+    grid = dict(DEFAULT_GRID)
+    for entry in entries or []:
+        column, _, specs = entry.partition('=')
+        if column not in grid:
+            raise ValueError(f'Unknown column {column!r}; choose from {", ".join(grid)}')
+        grid[column] = [spec for spec in specs.split(',') if spec]
+        for spec in grid[column]:
+            parse_spec(spec)
+
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate combinations of categorical encodings with a fixed baseline model.')
+    parser.add_argument('input', type=Path, nargs='?', default=SUBMISSION_DIR / CLEANED_DATASET,
+                        help='cleaned transactions (default: the submission final_cleaned_dataset.csv)')
+    parser.add_argument('--grid', nargs='+', metavar='COLUMN=SPECS',
+                        help="encodings per column, e.g. 'Item=onehot,kfold:k=5:m=10' (other columns keep the default grid)")
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--test-share', type=float, default=TEST_SHARE, help=f'share of the latest days held out (default: {TEST_SHARE})')
+    parser.add_argument('--top', type=int, default=20, help='variants listed (default: 20)')
+    parser.add_argument('--report', type=Path, help='write every result to this JSON file')
+    arguments = parser.parse_args()
+
+    try:
+        grid = parse_grid(arguments.grid)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    results = run_sweep(arguments.input, grid, arguments.jobs, arguments.test_share)
+    print(format_results(results, grid, arguments.top))
+    print(f'{len(results)} variants in {time.perf_counter() - start:.2f}s')
+
+    if arguments.report:
+        arguments.report.parent.mkdir(parents=True, exist_ok=True)
+        arguments.report.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
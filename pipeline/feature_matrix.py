@@ -0,0 +1,255 @@
+"""
+Memory-Mapped Feature Matrix Export
+
+Writes the final encoded features (final_fully_encoded_dataset.csv or the
+combined dataframe itself) as contiguous C-order NumPy .npy files that
+training code opens with np.load(..., mmap_mode='r'): no CSV parsing and no
+copy, whatever the dataset size.
+
+Layouts:
+  float32  one matrix features.npy with every feature as float32
+  mixed    binary.npy (uint8: one-hots and 0/1 flags) plus numeric.npy (float32)
+
+Next to the matrices:
+  transaction_ids.npy  int64 Transaction ID codes, one per row (see pipeline.keys)
+  manifest.json        row count, layout, and for every column its block, position and dtype,
+                       plus the key dictionary entry that decodes the Transaction ID codes
+
+Transaction Date is stored as days since 1970-01-01, which float32 represents exactly.
+
+Usage:
+    python -m pipeline.feature_matrix submission/output/2_handle_encoding_data/final_fully_encoded_dataset.csv --output features/
+    features = load_feature_matrix('features/')
+    price = feature_column(features, 'Price Per Unit')
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import DATE_COLUMNS, EPOCH, date_day_numbers
+from pipeline.keys import TRANSACTION_ID, decode_key_column, encode_transaction_ids
+
+
+LAYOUTS = ('float32', 'mixed')
+
+MANIFEST_FILE = 'manifest.json'
+KEYS_FILE = 'transaction_ids.npy'
+
+# Block name -> NumPy dtype of the .npy file holding it
+BLOCK_DTYPES = {
+    'features': np.float32,
+    'binary': np.uint8,
+    'numeric': np.float32,
+}
+
+
+# Convert a date column to whole days since 1970-01-01
+# Integer columns are taken as day numbers already (see pipeline.dtype_plan)
+# Raises ValueError when a value is missing or not a date
+# Returns NumPy int64 array
+def dates_to_day_numbers(values, column_name):
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        return values.to_numpy(dtype=np.int64)
+
+    return date_day_numbers(values, column_name).astype(np.int64)
+
+
+# Check whether a column only holds 0/1 values (bool, or integers 0 and 1)
+def is_binary_column(series):
+    if pd.api.types.is_bool_dtype(series):
+        return True
+    if not pd.api.types.is_integer_dtype(series) or series.isna().any():
+        return False
+
+    return bool(series.isin([0, 1]).all())
+
+
+# Decide the block, position and stored encoding of every feature column
+# Raises ValueError for columns that are neither numeric, boolean nor a known date column
+# Returns list of column manifest entries in feature order
+def plan_feature_columns(dataframe, layout='float32', key_column=TRANSACTION_ID):
+    if layout not in LAYOUTS:
+        raise ValueError(f'Unknown layout {layout!r}; expected one of {list(LAYOUTS)}')
+
+    block_sizes = {}
+    columns = []
+
+    for column_name in dataframe.columns:
+        if column_name == key_column:
+            continue
+
+        series = dataframe[column_name]
+        if column_name in DATE_COLUMNS:
+            encoding = 'days_since_epoch'
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            encoding = 'value'
+        else:
+            raise ValueError(f'Column {column_name!r} has dtype {series.dtype}; only numeric, boolean and date columns can be exported')
+
+        if layout == 'mixed':
+            block = 'binary' if encoding == 'value' and is_binary_column(series) else 'numeric'
+        else:
+            block = 'features'
+
+        position = block_sizes.get(block, 0)
+        block_sizes[block] = position + 1
+
+        columns.append({
+            'name': column_name,
+            'block': block,
+            'position': position,
+            'dtype': np.dtype(BLOCK_DTYPES[block]).name,
+            'source_dtype': str(series.dtype),
+            'encoding': encoding,
+        })
+
+    return columns
+
+
+# Write the feature matrix, Transaction ID codes and manifest into output_dir
+# Each block is filled column by column into an .npy memmap, so only one column is converted at a time
+# Returns the manifest dictionary
+def export_feature_matrix(dataframe, output_dir, layout='float32', key_column=TRANSACTION_ID):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    columns = plan_feature_columns(dataframe, layout, key_column)
+    row_count = len(dataframe)
+
+    block_widths = {}
+    for column in columns:
+        block_widths[column['block']] = block_widths.get(column['block'], 0) + 1
+
+    blocks = {
+        block: np.lib.format.open_memmap(output_dir / f'{block}.npy', mode='w+', dtype=BLOCK_DTYPES[block], shape=(row_count, width))
+        for block, width in block_widths.items()
+    }
+
+    for column in columns:
+        series = dataframe[column['name']]
+        if column['encoding'] == 'days_since_epoch':
+            values = dates_to_day_numbers(series, column['name'])
+        else:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+        blocks[column['block']][:, column['position']] = values
+
+    for matrix in blocks.values():
+        matrix.flush()
+    del blocks
+
+    transaction_codes, key_entry = encode_transaction_ids(dataframe[key_column])
+    np.save(output_dir / KEYS_FILE, transaction_codes)
+
+    manifest = {
+        'layout': layout,
+        'rows': row_count,
+        'blocks': {block: {'file': f'{block}.npy', 'dtype': np.dtype(BLOCK_DTYPES[block]).name, 'columns': width}
+                   for block, width in block_widths.items()},
+        'columns': columns,
+        'keys': {'file': KEYS_FILE, 'dtype': 'int64', 'dictionary': key_entry},
+    }
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    return manifest
+
+
+# Open an exported feature matrix
+# With mmap (the default) every block is a read-only memory map: nothing is read until it is indexed
+# Raises ValueError when a block file does not match its manifest entry
+# Returns dictionary with manifest, blocks (name -> array), columns (name -> manifest entry) and transaction_codes
+def load_feature_matrix(input_dir, mmap=True):
+    input_dir = Path(input_dir)
+    manifest = json.loads((input_dir / MANIFEST_FILE).read_text())
+    mmap_mode = 'r' if mmap else None
+
+    blocks = {}
+    for block, entry in manifest['blocks'].items():
+        matrix = np.load(input_dir / entry['file'], mmap_mode=mmap_mode)
+        if matrix.shape != (manifest['rows'], entry['columns']) or matrix.dtype.name != entry['dtype']:
+            raise ValueError(f"{entry['file']} has shape {matrix.shape} and dtype {matrix.dtype}; "
+                             f"manifest expects ({manifest['rows']}, {entry['columns']}) {entry['dtype']}")
+        blocks[block] = matrix
+
+    return {
+        'manifest': manifest,
+        'blocks': blocks,
+        'columns': {column['name']: column for column in manifest['columns']},
+        'transaction_codes': np.load(input_dir / manifest['keys']['file'], mmap_mode=mmap_mode),
+    }
+
+
+# Read one feature column of a loaded matrix (a strided view when the block is memory-mapped)
+def feature_column(features, column_name):
+    column = features['columns'][column_name]
+    return features['blocks'][column['block']][:, column['position']]
+
+
+# Decode the Transaction ID codes of a loaded matrix back to the original strings
+def transaction_ids(features):
+    return decode_key_column(features['transaction_codes'], features['manifest']['keys']['dictionary'])
+
+
+# Rebuild a dataframe from a loaded matrix (for checks and debugging; reads every block into memory)
+# Dates come back as datetime64, binary columns as uint8 and everything else as float32
+def feature_matrix_to_dataframe(features):
+    data = {TRANSACTION_ID: transaction_ids(features)}
+
+    for column in features['manifest']['columns']:
+        values = np.asarray(feature_column(features, column['name']))
+        if column['encoding'] == 'days_since_epoch':
+            values = EPOCH + values.astype(np.int64)
+        data[column['name']] = values
+
+    return pd.DataFrame(data)
+
+
+# Compare a loaded matrix with the dataframe it was exported from
+# Returns dictionary of column name to maximum absolute difference (0.0 means exact)
+def compare_with_source(features, dataframe):
+    if not np.array_equal(features['transaction_codes'], encode_transaction_ids(dataframe[TRANSACTION_ID])[0]):
+        raise ValueError(f'{TRANSACTION_ID} codes do not match the source dataframe')
+
+    differences = {}
+    for column in features['manifest']['columns']:
+        stored = np.asarray(feature_column(features, column['name']), dtype=np.float64)
+        if column['encoding'] == 'days_since_epoch':
+            original = dates_to_day_numbers(dataframe[column['name']], column['name']).astype(np.float64)
+        else:
+            original = dataframe[column['name']].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        differences[column['name']] = float(np.nanmax(np.abs(stored - original))) if len(original) else 0.0
+
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an encoded dataset as a memory-mappable NumPy feature matrix.')
+    parser.add_argument('input', type=Path, help='encoded CSV (e.g. final_fully_encoded_dataset.csv)')
+    parser.add_argument('--output', type=Path, required=True, help='directory for the .npy files and manifest')
+    parser.add_argument('--layout', choices=LAYOUTS, default='float32',
+                        help='one float32 matrix, or uint8 binary + float32 numeric blocks (default: float32)')
+    parser.add_argument('--check', action='store_true', help='reload the export and report the largest difference per column')
+    arguments = parser.parse_args()
+
+    dataframe = pd.read_csv(arguments.input)
+    manifest = export_feature_matrix(dataframe, arguments.output, arguments.layout)
+
+    for block, entry in manifest['blocks'].items():
+        size_mb = (arguments.output / entry['file']).stat().st_size / (1024 * 1024)
+        print(f"{entry['file']}: {manifest['rows']} x {entry['columns']} {entry['dtype']} ({size_mb:.1f} MB)")
+
+    if arguments.check:
+        differences = compare_with_source(load_feature_matrix(arguments.output), dataframe)
+        print('Largest difference per column (float32 rounding):')
+        for column_name, difference in differences.items():
+            print(f'  {column_name:40s} {difference:.3g}')
+
+
+if __name__ == '__main__':
+    main()
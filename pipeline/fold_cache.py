@@ -0,0 +1,266 @@
+"""
+Fold-Aware Transform Fitting
+
+Evaluating a model over K folds means fitting every encoder and scaler K
+times, each time on the rows outside one fold. Every fitted transform of
+pipeline.out_of_core is built from mergeable sufficient statistics (Category
+x Item counts, target sums and counts per Item and Customer ID, one-hot
+vocabularies, count / mean / M2 / min / max moments, exact value-count
+histograms for the quartiles), so:
+
+  1. the cleaned rows are reduced to one set of statistics per fold (one pass)
+  2. fold k's training statistics are the merge of every other fold's:
+     prefix merges (folds < k) and suffix merges (folds > k) give all K
+     training sets with 2K merges of fold-sized statistics
+  3. fit_transforms turns each into the fitted transforms of fold k
+
+The statistics do not grow with the rows, so K-fold fitting costs about one
+pass instead of K. The fitted transforms of all folds are cached as JSON,
+keyed by the raw dataset, the fold assignment and this code; a warm cache
+skips the pass entirely.
+
+Usage:
+    python -m pipeline.fold_cache --folds 5 --check
+    python -m pipeline.fold_cache --folds 5 --seed 7 --output /tmp/folds
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.folds import RANDOM_STATE, kfold_assignment
+from pipeline.out_of_core import (CUSTOMER_ID, ITEM, chunk_aggregates, clean_chunk, encode_chunk, fit_transforms, impute_items,
+                                  lookup, merge_aggregates, rescale_chunk)
+from pipeline.stages import RAW_DATASET, REPO_ROOT, SUBMISSION_DIR
+
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_FOLDS = 5
+CACHE_DIR = 'output/.fold_cache'
+
+CUSTOMER_ENCODED = 'Customer ID Target Encoded'
+ITEM_ENCODED = 'Item Target Encoded'
+
+# Code whose changes invalidate cached transforms
+CACHED_CODE = ['pipeline/fold_cache.py', 'pipeline/out_of_core.py', 'pipeline/group_index.py', 'pipeline/dtype_plan.py']
+
+
+# Read the raw dataset as text and apply the row-local cleaning (see out_of_core.clean_chunk)
+def load_cleaned_rows(raw_csv):
+    return clean_chunk(pd.read_csv(raw_csv, dtype='str')).reset_index(drop=True)
+
+
+# Sufficient statistics of every fold, in one pass over the cleaned rows
+# Returns list of aggregate dictionaries (see out_of_core.chunk_aggregates), one per fold
+def fold_statistics(cleaned, folds, fold_count):
+    return [chunk_aggregates(cleaned[folds == fold]) for fold in range(fold_count)]
+
+
+# Merge two statistics, either of which may be None
+def combine_statistics(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+
+    return merge_aggregates(first, second)
+
+
+# Training statistics of every fold: the merge of all other folds, from prefix and suffix merges
+# Returns list of aggregate dictionaries, one per fold
+def training_statistics(per_fold):
+    fold_count = len(per_fold)
+    prefixes, suffixes = [None] * (fold_count + 1), [None] * (fold_count + 1)
+
+    for fold in range(fold_count):
+        prefixes[fold + 1] = combine_statistics(prefixes[fold], per_fold[fold])
+    for fold in reversed(range(fold_count)):
+        suffixes[fold] = combine_statistics(per_fold[fold], suffixes[fold + 1])
+
+    return [combine_statistics(prefixes[fold], suffixes[fold + 1]) for fold in range(fold_count)]
+
+
+# Fitted transforms of every fold from the per-fold statistics
+# Returns list of fitted transform dictionaries (see out_of_core.fit_transforms), one per fold
+def fit_fold_transforms(cleaned, folds, fold_count):
+    return [fit_transforms(statistics) for statistics in training_statistics(fold_statistics(cleaned, folds, fold_count))]
+
+
+# Fitted transforms of every fold by refitting on each training set separately (K passes; for checks)
+def refit_fold_transforms(cleaned, folds, fold_count):
+    return [fit_transforms(chunk_aggregates(cleaned[folds != fold])) for fold in range(fold_count)]
+
+
+# JSON form of a pandas Series (labels, values and dtype)
+def series_to_json(series):
+    return {'index': series.index.tolist(), 'values': series.tolist(), 'dtype': str(series.dtype)}
+
+
+def series_from_json(stored):
+    return pd.Series(stored['values'], index=pd.Index(stored['index'], dtype=object), dtype=stored['dtype'])
+
+
+# JSON form of fitted transforms; every Series keeps its labels and dtype
+def transforms_to_json(model):
+    return {
+        'rows': int(model['rows']),
+        'global_mean': float(model['global_mean']),
+        'item_modes': series_to_json(model['item_modes']),
+        'fold_means': [series_to_json(means) for means in model['fold_means']],
+        'item_means': series_to_json(model['item_means']),
+        'customer_sums': series_to_json(model['customer_sums']),
+        'customer_counts': series_to_json(model['customer_counts']),
+        'vocabularies': model['vocabularies'],
+        'scalers': {column: {name: float(value) for name, value in scaler.items()} for column, scaler in model['scalers'].items()},
+        'date_min': int(model['date_min']),
+        'date_range': int(model['date_range']),
+    }
+
+
+def transforms_from_json(stored):
+    return dict(
+        stored,
+        item_modes=series_from_json(stored['item_modes']),
+        fold_means=[series_from_json(means) for means in stored['fold_means']],
+        item_means=series_from_json(stored['item_means']),
+        customer_sums=series_from_json(stored['customer_sums']),
+        customer_counts=series_from_json(stored['customer_counts']),
+    )
+
+
+# Cache key of the fitted transforms: raw dataset, fold assignment and the code that fits them
+def cache_key(raw_csv, folds):
+    digest = hashlib.sha256()
+    digest.update(Path(raw_csv).read_bytes())
+    digest.update(np.ascontiguousarray(folds, dtype=np.int64).tobytes())
+    for relative_path in CACHED_CODE:
+        digest.update((REPO_ROOT / relative_path).read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+# Fitted transforms of every fold, from the cache when it holds them, otherwise fitted and cached
+# Returns tuple of (list of fitted transforms, whether the cache was hit)
+def cached_fold_transforms(raw_csv, folds, fold_count, cache_dir, cleaned=None):
+    cache_path = Path(cache_dir) / f'{cache_key(raw_csv, folds)}.json'
+
+    if cache_path.exists():
+        stored = json.loads(cache_path.read_text())
+        if stored.get('format_version') == CACHE_FORMAT_VERSION and stored.get('folds') == fold_count:
+            return [transforms_from_json(model) for model in stored['transforms']], True
+
+    cleaned = load_cleaned_rows(raw_csv) if cleaned is None else cleaned
+    models = fit_fold_transforms(cleaned, folds, fold_count)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps({'format_version': CACHE_FORMAT_VERSION, 'folds': fold_count,
+                                      'transforms': [transforms_to_json(model) for model in models]}))
+
+    return models, False
+
+
+# Target encodings of held-out rows: the training mean of their Customer ID and Item, the global mean when unseen
+# (the leave-one-out and out-of-fold encodings of encode_chunk assume the row is part of the training data)
+def held_out_target_encodings(rows, model):
+    global_mean = model['global_mean']
+    customer_means = model['customer_sums'] / model['customer_counts']
+
+    return {
+        CUSTOMER_ENCODED: lookup(customer_means, rows[CUSTOMER_ID], fill=global_mean),
+        ITEM_ENCODED: lookup(model['item_means'], rows[ITEM], fill=global_mean),
+    }
+
+
+# Encoded and rescaled rows of one fold's training and validation sets, transformed with that fold's fitted transforms
+# Returns tuple of (training features, validation features)
+def transform_fold(cleaned, folds, fold, model):
+    def transform(rows, held_out):
+        imputed = impute_items(rows, model['item_modes'])
+        encoded = encode_chunk(imputed, model)
+        if held_out:
+            encoded = apply_dtype_plan(encoded.assign(**held_out_target_encodings(imputed, model)), columns=[CUSTOMER_ENCODED, ITEM_ENCODED])
+        rescaled = rescale_chunk(imputed, model)
+        return encoded.assign(**{column: rescaled[column] for column in rescaled.columns.difference(imputed.columns, sort=False)})
+
+    return transform(cleaned[folds != fold], held_out=False), transform(cleaned[folds == fold], held_out=True)
+
+
+# Largest difference between two fitted transforms (numbers), or None when labels or vocabularies differ
+def transforms_difference(first, second):
+    if not first['item_modes'].equals(second['item_modes']) or first['vocabularies'] != second['vocabularies']:
+        return None
+
+    gaps = [abs(first['global_mean'] - second['global_mean'])]
+    for name in ('customer_sums', 'customer_counts'):
+        if not first[name].index.equals(second[name].index):
+            return None
+        gaps.append(float(np.abs(first[name].to_numpy(dtype=np.float64) - second[name].to_numpy(dtype=np.float64)).max()))
+    for first_means, second_means in zip(first['fold_means'] + [first['item_means']], second['fold_means'] + [second['item_means']]):
+        first_means, second_means = first_means.sort_index(), second_means.sort_index()
+        if not first_means.index.equals(second_means.index):
+            return None
+        gaps.append(float(np.abs(first_means.to_numpy() - second_means.to_numpy()).max()))
+    for column, scaler in first['scalers'].items():
+        gaps += [abs(value - second['scalers'][column][name]) for name, value in scaler.items()]
+
+    return max(gaps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the encoders and scalers of every cross-validation fold from per-fold statistics.')
+    parser.add_argument('input', type=Path, nargs='?', default=SUBMISSION_DIR / RAW_DATASET,
+                        help='raw transactions (default: the submission dataset)')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help=f'number of folds (default: {DEFAULT_FOLDS})')
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE, help=f'shuffle seed of the fold assignment (default: {RANDOM_STATE})')
+    parser.add_argument('--cache-dir', type=Path, default=SUBMISSION_DIR / CACHE_DIR,
+                        help=f'where fitted transforms are cached (default: submission/{CACHE_DIR})')
+    parser.add_argument('--output', type=Path, help='write fold_<k>_train.csv and fold_<k>_validation.csv here')
+    parser.add_argument('--check', action='store_true', help='compare with refitting every fold separately and time both')
+    arguments = parser.parse_args()
+
+    if arguments.folds < 2:
+        parser.error('--folds must be at least 2')
+
+    start = time.perf_counter()
+    cleaned = load_cleaned_rows(arguments.input)
+    folds = kfold_assignment(len(cleaned), arguments.folds, arguments.seed)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    models, cache_hit = cached_fold_transforms(arguments.input, folds, arguments.folds, arguments.cache_dir, cleaned)
+    fit_seconds = time.perf_counter() - start
+    summary = {'rows': len(cleaned), 'folds': arguments.folds, 'load_seconds': load_seconds,
+               'fit_seconds': fit_seconds, 'cache_hit': cache_hit}
+
+    if arguments.check:
+        start = time.perf_counter()
+        fold_aware = fit_fold_transforms(cleaned, folds, arguments.folds)
+        summary['fold_statistics_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        refitted = refit_fold_transforms(cleaned, folds, arguments.folds)
+        summary['refit_seconds'] = time.perf_counter() - start
+
+        differences = [transforms_difference(first, second) for first, second in zip(fold_aware, refitted)]
+        differences += [transforms_difference(first, second) for first, second in zip(models, refitted)]
+        summary['max_difference_from_refit'] = None if None in differences else max(differences)
+
+    if arguments.output:
+        arguments.output.mkdir(parents=True, exist_ok=True)
+        for fold, model in enumerate(models):
+            training, validation = transform_fold(cleaned, folds, fold, model)
+            training.to_csv(arguments.output / f'fold_{fold}_train.csv', index=False)
+            validation.to_csv(arguments.output / f'fold_{fold}_validation.csv', index=False)
+        summary['output'] = str(arguments.output)
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
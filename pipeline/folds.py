@@ -0,0 +1,41 @@
+"""
+K-Fold Assignment
+
+Shuffled K-fold splits computed with NumPy alone, identical to
+sklearn.model_selection.KFold(n_splits, shuffle=True, random_state) for an
+integer seed, so the encoders do not need to import scikit-learn.
+
+Usage:
+    for train_rows, encode_rows in kfold_splits(len(dataframe)):
+        ...
+"""
+
+import numpy as np
+
+
+# 2-fold Item target encoding parameters (as in item_encode_data_2c.py)
+N_SPLITS = 2
+RANDOM_STATE = 42
+
+
+# Fold number of every row for shuffled KFold, identical to sklearn KFold(n_splits, shuffle=True, random_state)
+# The first row_count % n_splits folds get one extra row
+def kfold_assignment(row_count, n_splits=N_SPLITS, random_state=RANDOM_STATE):
+    positions = np.arange(row_count)
+    np.random.RandomState(random_state).shuffle(positions)
+
+    fold_sizes = np.full(n_splits, row_count // n_splits)
+    fold_sizes[:row_count % n_splits] += 1
+
+    folds = np.empty(row_count, dtype=np.int8)
+    folds[positions] = np.repeat(np.arange(n_splits), fold_sizes)
+
+    return folds
+
+
+# (train_rows, validation_rows) per fold, both sorted, in the order KFold.split yields them
+def kfold_splits(row_count, n_splits=N_SPLITS, random_state=RANDOM_STATE):
+    folds = kfold_assignment(row_count, n_splits, random_state)
+
+    for fold in range(n_splits):
+        yield np.flatnonzero(folds != fold), np.flatnonzero(folds == fold)
@@ -0,0 +1,263 @@
+"""
+Shared Factorized Group Index
+
+Builds, once per loaded dataset, the factorized form of every grouping
+column (Category, Payment Method, Location, Item, Customer ID):
+
+  codes    per-row group number (int64), -1 where the value is missing
+  uniques  group labels in sorted order (codes index into them)
+  sizes    number of rows per group
+  order    optional stable sort permutation of the rows by group, with
+  starts   the offset of each group inside it (for np.<ufunc>.reduceat)
+
+Every groupby-style computation of the pipeline (shares, sums, means,
+modes, distinct counts, one-hot matrices) then runs as np.bincount or
+np.add.reduceat over the codes, so each column is hashed once per run.
+Key columns (Customer ID, Item) can instead be built from their compact
+integer codes (pipeline.keys): the integers are grouped directly and only
+the distinct keys are decoded back into labels.
+
+Usage:
+    group_index = build_group_index(dataframe)
+    group_index = build_group_index(dataframe, columns=('Item',), keys=compact_keys(dataframe, columns=('Item',)))
+    missing_share = group_share(group_index['Category'], dataframe['Item'].isna())
+    category_matrix = one_hot(group_index['Category'])
+"""
+
+import numpy as np
+import pandas as pd
+
+from pipeline.keys import MISSING_CODE, decode_key_column
+
+
+GROUP_COLUMNS = ('Category', 'Payment Method', 'Location', 'Item', 'Customer ID')
+
+MISSING_GROUP = -1
+
+
+# Factorize one column into a group index entry
+# Uniques are sorted, so group order matches pandas groupby and get_dummies
+# Returns dictionary with column, codes, uniques, sizes and missing count (plus order/starts when requested)
+def factorize_group_column(values, column=None, with_order=False):
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, sort=True)
+
+    return group_entry(codes, uniques, column if column is not None else values.name, with_order)
+
+
+# Group index entry of a compact key column (codes and dictionary entry from pipeline.keys)
+# The integer codes are grouped without hashing the key strings; only the distinct codes are decoded,
+# and groups are numbered in sorted label order, so the entry equals factorize_group_column's
+def key_group_column(key_codes, key_entry, column, with_order=False):
+    key_codes = np.asarray(key_codes)
+    present = key_codes != MISSING_CODE
+    unique_codes, unique_positions = np.unique(key_codes[present], return_inverse=True)
+
+    labels = decode_key_column(unique_codes, key_entry)
+    label_order = np.argsort(labels, kind='stable')
+    label_ranks = np.empty(len(labels), dtype=np.int64)
+    label_ranks[label_order] = np.arange(len(labels))
+
+    codes = np.full(len(key_codes), MISSING_GROUP, dtype=np.int64)
+    codes[present] = label_ranks[unique_positions]
+
+    return group_entry(codes, pd.Index(labels[label_order]), column, with_order)
+
+
+# Assemble a group index entry from per-row group codes and their labels
+def group_entry(codes, uniques, column, with_order=False):
+    entry = {
+        'column': column,
+        'codes': codes,
+        'uniques': uniques,
+        'sizes': np.bincount(codes[codes != MISSING_GROUP], minlength=len(uniques)),
+        'missing': int((codes == MISSING_GROUP).sum()),
+    }
+
+    if with_order:
+        add_sort_order(entry)
+
+    return entry
+
+
+# Add the stable sort permutation and group start offsets to an entry
+# Rows with a missing value sort first and are excluded from starts
+def add_sort_order(entry):
+    entry['order'] = np.argsort(entry['codes'], kind='stable')
+    entry['starts'] = entry['missing'] + np.concatenate(([0], np.cumsum(entry['sizes'])[:-1]))
+    return entry
+
+
+# Build the group index of a dataframe: one entry per grouping column present
+# keys is the (codes, key dictionary) pair of pipeline.keys.compact_keys; columns it covers are built from their codes
+# Returns dictionary of column name to entry
+def build_group_index(dataframe, columns=GROUP_COLUMNS, with_order=False, keys=None):
+    key_codes, key_dictionary = keys if keys is not None else ({}, {})
+
+    return {
+        column: key_group_column(key_codes[column], key_dictionary[column], column, with_order)
+        if column in key_codes else factorize_group_column(dataframe[column], column, with_order)
+        for column in columns
+        if column in dataframe.columns
+    }
+
+
+# Restrict codes (and optional per-row values) to rows that have a group and, if given, are selected
+# rows may be a boolean mask or an array of row positions
+def select_grouped_rows(entry, rows=None, values=None):
+    codes = entry['codes']
+    if rows is not None:
+        codes = codes[rows]
+        values = values[rows] if values is not None else None
+
+    keep = codes != MISSING_GROUP
+    return codes[keep], (values[keep] if values is not None else None)
+
+
+# Number of rows per group, optionally counting only rows where mask is True
+# Returns NumPy int64 array with one count per group
+def group_count(entry, mask=None, rows=None):
+    if mask is None and rows is None:
+        return entry['sizes']
+
+    codes, selected = select_grouped_rows(entry, rows, None if mask is None else np.asarray(mask, dtype=bool))
+    if selected is not None:
+        codes = codes[selected]
+
+    return np.bincount(codes, minlength=len(entry['uniques']))
+
+
+# Group sizes as a Series sorted by size, like Series.value_counts()
+# normalize=True divides by the number of rows that have a group
+def group_sizes(entry, normalize=False):
+    sizes = entry['sizes'] / entry['sizes'].sum() if normalize else entry['sizes']
+    index = pd.Index(entry['uniques'], name=entry['column'])
+
+    return pd.Series(sizes, index=index, name='proportion' if normalize else 'count').sort_values(ascending=False, kind='stable')
+
+
+# Sum of values per group; NaN values are skipped like pandas groupby sum
+# Returns NumPy float64 array with one sum per group
+def group_sum(entry, values, rows=None):
+    codes, values = select_grouped_rows(entry, rows, np.asarray(values, dtype=np.float64))
+    present = ~np.isnan(values)
+
+    return np.bincount(codes[present], weights=values[present], minlength=len(entry['uniques']))
+
+
+# Count of non-NaN values per group (pandas groupby count)
+def group_value_count(entry, values, rows=None):
+    codes, values = select_grouped_rows(entry, rows, np.asarray(values, dtype=np.float64))
+    return np.bincount(codes[~np.isnan(values)], minlength=len(entry['uniques']))
+
+
+# Mean of values per group; NaN for groups without values
+# Returns NumPy float64 array with one mean per group
+def group_mean(entry, values, rows=None):
+    sums = group_sum(entry, values, rows)
+    counts = group_value_count(entry, values, rows)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+# Share of rows per group where mask is True (mean of a boolean column by group)
+# Returns Series indexed by group label
+def group_share(entry, mask, name=None):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = group_count(entry, mask) / entry['sizes']
+
+    return pd.Series(shares, index=pd.Index(entry['uniques'], name=entry['column']), name=name)
+
+
+# Most frequent value (as a code of value_entry) per group of entry
+# Ties go to the smallest label, like Series.mode()[0]; groups without values get MISSING_GROUP
+# Returns NumPy int64 array with one value code per group
+def group_mode(entry, value_entry, rows=None):
+    counts = group_value_counts(entry, value_entry, rows)
+
+    # value_entry uniques are sorted, so argmax (first maximum) is the smallest label among ties
+    modes = counts.argmax(axis=1)
+    modes[counts.max(axis=1) == 0] = MISSING_GROUP
+
+    return modes
+
+
+# Number of distinct values of value_entry per group of entry (pandas groupby nunique)
+def group_nunique(entry, value_entry, rows=None):
+    return (group_value_counts(entry, value_entry, rows) > 0).sum(axis=1)
+
+
+# Co-occurrence counts of two factorized columns (pandas crosstab without labels)
+# Rows where either value is missing are skipped
+# Returns 2D NumPy array of shape (groups of entry, groups of value_entry)
+def group_value_counts(entry, value_entry, rows=None):
+    group_codes = entry['codes']
+    value_codes = value_entry['codes']
+    if rows is not None:
+        group_codes = group_codes[rows]
+        value_codes = value_codes[rows]
+
+    keep = (group_codes != MISSING_GROUP) & (value_codes != MISSING_GROUP)
+    value_group_count = len(value_entry['uniques'])
+    pair_codes = group_codes[keep] * value_group_count + value_codes[keep]
+
+    counts = np.bincount(pair_codes, minlength=len(entry['uniques']) * value_group_count)
+    return counts.reshape(len(entry['uniques']), value_group_count)
+
+
+# Apply a NumPy ufunc reduction per group over sorted rows (np.<ufunc>.reduceat)
+# Needs the sort order (with_order=True or add_sort_order); empty groups get fill
+# Returns NumPy array with one reduced value per group
+def group_reduce(entry, values, ufunc=np.add, fill=np.nan):
+    if 'order' not in entry:
+        add_sort_order(entry)
+
+    sorted_values = np.asarray(values)[entry['order']]
+    non_empty = entry['sizes'] > 0
+
+    reduced = np.full(len(entry['uniques']), fill, dtype=np.result_type(sorted_values, type(fill)))
+    if non_empty.any():
+        reduced[non_empty] = ufunc.reduceat(sorted_values, entry['starts'][non_empty])
+
+    return reduced
+
+
+# Broadcast one value per group back to the rows (optionally only the selected rows)
+# Rows without a group get fill
+# Returns NumPy array with one value per row
+def broadcast_to_rows(entry, group_values, fill=np.nan, rows=None):
+    row_values = np.append(np.asarray(group_values), fill)
+    codes = entry['codes'] if rows is None else entry['codes'][rows]
+
+    # Code -1 (missing) picks the appended fill value
+    return row_values[codes]
+
+
+# One-hot matrix of a factorized column: one column per group, in sorted label order
+# Rows without a group are all zeros (like get_dummies with dummy_na=False)
+# Returns 2D NumPy array of shape (rows, groups)
+def one_hot(entry, dtype=np.uint8):
+    codes = entry['codes']
+    matrix = np.zeros((len(codes), len(entry['uniques'])), dtype=dtype)
+
+    grouped = codes != MISSING_GROUP
+    matrix[np.flatnonzero(grouped), codes[grouped]] = 1
+
+    return matrix
+
+
+# Replace the value of selected rows with existing groups, keeping sizes and order in sync
+# new_codes are codes of entry (one per selected row)
+def assign_group_codes(entry, rows, new_codes):
+    entry['codes'] = entry['codes'].copy()
+    entry['codes'][rows] = new_codes
+
+    grouped = entry['codes'] != MISSING_GROUP
+    entry['sizes'] = np.bincount(entry['codes'][grouped], minlength=len(entry['uniques']))
+    entry['missing'] = int((~grouped).sum())
+
+    if 'order' in entry:
+        add_sort_order(entry)
+
+    return entry
@@ -0,0 +1,25 @@
+"""
+Headless Runs
+
+Batch runs of the stage scripts have no display, so plotting only costs
+time (importing matplotlib and seaborn alone takes about a second). With
+PIPELINE_HEADLESS set the scripts skip their plots, and because the
+plotting libraries are imported inside the plotting functions they are
+never imported at all. pipeline.stages turns headless mode on by default.
+
+Usage:
+    PIPELINE_HEADLESS=1 python submission/sources/2_handle_encoding_data/category_encode_data_2c.py
+
+    if is_headless():
+        return
+"""
+
+import os
+
+
+HEADLESS_VARIABLE = 'PIPELINE_HEADLESS'
+
+
+# Whether plots should be skipped: PIPELINE_HEADLESS is set to anything but '', '0', 'false' or 'no'
+def is_headless():
+    return os.environ.get(HEADLESS_VARIABLE, '').strip().lower() not in ('', '0', 'false', 'no')
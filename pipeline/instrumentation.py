@@ -0,0 +1,214 @@
+"""
+Per-Stage Timing and Memory Instrumentation
+
+Wraps the step functions of any pipeline script (load_*, analyze_*,
+perform_*, apply_*, save_*, ...) so that running its main() records, for
+every call: wall time, CPU time, tracemalloc peak, net allocation, rows in
+and rows out. The trace for one run is written as JSON.
+
+Works with any script that follows the repo layout (handle_missing_data,
+handle_encoding_data, handle_rescale_data or submission/sources); main()
+itself is not wrapped, only the functions it calls.
+
+Usage:
+    python -m pipeline.instrumentation handle_missing_data/source/item.py --trace item_trace.json
+    python -m pipeline.instrumentation encode_customer_id --workdir /tmp/run --trace trace.json
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib.util
+import io
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline.headless import HEADLESS_VARIABLE
+from pipeline.stages import STAGES_BY_NAME, load_stage_module, reroot_stage_paths
+
+
+# Functions with these prefixes are the pipeline steps of every script
+STAGE_FUNCTION_PREFIXES = (
+    'load_', 'analyze_', 'perform_', 'apply_', 'save_', 'quantify_', 'assess_', 'validate_',
+    'reconstruct_', 'impute_', 'fill_', 'compute_', 'combine_', 'drop_', 'prepare_', 'process_',
+    'display_', 'verify_', 'visualize_', 'compare_', 'convert_', 'min_max_',
+)
+
+
+# Number of rows in the first dataframe or series found in a value
+# Tuples (the usual multi-value return) are searched in order; returns None when there is none
+def count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            if isinstance(item, (pd.DataFrame, pd.Series)):
+                return len(item)
+
+    return None
+
+
+# Wrap one function so every call appends a record to the trace
+# call_stack keeps nested calls from resetting the tracemalloc peak of their caller
+def instrument_function(function, trace, call_stack, track_memory):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        frame = {'peak': 0}
+
+        if track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if call_stack:
+                call_stack[-1]['peak'] = max(call_stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start'] = current
+
+        call_stack.append(frame)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            call_stack.pop()
+
+        record = {
+            'function': function.__name__,
+            'depth': len(call_stack),
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'rows_in': count_rows(list(args) + list(kwargs.values())),
+            'rows_out': count_rows(result),
+        }
+
+        if track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record['tracemalloc_peak_mb'] = (max(frame['peak'], peak) - frame['start']) / (1024 * 1024)
+            record['net_allocated_mb'] = (current - frame['start']) / (1024 * 1024)
+
+        trace.append(record)
+        return result
+
+    return wrapper
+
+
+# Replace the step functions of a loaded script module with instrumented versions
+# Only functions defined in the module itself are wrapped; main() is left alone
+# Returns the list that will receive one record per call
+def instrument_module(module, prefixes=STAGE_FUNCTION_PREFIXES, track_memory=True):
+    trace = []
+    call_stack = []
+
+    for attribute_name, value in list(vars(module).items()):
+        if not callable(value) or getattr(value, '__module__', None) != module.__name__:
+            continue
+        if attribute_name == 'main' or not attribute_name.startswith(prefixes):
+            continue
+
+        setattr(module, attribute_name, instrument_function(value, trace, call_stack, track_memory))
+
+    return trace
+
+
+# Aggregate call records per function, slowest first
+# Returns list of dictionaries with call count and totals
+def summarize_trace(trace):
+    if not trace:
+        return []
+
+    trace_dataframe = pd.DataFrame(trace)
+    aggregations = {'calls': ('function', 'size'), 'wall_seconds': ('wall_seconds', 'sum'), 'cpu_seconds': ('cpu_seconds', 'sum')}
+    if 'tracemalloc_peak_mb' in trace_dataframe:
+        aggregations['tracemalloc_peak_mb'] = ('tracemalloc_peak_mb', 'max')
+
+    summary = trace_dataframe.groupby('function', sort=False).agg(**aggregations)
+    summary = summary.sort_values('wall_seconds', ascending=False).reset_index()
+
+    return summary.to_dict(orient='records')
+
+
+# Import a script by file path without running its main()
+def load_script_module(script_path):
+    script_path = Path(script_path).resolve()
+    spec = importlib.util.spec_from_file_location('instrumented_' + script_path.stem, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Run a script's main() with every step function instrumented
+# target is a stage name from pipeline.stages or a path to any pipeline script
+# Returns trace dictionary (per-call records plus per-function summary)
+def run_instrumented(target, workdir=None, track_memory=True, verbose=False):
+    # Headless like pipeline.stages.run_stage: plots are skipped and their libraries never imported
+    os.environ.setdefault(HEADLESS_VARIABLE, '1')
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    if target in STAGES_BY_NAME:
+        module = load_stage_module(STAGES_BY_NAME[target])
+        if workdir is not None:
+            reroot_stage_paths(module, workdir)
+    else:
+        module = load_script_module(target)
+
+    trace = instrument_module(module, track_memory=track_memory)
+
+    if track_memory:
+        tracemalloc.start()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    output_sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output_sink:
+            module.main()
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+
+    return {
+        'target': str(target),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'total_wall_seconds': time.perf_counter() - wall_start,
+        'total_cpu_seconds': time.process_time() - cpu_start,
+        'memory_tracked': track_memory,
+        'calls': trace,
+        'summary': summarize_trace(trace),
+    }
+
+
+# Print the per-function summary as a table
+def display_trace_summary(trace_report):
+    print(f"TRACE: {trace_report['target']} ({trace_report['total_wall_seconds']:.3f}s wall)")
+    if trace_report['summary']:
+        print(pd.DataFrame(trace_report['summary']).to_string(index=False, float_format=lambda value: f'{value:.4f}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a pipeline script with per-step timing and memory tracing.')
+    parser.add_argument('target', help='stage name (see pipeline.stages) or path to a pipeline script')
+    parser.add_argument('--trace', type=Path, help='write the JSON trace to this file')
+    parser.add_argument('--workdir', type=Path, help='re-root a stage into this working directory')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (lower overhead)')
+    parser.add_argument('--verbose', action='store_true', help='show the script output')
+    arguments = parser.parse_args()
+
+    trace_report = run_instrumented(arguments.target, arguments.workdir, not arguments.no_memory, arguments.verbose)
+    display_trace_summary(trace_report)
+
+    if arguments.trace:
+        arguments.trace.parent.mkdir(parents=True, exist_ok=True)
+        arguments.trace.write_text(json.dumps(trace_report, indent=2, default=float))
+        print(f'Trace written to {arguments.trace}')
+
+
+if __name__ == '__main__':
+    main()
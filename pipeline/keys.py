@@ -0,0 +1,183 @@
+"""
+Compact Integer Keys
+
+Parses the string keys carried through every stage into integer codes once,
+so stages can group, join and encode on integers instead of re-hashing
+Python object strings:
+
+  Transaction ID  TXN_1002182   -> 1002182                 (int64)
+  Customer ID     CUST_01       -> 1                       (int32)
+  Item            Item_5_FOOD   -> 5 * ITEM_CATEGORY_RADIX + index of FOOD  (int32)
+
+Missing keys get MISSING_CODE (-1). The key dictionary records the prefix,
+zero-padding width and Item category suffixes, so codes decode back to the
+exact original strings. It is plain JSON and can be saved next to a dataset.
+
+Usage:
+    codes, key_dictionary = compact_keys(dataframe)
+    customer_codes = codes['Customer ID']
+    customer_ids = decode_key_column(customer_codes, key_dictionary['Customer ID'])
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+TRANSACTION_ID = 'Transaction ID'
+CUSTOMER_ID = 'Customer ID'
+ITEM = 'Item'
+
+TRANSACTION_PREFIX = 'TXN_'
+CUSTOMER_PREFIX = 'CUST_'
+ITEM_PREFIX = 'Item_'
+
+MISSING_CODE = -1
+
+# Item codes are item number * radix + category suffix index, so up to 16 suffixes fit
+ITEM_CATEGORY_RADIX = 16
+ITEM_PATTERN = r'^Item_(\d+)_([A-Za-z]+)$'
+
+# Known category suffixes (Item_<n>_<SUFFIX> of each Category, in sorted order) come first,
+# so item codes are stable across datasets
+DEFAULT_ITEM_SUFFIXES = ['BEV', 'BUT', 'CEA', 'EHE', 'FOOD', 'FUR', 'MILK', 'PAT']
+
+KEY_COLUMNS = (TRANSACTION_ID, CUSTOMER_ID, ITEM)
+
+
+# Parse 'PREFIX<digits>' strings into int64 numbers
+# width is 0 when no number is zero-padded, otherwise the common digit count
+# Raises ValueError naming the first strings that do not match
+# Returns tuple of (numbers, width)
+def parse_prefixed_numbers(strings, prefix, column_name):
+    strings = pd.Series(strings)
+    digits = strings.str.slice(len(prefix))
+
+    valid = strings.str.startswith(prefix, na=False) & digits.str.isdigit().fillna(False).astype(bool)
+    if not valid.all():
+        raise ValueError(f'{column_name} values must look like {prefix}<digits>, got {list(strings[~valid][:5])}')
+
+    lengths = digits.str.len().to_numpy()
+    padded = digits.str.startswith('0').to_numpy() & (lengths > 1)
+
+    width = 0
+    if padded.any():
+        width = int(lengths[padded][0])
+        if (lengths != width).any():
+            raise ValueError(f'{column_name} mixes zero-padded and unpadded numbers; codes would not be reversible')
+
+    return digits.astype(np.int64).to_numpy(), width
+
+
+# Encode Transaction IDs as their numeric part (int64)
+# Every Transaction ID is distinct, so the strings are parsed directly without factorizing
+# Returns tuple of (codes, dictionary entry)
+def encode_transaction_ids(values):
+    values = pd.Series(values)
+    missing = values.isna().to_numpy()
+
+    codes = np.full(len(values), MISSING_CODE, dtype=np.int64)
+    numbers, width = parse_prefixed_numbers(values[~missing], TRANSACTION_PREFIX, TRANSACTION_ID)
+    codes[~missing] = numbers
+
+    return codes, {'column': TRANSACTION_ID, 'prefix': TRANSACTION_PREFIX, 'width': width}
+
+
+# Encode Customer IDs as their customer number (int32)
+# Only the distinct IDs are parsed; rows are mapped through the factorized codes
+# Returns tuple of (codes, dictionary entry)
+def encode_customer_ids(values):
+    row_codes, uniques = pd.factorize(pd.Series(values))
+    numbers, width = parse_prefixed_numbers(uniques, CUSTOMER_PREFIX, CUSTOMER_ID)
+
+    codes = np.append(numbers, MISSING_CODE).astype(np.int32)[row_codes]
+
+    return codes, {'column': CUSTOMER_ID, 'prefix': CUSTOMER_PREFIX, 'width': width}
+
+
+# Encode Items as item number * ITEM_CATEGORY_RADIX + category suffix index (int32)
+# suffixes lists the known category suffixes; new ones are appended in sorted order
+# Returns tuple of (codes, dictionary entry)
+def encode_items(values, suffixes=DEFAULT_ITEM_SUFFIXES):
+    row_codes, uniques = pd.factorize(pd.Series(values))
+
+    parts = pd.Series(uniques).str.extract(ITEM_PATTERN)
+    if parts.isna().any(axis=None):
+        raise ValueError(f'{ITEM} values must look like Item_<number>_<CATEGORY>, got {list(uniques[parts.isna().any(axis=1).to_numpy()][:5])}')
+
+    suffixes = list(suffixes) + sorted(set(parts[1]) - set(suffixes))
+    if len(suffixes) > ITEM_CATEGORY_RADIX:
+        raise ValueError(f'At most {ITEM_CATEGORY_RADIX} Item category suffixes fit the code, got {len(suffixes)}')
+
+    numbers, width = parse_prefixed_numbers(parts[0].to_numpy(), '', ITEM)
+    suffix_indices = pd.Index(suffixes).get_indexer(parts[1])
+
+    unique_codes = numbers * ITEM_CATEGORY_RADIX + suffix_indices
+    codes = np.append(unique_codes, MISSING_CODE).astype(np.int32)[row_codes]
+
+    return codes, {'column': ITEM, 'prefix': ITEM_PREFIX, 'width': width, 'suffixes': suffixes}
+
+
+KEY_ENCODERS = {
+    TRANSACTION_ID: encode_transaction_ids,
+    CUSTOMER_ID: encode_customer_ids,
+    ITEM: encode_items,
+}
+
+
+# Encode one key column by name
+# Returns tuple of (codes, dictionary entry)
+def encode_key_column(values, column_name):
+    if column_name not in KEY_ENCODERS:
+        raise KeyError(f'No key encoder for {column_name!r}; expected one of {list(KEY_ENCODERS)}')
+
+    return KEY_ENCODERS[column_name](values)
+
+
+# Turn codes back into the original key strings using a dictionary entry
+# MISSING_CODE decodes to None
+# Returns NumPy object array
+def decode_key_column(codes, entry):
+    codes = np.asarray(codes)
+    missing = codes == MISSING_CODE
+
+    unique_codes, row_codes = np.unique(codes[~missing], return_inverse=True)
+
+    if 'suffixes' in entry:
+        numbers, suffix_indices = np.divmod(unique_codes, ITEM_CATEGORY_RADIX)
+        suffix_labels = np.array(entry['suffixes'], dtype=object)[suffix_indices]
+        labels = [f"{entry['prefix']}{number:0{entry['width']}d}_{suffix}" for number, suffix in zip(numbers, suffix_labels)]
+    else:
+        labels = [f"{entry['prefix']}{number:0{entry['width']}d}" for number in unique_codes]
+
+    decoded = np.full(len(codes), None, dtype=object)
+    decoded[~missing] = np.array(labels, dtype=object)[row_codes]
+
+    return decoded
+
+
+# Compact every key column present in a dataframe
+# Returns tuple of (dictionary of column name to codes, key dictionary of column name to entry)
+def compact_keys(dataframe, columns=KEY_COLUMNS):
+    codes = {}
+    key_dictionary = {}
+
+    for column_name in columns:
+        if column_name in dataframe.columns:
+            codes[column_name], key_dictionary[column_name] = encode_key_column(dataframe[column_name], column_name)
+
+    return codes, key_dictionary
+
+
+# Save a key dictionary as JSON
+def save_key_dictionary(key_dictionary, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(key_dictionary, indent=2))
+
+
+# Load a key dictionary written by save_key_dictionary
+def load_key_dictionary(input_path):
+    return json.loads(Path(input_path).read_text())
@@ -0,0 +1,373 @@
+"""
+Lazy Pipeline Plan
+
+Describes the missing -> encoding -> rescale pipeline as a logical plan that
+is optimized before anything runs, instead of stage by stage on full frames:
+
+  scan     read the raw CSV / Parquet file
+  coerce   numeric columns to float (non-numbers become missing)
+  filter   drop rows where a column is missing (Total Spent listwise deletion)
+  derive   row-local column expressions (Price Per Unit = Total Spent / Quantity,
+           Discount Applied 'Unknown' fill, binary Location)
+  encode   whole-column encoders (Item mode per Category, target encodings, one-hot)
+  scale    whole-column scalers (min-max, z-score, robust)
+  sink     write the requested columns
+
+A plan is a list of node dictionaries; every node names the columns it reads
+(inputs) and writes (outputs). The optimizer rewrites the list in three passes:
+
+  prune_columns       walk back from the sink and keep only the nodes, derive
+                      expressions and scanned columns the sink depends on
+  push_down_filters   move coerce and missing-value filters into the scan, so
+                      each chunk is coerced and filtered right after parsing and
+                      deleted rows never reach a full frame
+  fuse_derivations    merge consecutive derive nodes into one assign
+
+Whole-column encoders and scalers fit on all rows, so filters are never moved
+past them. The executor runs the optimized plan on pandas with the operations
+of pipeline.pandas_backend; the result equals pipeline.backends.run_plan.
+
+Usage:
+    python -m pipeline.lazy_plan submission/datasource/Deliverable1Dataset.csv --explain
+    python -m pipeline.lazy_plan big.csv --output features.csv --columns "Transaction ID" Quantity_Robust
+    python -m pipeline.lazy_plan submission/datasource/Deliverable1Dataset.csv --check
+"""
+
+import argparse
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline import pandas_backend
+from pipeline.backends import (
+    CATEGORY, CUSTOMER_ID, DISCOUNT_APPLIED, ITEM, LOCATION, ONE_HOT_PREFIXES, PRICE_PER_UNIT, QUANTITY, RESCALE_PREFIXES,
+    TOTAL_SPENT, compare_frames, kfold_assignment, run_plan,
+)
+from pipeline.dtype_plan import planned_dtype
+
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+NUMERIC_COLUMNS = [PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]
+
+# Node kinds that read and write whole columns (fit on all rows); filters may not cross them
+WHOLE_COLUMN_OPS = ('encode', 'scale')
+
+
+# ============================================================================
+# PLAN NODES
+# ============================================================================
+
+# Read a CSV or Parquet file; columns=None reads every column
+def scan(path, columns=None):
+    return {'op': 'scan', 'path': Path(path), 'columns': columns, 'coerce': [], 'filters': []}
+
+
+# Coerce columns to numbers, like pd.to_numeric(errors='coerce')
+def coerce(columns):
+    return {'op': 'coerce', 'columns': list(columns)}
+
+
+# Drop rows where column is missing
+def filter_not_null(column):
+    return {'op': 'filter', 'column': column}
+
+
+# Row-local expressions: dictionary of output column -> (function(frame) -> values, input columns)
+# Expressions are evaluated in order and may use outputs of earlier expressions
+def derive(expressions):
+    return {'op': 'derive', 'expressions': dict(expressions)}
+
+
+# Whole-column operation function(frame) -> frame; output_prefix marks data-dependent output names (one-hot)
+def whole_column(op, name, function, inputs, outputs=(), output_prefix=None):
+    return {'op': op, 'name': name, 'function': function, 'inputs': list(inputs), 'outputs': list(outputs),
+            'output_prefix': output_prefix}
+
+
+# Write the frame to path (None keeps it in memory); columns=None writes every column
+def sink(path=None, columns=None):
+    return {'op': 'sink', 'path': Path(path) if path is not None else None, 'columns': columns}
+
+
+# ============================================================================
+# PIPELINE PLAN
+# ============================================================================
+
+# Price Per Unit where present, else Total Spent / Quantity
+def reconstructed_price(frame):
+    return frame[PRICE_PER_UNIT].where(frame[PRICE_PER_UNIT].notna(), frame[TOTAL_SPENT] / frame[QUANTITY])
+
+
+def filled_discount(frame):
+    return frame[DISCOUNT_APPLIED].fillna('Unknown')
+
+
+def location_flags(frame):
+    return (frame[LOCATION] == 'Online').to_numpy(dtype='uint8')
+
+
+# 2-fold Item target encoding; folds are drawn over the rows that reach the encoder
+def encode_item_kfold(frame):
+    return pandas_backend.kfold_target_encode(frame, ITEM, TOTAL_SPENT, 'Item Target Encoded', kfold_assignment(len(frame)))
+
+
+# The plan of pipeline.backends.run_plan, with the row-local steps written as derive nodes
+# Row-local derivations do not touch Item, so they are listed together ahead of the Item imputation
+def build_pipeline_plan(input_path, output_path=None, columns=None):
+    plan = [
+        scan(input_path),
+        coerce(NUMERIC_COLUMNS),
+        filter_not_null(TOTAL_SPENT),
+        derive({PRICE_PER_UNIT: (reconstructed_price, [PRICE_PER_UNIT, TOTAL_SPENT, QUANTITY])}),
+        derive({DISCOUNT_APPLIED: (filled_discount, [DISCOUNT_APPLIED])}),
+        derive({'Location_Encoded': (location_flags, [LOCATION])}),
+        whole_column('encode', 'item_mode', partial(pandas_backend.impute_group_mode, column=ITEM, group_column=CATEGORY),
+                     [ITEM, CATEGORY], [ITEM]),
+        whole_column('encode', 'customer_loo',
+                     partial(pandas_backend.loo_target_encode, column=CUSTOMER_ID, target=TOTAL_SPENT, output='Customer ID Target Encoded'),
+                     [CUSTOMER_ID, TOTAL_SPENT], ['Customer ID Target Encoded']),
+        whole_column('encode', 'item_kfold', encode_item_kfold, [ITEM, TOTAL_SPENT], ['Item Target Encoded']),
+    ]
+
+    for column, prefix in ONE_HOT_PREFIXES.items():
+        plan.append(whole_column('encode', f'one_hot_{prefix}',
+                                 partial(pandas_backend.one_hot_encode, column=column, prefix=prefix, dtype=planned_dtype(f'{prefix}_{column}')),
+                                 [column], output_prefix=f'{prefix}_'))
+
+    for column, prefix in RESCALE_PREFIXES.items():
+        for scaler, suffix in ((pandas_backend.min_max_scale, 'Normalized'), (pandas_backend.standard_scale, 'Standardized'),
+                               (pandas_backend.robust_scale, 'Robust')):
+            output = f'{prefix}_{suffix}'
+            plan.append(whole_column('scale', output, partial(scaler, column=column, output=output), [column], [output]))
+
+    plan.append(sink(output_path, columns))
+
+    return plan
+
+
+# ============================================================================
+# OPTIMIZER
+# ============================================================================
+
+# Whether a node (or derive expression) writes any of the required columns
+def produces_required(outputs, output_prefix, required):
+    if any(output in required for output in outputs):
+        return True
+    return output_prefix is not None and any(column.startswith(output_prefix) for column in required)
+
+
+# Keep only what the sink depends on, walking the plan backwards
+# With sink columns=None every node is kept and the scan reads every column
+def prune_columns(plan):
+    sink_node = plan[-1]
+    if sink_node['columns'] is None:
+        return [dict(node) for node in plan]
+
+    required = set(sink_node['columns'])
+    pruned = [dict(sink_node)]
+
+    for node in reversed(plan[:-1]):
+        node = dict(node)
+
+        if node['op'] == 'scan':
+            node['columns'] = sorted(required)
+        elif node['op'] == 'coerce':
+            node['columns'] = [column for column in node['columns'] if column in required]
+            if not node['columns']:
+                continue
+        elif node['op'] == 'filter':
+            required.add(node['column'])
+        elif node['op'] == 'derive':
+            # Later expressions may read earlier ones, so expressions are visited last to first
+            kept = {}
+            for output, (function, inputs) in reversed(list(node['expressions'].items())):
+                if output in required:
+                    required.discard(output)
+                    required.update(inputs)
+                    kept[output] = (function, inputs)
+            if not kept:
+                continue
+            node['expressions'] = dict(reversed(list(kept.items())))
+        else:
+            if not produces_required(node['outputs'], node['output_prefix'], required):
+                continue
+            required.difference_update(node['outputs'])
+            if node['output_prefix'] is not None:
+                required = {column for column in required if not column.startswith(node['output_prefix'])}
+            required.update(node['inputs'])
+
+        pruned.append(node)
+
+    return pruned[::-1]
+
+
+# Move coerce nodes and not-null filters that directly follow the scan (or each other) into the scan
+# Row-local derive nodes that do not write the filtered column are skipped over; whole-column nodes stop the pushdown
+def push_down_filters(plan):
+    scan_node = dict(plan[0], coerce=list(plan[0]['coerce']), filters=list(plan[0]['filters']))
+    remaining = []
+    derived = set()
+    blocked = False
+
+    for node in plan[1:]:
+        if not blocked and node['op'] == 'coerce' and not derived.intersection(node['columns']):
+            scan_node['coerce'].extend(column for column in node['columns'] if column not in scan_node['coerce'])
+            continue
+        if not blocked and node['op'] == 'filter' and node['column'] not in derived:
+            scan_node['filters'].append(node['column'])
+            continue
+
+        if node['op'] == 'derive':
+            derived.update(node['expressions'])
+        elif node['op'] in WHOLE_COLUMN_OPS or node['op'] == 'coerce':
+            blocked = True
+        remaining.append(node)
+
+    return [scan_node] + remaining
+
+
+# Merge runs of consecutive derive nodes into a single node (one assign, one frame copy)
+def fuse_derivations(plan):
+    fused = []
+
+    for node in plan:
+        if node['op'] == 'derive' and fused and fused[-1]['op'] == 'derive':
+            fused[-1] = derive({**fused[-1]['expressions'], **node['expressions']})
+        else:
+            fused.append(node)
+
+    return fused
+
+
+def optimize(plan):
+    return fuse_derivations(push_down_filters(prune_columns(plan)))
+
+
+# One line per node describing what it reads and writes
+def explain(plan):
+    lines = []
+
+    for node in plan:
+        if node['op'] == 'scan':
+            columns = 'all' if node['columns'] is None else ', '.join(node['columns'])
+            line = f"scan {node['path'].name} columns=[{columns}]"
+            if node['coerce']:
+                line += f" coerce=[{', '.join(node['coerce'])}]"
+            if node['filters']:
+                line += ' filter=[' + ' AND '.join(f'{column} IS NOT NULL' for column in node['filters']) + ']'
+        elif node['op'] == 'coerce':
+            line = f"coerce [{', '.join(node['columns'])}]"
+        elif node['op'] == 'filter':
+            line = f"filter {node['column']} IS NOT NULL"
+        elif node['op'] == 'derive':
+            line = f"derive [{', '.join(node['expressions'])}]"
+        elif node['op'] == 'sink':
+            columns = 'all' if node['columns'] is None else ', '.join(node['columns'])
+            line = f"sink {node['path'] or '<memory>'} columns=[{columns}]"
+        else:
+            outputs = node['outputs'] + ([node['output_prefix'] + '*'] if node['output_prefix'] else [])
+            line = f"{node['op']} {node['name']} [{', '.join(node['inputs'])}] -> [{', '.join(outputs)}]"
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+# ============================================================================
+# EXECUTOR
+# ============================================================================
+
+def coerce_numeric(frame, columns):
+    return frame.assign(**{column: pd.to_numeric(frame[column], errors='coerce') for column in columns})
+
+
+def drop_missing(frame, columns):
+    return frame.dropna(subset=columns) if columns else frame
+
+
+# Read the scanned columns; pushed-down coercions and filters are applied chunk by chunk
+# Parquet filters are handed to pyarrow, which skips row groups and rows while reading
+def execute_scan(node, chunk_rows=DEFAULT_CHUNK_ROWS):
+    if node['path'].suffix == '.parquet':
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        expression = None
+        for column in node['filters']:
+            expression = pc.field(column).is_valid() if expression is None else expression & pc.field(column).is_valid()
+        frame = pq.read_table(node['path'], columns=node['columns'], filters=expression).to_pandas()
+        return drop_missing(coerce_numeric(frame, node['coerce']), node['filters']).reset_index(drop=True)
+
+    if not node['coerce'] and not node['filters']:
+        return pd.read_csv(node['path'], usecols=node['columns'])
+
+    chunks = [
+        drop_missing(coerce_numeric(chunk, node['coerce']), node['filters'])
+        for chunk in pd.read_csv(node['path'], usecols=node['columns'], chunksize=chunk_rows)
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+# Run a plan (optimized or not) on pandas
+# Returns the frame reaching the sink, restricted to the sink columns
+def execute(plan, chunk_rows=DEFAULT_CHUNK_ROWS):
+    frame = None
+
+    for node in plan:
+        if node['op'] == 'scan':
+            frame = execute_scan(node, chunk_rows)
+        elif node['op'] == 'coerce':
+            frame = coerce_numeric(frame, node['columns'])
+        elif node['op'] == 'filter':
+            frame = pandas_backend.listwise_delete(frame, node['column'])
+        elif node['op'] == 'derive':
+            frame = frame.assign(**{output: function for output, (function, _) in node['expressions'].items()})
+        elif node['op'] == 'sink':
+            if node['columns'] is not None:
+                frame = frame[node['columns']]
+            if node['path'] is not None:
+                node['path'].parent.mkdir(parents=True, exist_ok=True)
+                frame.to_csv(node['path'], index=False)
+        else:
+            frame = node['function'](frame)
+
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimize and run the pipeline as a lazy logical plan.')
+    parser.add_argument('input', type=Path, help='raw transaction file (.csv or .parquet)')
+    parser.add_argument('--output', type=Path, help='write the result to this CSV')
+    parser.add_argument('--columns', nargs='+', help='output columns (default: all); the plan is pruned to what they need')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='rows per scanned CSV chunk when filtering')
+    parser.add_argument('--explain', action='store_true', help='print the logical and the optimized plan without running it')
+    parser.add_argument('--check', action='store_true', help='compare the result with the eager pandas plan (pipeline.backends, CSV input)')
+    arguments = parser.parse_args()
+
+    plan = build_pipeline_plan(arguments.input, arguments.output, arguments.columns)
+    optimized = optimize(plan)
+
+    if arguments.explain:
+        print('Logical plan:')
+        print(explain(plan))
+        print('\nOptimized plan:')
+        print(explain(optimized))
+        return
+
+    result = execute(optimized, arguments.chunk_rows)
+    print(f'{len(result)} rows x {len(result.columns)} columns')
+
+    if arguments.check:
+        reference = run_plan(pandas_backend, arguments.input)
+        if arguments.columns is not None:
+            reference = reference[arguments.columns]
+        comparison = compare_frames(reference, result)
+        print(f"lazy plan vs eager pandas plan: passed={comparison['passed']} rows={comparison['rows']}")
+        for column, mismatches in comparison['columns'].items():
+            if mismatches:
+                print(f'  {column}: {mismatches} mismatching rows')
+
+
+if __name__ == '__main__':
+    main()
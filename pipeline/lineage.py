@@ -0,0 +1,310 @@
+"""
+Row-Level Lineage Store
+
+The missing-data phase writes four full copies of the dataset (total spent
+cleaned -> price per unit reconstructed -> item imputed -> discount applied),
+although each stage only deletes some rows or fills some cells. The lineage
+store records just that, per stage:
+
+  deleted   the input rows the stage dropped
+  changes   per column, the rows whose value the stage set and the new
+            values (a single value when every fill is the same, e.g.
+            Discount Applied = 'Unknown')
+
+Row sets are keyed by Transaction ID: a row set is a bitmap over the frame's
+Transaction IDs in sorted order (pipeline.keys codes), packed one bit per row
+and zlib-compressed, which makes runs of kept or untouched rows nearly free.
+Changed values are listed in the same Transaction ID order, as compressed
+JSON. The store is a JSON file of a few KB.
+
+Every stage output can then be rebuilt, or audited, from the raw dataset plus
+the store: the raw CSV is read like the stage scripts read it, each stage's
+deleted rows are dropped and its values applied by Transaction ID. Rebuilt
+files are byte-identical to the stage copies.
+
+Usage:
+    python -m pipeline.lineage build --workdir submission --output lineage.json
+    python -m pipeline.lineage rebuild --workdir submission --lineage lineage.json --output-dir /tmp/rebuilt
+    python -m pipeline.lineage audit --workdir submission --lineage lineage.json
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.keys import TRANSACTION_ID, encode_transaction_ids
+from pipeline.stages import RAW_DATASET, STAGES, SUBMISSION_DIR
+
+
+LINEAGE_FORMAT_VERSION = 1
+
+# Stages whose outputs the store describes, in execution order
+LINEAGE_STAGES = [stage for stage in STAGES if stage['phase'] == 'missing']
+
+
+# SHA-256 of a file's content
+def file_digest(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+# Pack a boolean row mask into a compressed bitmap
+# Returns dictionary of row count, number of set rows and the base64 bitmap
+def encode_row_set(mask):
+    mask = np.asarray(mask, dtype=bool)
+    packed = zlib.compress(np.packbits(mask).tobytes(), 9)
+
+    return {'rows': len(mask), 'count': int(mask.sum()), 'bitmap': base64.b64encode(packed).decode('ascii')}
+
+
+# Unpack a compressed bitmap back into a boolean row mask
+def decode_row_set(row_set):
+    packed = np.frombuffer(zlib.decompress(base64.b64decode(row_set['bitmap'])), dtype=np.uint8)
+
+    return np.unpackbits(packed, count=row_set['rows']).astype(bool)
+
+
+# Compress a list of JSON values
+def encode_values(values):
+    return base64.b64encode(zlib.compress(json.dumps(values).encode(), 9)).decode('ascii')
+
+
+def decode_values(text):
+    return json.loads(zlib.decompress(base64.b64decode(text)))
+
+
+# JSON-safe value of one cell (missing -> None, NumPy scalars -> Python scalars)
+def json_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Cells of two aligned columns that differ; NaN equals NaN
+# Numeric columns compare by value, everything else by text, so True and 'True' count as equal
+def changed_cells(before, after):
+    both_missing = before.isna().to_numpy() & after.isna().to_numpy()
+
+    if pd.api.types.is_numeric_dtype(before) and pd.api.types.is_numeric_dtype(after) \
+            and not pd.api.types.is_bool_dtype(before) and not pd.api.types.is_bool_dtype(after):
+        equal = (before.to_numpy(dtype=np.float64) == after.to_numpy(dtype=np.float64))
+    else:
+        equal = (before.astype(str).to_numpy() == after.astype(str).to_numpy())
+
+    return ~(equal | both_missing)
+
+
+# Transaction IDs of a frame as integer codes, checked to be present and unique
+# Returns tuple of (codes, row positions in Transaction ID order, dictionary entry)
+def transaction_codes(dataframe, context):
+    codes, entry = encode_transaction_ids(dataframe[TRANSACTION_ID])
+
+    if dataframe[TRANSACTION_ID].isna().any() or len(np.unique(codes)) != len(codes):
+        raise ValueError(f'{context}: {TRANSACTION_ID} must be present and unique to key the lineage')
+
+    return codes, np.argsort(codes, kind='stable'), entry
+
+
+# Lineage of one stage: the input rows it deleted and the cells it changed
+# The stage must keep the input's row order and columns
+def stage_lineage(before, after, stage_name):
+    before_codes, before_order, _ = transaction_codes(before, f'{stage_name} input')
+    after_codes, after_order, _ = transaction_codes(after, f'{stage_name} output')
+
+    if list(before.columns) != list(after.columns):
+        raise ValueError(f'{stage_name}: columns changed from {list(before.columns)} to {list(after.columns)}')
+
+    deleted = ~np.isin(before_codes, after_codes)
+    if not np.array_equal(before_codes[~deleted], after_codes):
+        raise ValueError(f'{stage_name}: output rows are not the input rows in their original order')
+
+    kept = before.loc[~deleted].reset_index(drop=True)
+    changes = {}
+
+    for column in after.columns:
+        changed = changed_cells(kept[column], after[column])
+        if not changed.any():
+            continue
+
+        changed_rows = after_order[changed[after_order]]
+        values = [json_value(value) for value in after[column].to_numpy()[changed_rows]]
+
+        change = {'rows': encode_row_set(changed[after_order])}
+        if all(value == values[0] for value in values):
+            change['value'] = values[0]
+        else:
+            change['values'] = encode_values(values)
+        changes[column] = change
+
+    return {'deleted': encode_row_set(deleted[before_order]), 'changes': changes}
+
+
+# Build the lineage store from the raw dataset and every stage output of the missing-data phase
+# Returns the store dictionary
+def build_lineage(workdir):
+    workdir = Path(workdir)
+    raw_path = workdir / RAW_DATASET
+
+    before = pd.read_csv(raw_path)
+    transaction_codes(before, 'raw dataset')
+
+    store = {
+        'format_version': LINEAGE_FORMAT_VERSION,
+        'key': TRANSACTION_ID,
+        'source': {'path': RAW_DATASET, 'rows': len(before), 'sha256': file_digest(raw_path)},
+        'stages': [],
+    }
+
+    for stage in LINEAGE_STAGES:
+        output = stage['outputs'][0]
+        after = pd.read_csv(workdir / output)
+
+        entry = {'name': stage['name'], 'output': output, 'rows_out': len(after), 'sha256': file_digest(workdir / output)}
+        entry.update(stage_lineage(before, after, stage['name']))
+        store['stages'].append(entry)
+
+        before = after
+
+    return store
+
+
+def save_lineage(store, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(store, separators=(',', ':')))
+
+
+def load_lineage(input_path):
+    store = json.loads(Path(input_path).read_text())
+
+    if store.get('format_version') != LINEAGE_FORMAT_VERSION:
+        raise ValueError(f'Unsupported lineage format {store.get("format_version")!r}; expected {LINEAGE_FORMAT_VERSION}')
+
+    return store
+
+
+# Apply one stage's lineage to its input frame
+# Row sets are matched against the frame's Transaction IDs in sorted order
+# Returns the stage's output frame
+def apply_stage_lineage(dataframe, entry):
+    _, order, _ = transaction_codes(dataframe, f"{entry['name']} input")
+    if entry['deleted']['rows'] != len(dataframe):
+        raise ValueError(f"{entry['name']}: lineage covers {entry['deleted']['rows']} input rows, got {len(dataframe)}")
+
+    deleted = np.zeros(len(dataframe), dtype=bool)
+    deleted[order] = decode_row_set(entry['deleted'])
+    dataframe = dataframe.loc[~deleted].reset_index(drop=True)
+
+    _, order, _ = transaction_codes(dataframe, f"{entry['name']} output")
+    for column, change in entry['changes'].items():
+        positions = order[decode_row_set(change['rows'])]
+
+        values = [change['value']] * len(positions) if 'value' in change else decode_values(change['values'])
+        values = [np.nan if value is None else value for value in values]
+        if dataframe[column].dtype == bool:
+            dataframe[column] = dataframe[column].astype(object)
+        dataframe.loc[positions, column] = values
+
+    return dataframe
+
+
+# Rebuild every stage output from the raw dataset and the lineage store
+# Yields tuple of (stage entry, rebuilt CSV text)
+def rebuild_stages(workdir, store):
+    raw_path = Path(workdir) / store['source']['path']
+    if file_digest(raw_path) != store['source']['sha256']:
+        raise ValueError(f'{raw_path} is not the raw dataset the lineage was built from')
+
+    dataframe = pd.read_csv(raw_path)
+    for entry in store['stages']:
+        dataframe = apply_stage_lineage(dataframe, entry)
+        yield entry, dataframe.to_csv(index=False)
+
+
+# Write every rebuilt stage output under output_dir (same relative paths as the stage copies)
+# Returns list of written paths
+def write_rebuilt_stages(workdir, store, output_dir):
+    written = []
+
+    for entry, text in rebuild_stages(workdir, store):
+        output_path = Path(output_dir) / entry['output']
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(text)
+        written.append(output_path)
+
+    return written
+
+
+# Compare every rebuilt stage output with the digest recorded in the store and with the copy on disk, if any
+# Returns list of dictionaries of stage name, rows, deleted / changed cell counts and whether it matched
+def audit_lineage(workdir, store):
+    results = []
+
+    for entry, text in rebuild_stages(workdir, store):
+        rebuilt_digest = hashlib.sha256(text.encode()).hexdigest()
+        copy_path = Path(workdir) / entry['output']
+
+        results.append({
+            'stage': entry['name'],
+            'rows_out': entry['rows_out'],
+            'deleted': entry['deleted']['count'],
+            'changed': {column: change['rows']['count'] for column, change in entry['changes'].items()},
+            'matches_lineage': rebuilt_digest == entry['sha256'],
+            'matches_copy': rebuilt_digest == file_digest(copy_path) if copy_path.exists() else None,
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record, replay and audit the row-level lineage of the missing-data stages.')
+    parser.add_argument('command', choices=['build', 'rebuild', 'audit'])
+    parser.add_argument('--workdir', type=Path, default=SUBMISSION_DIR,
+                        help='directory holding datasource/ and output/ (default: submission/)')
+    parser.add_argument('--lineage', type=Path, help='lineage store to read (rebuild, audit)')
+    parser.add_argument('--output', type=Path, help='lineage store to write (build)')
+    parser.add_argument('--output-dir', type=Path, help='directory for the rebuilt stage outputs (rebuild)')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'build':
+        if arguments.output is None:
+            parser.error('build needs --output')
+        store = build_lineage(arguments.workdir)
+        save_lineage(store, arguments.output)
+
+        copies_size = sum((arguments.workdir / entry['output']).stat().st_size for entry in store['stages'])
+        print(f'Lineage of {len(store["stages"])} stages: {arguments.output.stat().st_size / 1024:.1f} KB '
+              f'(stage copies: {copies_size / 1024:.1f} KB)')
+        return
+
+    if arguments.lineage is None:
+        parser.error(f'{arguments.command} needs --lineage')
+    store = load_lineage(arguments.lineage)
+
+    if arguments.command == 'rebuild':
+        if arguments.output_dir is None:
+            parser.error('rebuild needs --output-dir')
+        for output_path in write_rebuilt_stages(arguments.workdir, store, arguments.output_dir):
+            print(f'Wrote {output_path}')
+        return
+
+    results = audit_lineage(arguments.workdir, store)
+    for result in results:
+        changed = ', '.join(f'{column} {count}' for column, count in result['changed'].items()) or 'none'
+        copy_status = {True: 'matches copy', False: 'DIFFERS from copy', None: 'no copy'}[result['matches_copy']]
+        lineage_status = 'ok' if result['matches_lineage'] else 'MISMATCH'
+        print(f"{result['stage']:26s} rows {result['rows_out']:6d}  deleted {result['deleted']:5d}  changed: {changed}  "
+              f"{lineage_status}, {copy_status}")
+
+    if not all(result['matches_lineage'] and result['matches_copy'] is not False for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,538 @@
+"""
+Two-Pass Out-of-Core Executor
+
+Runs the missing -> encoding -> rescale pipeline over a raw transaction CSV
+read in chunks, so peak memory follows the chunk size instead of the file
+size. Every transform of the stage scripts is either row-local or needs
+global state that can be merged chunk by chunk:
+
+  Pass one (fit)   each cleaned chunk is reduced to mergeable aggregates:
+                     Category x Item counts          -> Item mode per Category
+                     Item x fold Total Spent sums     -> 2-fold Item target encoding
+                     Customer ID Total Spent sums     -> leave-one-out Customer encoding
+                     Category / Payment / Discount    -> one-hot vocabularies
+                     count, mean, M2, min, max        -> min-max and z-score scalers
+                     value-count histograms           -> exact median and quartiles (robust scaler)
+                   and the partial aggregates of all chunks are added together.
+  Pass two (apply) the chunks are read again, cleaned, imputed, encoded and
+                   rescaled with the fitted state and appended to the outputs.
+
+The merged state grows with the number of distinct customers, items and
+numeric values, never with the number of rows.
+
+Differences from the in-memory stages:
+  - Item folds come from a hash of the Transaction ID instead of a shuffled
+    KFold over row positions, so a row's fold does not depend on the other
+    rows; Item Target Encoded therefore differs from encode_item
+  - Transaction Date Numeric is seconds since 1970-01-01 (whole days x 86400)
+  - rescaled columns of all three numerics go to one file instead of three
+    copies per numeric
+
+Outputs (under --output, same names as the submission tree where they match):
+  1_handle_missing_data/final_cleaned_dataset.csv
+  2_handle_encoding_data/final_fully_encoded_dataset.csv
+  3_handle_rescale_data/final_rescaled_dataset.csv
+
+Usage:
+    python -m pipeline.out_of_core submission/datasource/Deliverable1Dataset.csv --output /tmp/ooc --chunk-rows 100000
+    python -m pipeline.out_of_core big.csv --output /tmp/ooc --check submission/output
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import apply_dtype_plan, date_day_numbers
+from pipeline.group_index import MISSING_GROUP, factorize_group_column, group_sum, group_value_count, group_value_counts, one_hot
+from pipeline.stages import peak_rss_megabytes
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Column names
+TRANSACTION_ID = 'Transaction ID'
+CUSTOMER_ID = 'Customer ID'
+CATEGORY = 'Category'
+ITEM = 'Item'
+PRICE_PER_UNIT = 'Price Per Unit'
+QUANTITY = 'Quantity'
+TOTAL_SPENT = 'Total Spent'
+PAYMENT_METHOD = 'Payment Method'
+LOCATION = 'Location'
+TRANSACTION_DATE = 'Transaction Date'
+DISCOUNT_APPLIED = 'Discount Applied'
+
+NUMERIC_COLUMNS = [PRICE_PER_UNIT, QUANTITY, TOTAL_SPENT]
+TARGET = TOTAL_SPENT
+UNKNOWN_DISCOUNT = 'Unknown'
+
+# Boolean spellings pd.read_csv parses as True/False (the stages write them back as True/False)
+BOOLEAN_TEXT = {'TRUE': 'True', 'true': 'True', 'FALSE': 'False', 'false': 'False'}
+
+# One-hot encoded column -> prefix of its dummy columns
+ONE_HOT_PREFIXES = {
+    CATEGORY: 'cat',
+    PAYMENT_METHOD: 'Payment',
+    DISCOUNT_APPLIED: 'Discount',
+}
+
+# Rescaled numeric -> prefix of its rescaled columns (as in the rescale stage scripts)
+RESCALE_PREFIXES = {
+    QUANTITY: 'Quantity',
+    PRICE_PER_UNIT: 'PricePerUnit',
+    TOTAL_SPENT: 'TotalSpent',
+}
+
+DATE_NUMERIC = 'Transaction Date Numeric'
+DATE_SCALED = 'Transaction Date Scaled'
+SECONDS_PER_DAY = 86_400
+
+# Item target encoding folds (hash of Transaction ID modulo N_FOLDS)
+N_FOLDS = 2
+
+OUTPUT_FILES = {
+    'cleaned': '1_handle_missing_data/final_cleaned_dataset.csv',
+    'encoded': '2_handle_encoding_data/final_fully_encoded_dataset.csv',
+    'rescaled': '3_handle_rescale_data/final_rescaled_dataset.csv',
+}
+
+# In-memory stage outputs compared by --check: output file -> reference files (relative to the reference directory)
+REFERENCE_FILES = {
+    'cleaned': ['1_handle_missing_data/final_cleaned_dataset.csv'],
+    'encoded': ['2_handle_encoding_data/final_fully_encoded_dataset.csv'],
+    'rescaled': [f'3_handle_rescale_data/data_rescaling_{method}_{name}.csv'
+                 for method, name in [('norm', 'quantity'), ('norm', 'price_per_unit'), ('norm', 'total_spent'),
+                                      ('norm', 'transaction_date')]],
+}
+
+
+# Read a raw transaction CSV in chunks of chunk_rows rows
+# Every column is read as text so all chunks get the same dtypes; numerics are converted in clean_chunk
+def iterate_raw_chunks(input_csv, chunk_rows=DEFAULT_CHUNK_ROWS):
+    return pd.read_csv(input_csv, dtype='str', chunksize=chunk_rows)
+
+
+# Row-local part of the missing-data phase:
+# drop rows without Total Spent, Price Per Unit = Total Spent / Quantity where missing,
+# Discount Applied as True/False, missing -> 'Unknown' (Item imputation needs the fitted modes, see impute_items)
+# Returns cleaned chunk
+def clean_chunk(chunk):
+    numerics = {column: pd.to_numeric(chunk[column], errors='coerce') for column in NUMERIC_COLUMNS}
+    chunk = chunk.assign(**numerics)
+    chunk = chunk[chunk[TOTAL_SPENT].notna()]
+
+    missing_price = chunk[PRICE_PER_UNIT].isna()
+    price = chunk[PRICE_PER_UNIT].where(~missing_price, chunk[TOTAL_SPENT] / chunk[QUANTITY])
+
+    discount = chunk[DISCOUNT_APPLIED].replace(BOOLEAN_TEXT).fillna(UNKNOWN_DISCOUNT)
+
+    return chunk.assign(**{PRICE_PER_UNIT: price, DISCOUNT_APPLIED: discount})
+
+
+# Item target encoding fold of every row, from a hash of its Transaction ID
+# The hash is deterministic across runs and machines, so a row keeps its fold whatever the chunking
+def assign_folds(transaction_ids):
+    hashes = pd.util.hash_pandas_object(pd.Series(transaction_ids), index=False).to_numpy()
+    return (hashes % N_FOLDS).astype(np.int8)
+
+
+# Add a labelled partial aggregate (Series) to a running total; labels missing on either side count as 0
+def merge_counts(total, part):
+    if total is None:
+        return part
+    return total.add(part, fill_value=0)
+
+
+# Count, mean, sum of squared deviations (M2), min and max of a chunk's non-missing values
+def chunk_moments(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'min': np.inf, 'max': -np.inf}
+
+    mean = values.mean()
+    return {'count': len(values), 'mean': mean, 'm2': float(((values - mean) ** 2).sum()),
+            'min': float(values.min()), 'max': float(values.max())}
+
+
+# Merge two moment summaries (Chan et al. parallel update of mean and M2)
+def merge_moments(total, part):
+    if total is None or total['count'] == 0:
+        return part
+    if part['count'] == 0:
+        return total
+
+    count = total['count'] + part['count']
+    delta = part['mean'] - total['mean']
+
+    return {
+        'count': count,
+        'mean': total['mean'] + delta * part['count'] / count,
+        'm2': total['m2'] + part['m2'] + delta * delta * total['count'] * part['count'] / count,
+        'min': min(total['min'], part['min']),
+        'max': max(total['max'], part['max']),
+    }
+
+
+# Value -> row count histogram of a chunk's non-missing values (mergeable with merge_counts)
+def value_histogram(values):
+    entry = factorize_group_column(values)
+    return pd.Series(entry['sizes'], index=entry['uniques'])
+
+
+# Quantile of the values summarized by a histogram, with NumPy's default linear interpolation
+# Exact: the two order statistics around the quantile position are found from cumulative counts
+def histogram_quantile(histogram, quantile):
+    histogram = histogram.sort_index()
+    cumulative = np.cumsum(histogram.to_numpy())
+    values = histogram.index.to_numpy(dtype=np.float64)
+
+    position = quantile * (cumulative[-1] - 1)
+    lower_rank = int(np.floor(position))
+    upper_rank = int(np.ceil(position))
+
+    # Value of the order statistic with 0-based rank r: first value whose cumulative count exceeds r
+    lower = values[np.searchsorted(cumulative, lower_rank, side='right')]
+    upper = values[np.searchsorted(cumulative, upper_rank, side='right')]
+
+    return lower + (upper - lower) * (position - lower_rank)
+
+
+# Reduce one cleaned chunk to the partial aggregates of pass one
+# Returns dictionary of partial aggregates (same keys as the merged state)
+def chunk_aggregates(chunk):
+    category_entry = factorize_group_column(chunk[CATEGORY], CATEGORY)
+    item_entry = factorize_group_column(chunk[ITEM], ITEM)
+    customer_entry = factorize_group_column(chunk[CUSTOMER_ID], CUSTOMER_ID)
+
+    target = chunk[TARGET].to_numpy(dtype=np.float64)
+    folds = assign_folds(chunk[TRANSACTION_ID])
+    missing_item = item_entry['codes'] == MISSING_GROUP
+
+    # Category x Item co-occurrence counts (rows with a missing Item are not counted)
+    pair_counts = group_value_counts(category_entry, item_entry)
+    category_item_counts = pd.Series(
+        pair_counts.ravel(), index=pd.MultiIndex.from_product([category_entry['uniques'], item_entry['uniques']], names=[CATEGORY, ITEM])
+    )
+
+    # Target sums and counts per Item and fold; rows with a missing Item are kept per Category,
+    # since they are imputed with the Category mode before the Item encoding
+    item_sums, item_counts, missing_item_sums, missing_item_counts = [], [], [], []
+    for fold in range(N_FOLDS):
+        in_fold = folds == fold
+        item_sums.append(pd.Series(group_sum(item_entry, target, rows=in_fold), index=item_entry['uniques']))
+        item_counts.append(pd.Series(group_value_count(item_entry, target, rows=in_fold), index=item_entry['uniques']))
+
+        imputed = in_fold & missing_item
+        missing_item_sums.append(pd.Series(group_sum(category_entry, target, rows=imputed), index=category_entry['uniques']))
+        missing_item_counts.append(pd.Series(group_value_count(category_entry, target, rows=imputed), index=category_entry['uniques']))
+
+    return {
+        'rows': len(chunk),
+        'target': chunk_moments(target),
+        'category_item_counts': category_item_counts[category_item_counts > 0],
+        'item_sums': item_sums,
+        'item_counts': item_counts,
+        'missing_item_sums': missing_item_sums,
+        'missing_item_counts': missing_item_counts,
+        'customer_sums': pd.Series(group_sum(customer_entry, target), index=customer_entry['uniques']),
+        'customer_counts': pd.Series(group_value_count(customer_entry, target), index=customer_entry['uniques']),
+        'vocabularies': {column: set(chunk[column].dropna()) for column in ONE_HOT_PREFIXES},
+        'moments': {column: chunk_moments(chunk[column]) for column in RESCALE_PREFIXES},
+        'histograms': {column: value_histogram(chunk[column]) for column in RESCALE_PREFIXES},
+        'date_range': chunk_moments(date_day_numbers(chunk[TRANSACTION_DATE], TRANSACTION_DATE)),
+    }
+
+
+# Merge the partial aggregates of one chunk into the running state (state may be None for the first chunk)
+def merge_aggregates(state, part):
+    if state is None:
+        return part
+
+    return {
+        'rows': state['rows'] + part['rows'],
+        'target': merge_moments(state['target'], part['target']),
+        'category_item_counts': merge_counts(state['category_item_counts'], part['category_item_counts']),
+        'item_sums': [merge_counts(total, fold) for total, fold in zip(state['item_sums'], part['item_sums'])],
+        'item_counts': [merge_counts(total, fold) for total, fold in zip(state['item_counts'], part['item_counts'])],
+        'missing_item_sums': [merge_counts(total, fold) for total, fold in zip(state['missing_item_sums'], part['missing_item_sums'])],
+        'missing_item_counts': [merge_counts(total, fold) for total, fold in zip(state['missing_item_counts'], part['missing_item_counts'])],
+        'customer_sums': merge_counts(state['customer_sums'], part['customer_sums']),
+        'customer_counts': merge_counts(state['customer_counts'], part['customer_counts']),
+        'vocabularies': {column: state['vocabularies'][column] | part['vocabularies'][column] for column in ONE_HOT_PREFIXES},
+        'moments': {column: merge_moments(state['moments'][column], part['moments'][column]) for column in RESCALE_PREFIXES},
+        'histograms': {column: merge_counts(state['histograms'][column], part['histograms'][column]) for column in RESCALE_PREFIXES},
+        'date_range': merge_moments(state['date_range'], part['date_range']),
+    }
+
+
+# Item mode per Category from the merged Category x Item counts
+# Ties go to the smallest Item label, as in group_mode
+# Returns Series of Category -> mode Item
+def fit_item_modes(category_item_counts):
+    table = category_item_counts.unstack(fill_value=0).sort_index().sort_index(axis=1)
+    modes = table.idxmax(axis=1)
+
+    return modes[table.max(axis=1) > 0]
+
+
+# Move the per-Category target sums of rows with a missing Item onto the Category's mode Item
+# Returns Series of Item -> sum (or count) including the imputed rows
+def add_imputed_rows(item_totals, missing_item_totals, item_modes):
+    imputable = missing_item_totals[missing_item_totals.index.isin(item_modes.index)]
+    imputed = imputable.groupby(item_modes.reindex(imputable.index).to_numpy()).sum()
+
+    return merge_counts(item_totals, imputed)
+
+
+# Turn the merged state of pass one into the fitted transforms of pass two
+# Returns dictionary with item modes, encoding tables, vocabularies and scaler parameters
+def fit_transforms(state):
+    item_modes = fit_item_modes(state['category_item_counts'])
+
+    item_sums = [add_imputed_rows(sums, missing, item_modes) for sums, missing in zip(state['item_sums'], state['missing_item_sums'])]
+    item_counts = [add_imputed_rows(counts, missing, item_modes) for counts, missing in zip(state['item_counts'], state['missing_item_counts'])]
+    all_sums = sum(item_sums[1:], item_sums[0])
+    all_counts = sum(item_counts[1:], item_counts[0])
+
+    # Rows of fold f are encoded with the Item means of the other folds
+    fold_means = []
+    for fold in range(N_FOLDS):
+        other_sums = all_sums.sub(item_sums[fold], fill_value=0)
+        other_counts = all_counts.sub(item_counts[fold], fill_value=0)
+        fold_means.append((other_sums / other_counts)[other_counts > 0])
+
+    scalers = {}
+    for column in RESCALE_PREFIXES:
+        moments = state['moments'][column]
+        histogram = state['histograms'][column]
+        q25, median, q75 = (histogram_quantile(histogram, quantile) for quantile in (0.25, 0.5, 0.75))
+
+        scalers[column] = {
+            'min': moments['min'],
+            'range': (moments['max'] - moments['min']) or 1.0,
+            'mean': moments['mean'],
+            'std': np.sqrt(moments['m2'] / moments['count']) or 1.0,
+            'median': median,
+            'iqr': (q75 - q25) or 1.0,
+        }
+
+    return {
+        'rows': state['rows'],
+        'global_mean': state['target']['mean'],
+        'item_modes': item_modes,
+        'fold_means': fold_means,
+        'item_means': (all_sums / all_counts)[all_counts > 0],
+        'customer_sums': state['customer_sums'],
+        'customer_counts': state['customer_counts'],
+        'vocabularies': {column: sorted(values) for column, values in state['vocabularies'].items()},
+        'scalers': scalers,
+        'date_min': int(state['date_range']['min']) * SECONDS_PER_DAY,
+        'date_range': (int(state['date_range']['max']) - int(state['date_range']['min'])) * SECONDS_PER_DAY or 1,
+    }
+
+
+# Look up one value per label in a labelled Series; labels that are missing or unknown get fill
+def lookup(table, labels, fill=np.nan):
+    positions = table.index.get_indexer(pd.Series(labels))
+    return np.append(table.to_numpy(dtype=np.float64), fill)[positions]
+
+
+# Fill missing Items with the fitted mode of their Category (rows without a known Category stay missing)
+def impute_items(chunk, item_modes):
+    fill = chunk[ITEM].isna() & chunk[CATEGORY].isin(item_modes.index)
+    return chunk.assign(**{ITEM: chunk[ITEM].where(~fill, chunk[CATEGORY].map(item_modes))})
+
+
+# One-hot columns of a chunk in vocabulary (sorted) order; values outside the vocabulary are all zeros
+# Returns dictionary of one-hot encoded column -> {dummy column name: 0/1 array}
+def one_hot_columns(chunk, vocabularies):
+    dummies = {}
+    for column, prefix in ONE_HOT_PREFIXES.items():
+        vocabulary = vocabularies[column]
+        entry = {'codes': pd.Index(vocabulary).get_indexer(chunk[column]), 'uniques': vocabulary}
+        matrix = one_hot(entry)
+        dummies[column] = {f'{prefix}_{value}': matrix[:, position] for position, value in enumerate(vocabulary)}
+
+    return dummies
+
+
+# Encode one cleaned chunk into the columns of final_fully_encoded_dataset.csv
+def encode_chunk(chunk, model):
+    target = chunk[TARGET].to_numpy(dtype=np.float64)
+    global_mean = model['global_mean']
+
+    encoded = chunk[[TRANSACTION_ID] + NUMERIC_COLUMNS + [TRANSACTION_DATE]]
+    dummies = one_hot_columns(chunk, model['vocabularies'])
+
+    # Leave-one-out Customer ID encoding: (customer sum - own target) / (customer count - 1)
+    customer_sums = lookup(model['customer_sums'], chunk[CUSTOMER_ID])
+    customer_counts = lookup(model['customer_counts'], chunk[CUSTOMER_ID], fill=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        customer_encoded = (customer_sums - target) / (customer_counts - 1)
+    customer_encoded = np.where(np.isnan(customer_encoded), global_mean, customer_encoded)
+
+    # Out-of-fold Item encoding: the Item mean of the other folds, global mean when unseen there
+    folds = assign_folds(chunk[TRANSACTION_ID])
+    item_encoded = np.full(len(chunk), global_mean)
+    for fold, means in enumerate(model['fold_means']):
+        in_fold = folds == fold
+        item_encoded[in_fold] = lookup(means, chunk[ITEM].to_numpy()[in_fold], fill=global_mean)
+    item_encoded = np.where(np.isnan(item_encoded), global_mean, item_encoded)
+
+    encoded = encoded.assign(
+        **dummies[CATEGORY],
+        **{'Customer ID Target Encoded': customer_encoded, 'Item Target Encoded': item_encoded,
+           'Location_Encoded': (chunk[LOCATION] == 'Online').to_numpy()},
+        **dummies[PAYMENT_METHOD],
+        **dummies[DISCOUNT_APPLIED],
+    )
+
+    planned_columns = [column for column in encoded.columns if column not in (TRANSACTION_ID, TRANSACTION_DATE)]
+    return apply_dtype_plan(encoded, columns=planned_columns)
+
+
+# Rescale one cleaned chunk: min-max, z-score and robust scaling of every numeric, min-max of the date
+# The scaled columns are stored as float32, as the rescale stages store them (see pipeline.dtype_plan)
+def rescale_chunk(chunk, model):
+    scaled = {}
+    for column, prefix in RESCALE_PREFIXES.items():
+        values = chunk[column].to_numpy(dtype=np.float64)
+        scaler = model['scalers'][column]
+
+        scaled[f'{prefix}_Normalized'] = (values - scaler['min']) / scaler['range']
+        scaled[f'{prefix}_Standardized'] = (values - scaler['mean']) / scaler['std']
+        scaled[f'{prefix}_Robust'] = (values - scaler['median']) / scaler['iqr']
+
+    seconds = date_day_numbers(chunk[TRANSACTION_DATE], TRANSACTION_DATE).astype(np.int64) * SECONDS_PER_DAY
+    scaled[DATE_NUMERIC] = seconds
+    scaled[DATE_SCALED] = (seconds - model['date_min']) / model['date_range']
+
+    return apply_dtype_plan(chunk.assign(**scaled), columns=list(scaled))
+
+
+# Pass one: read every chunk once and merge its aggregates
+# Returns merged state (see chunk_aggregates) and raw row count
+def collect_state(input_csv, chunk_rows=DEFAULT_CHUNK_ROWS):
+    state = None
+    rows_in = 0
+
+    for chunk in iterate_raw_chunks(input_csv, chunk_rows):
+        rows_in += len(chunk)
+        state = merge_aggregates(state, chunk_aggregates(clean_chunk(chunk)))
+
+    if state is None:
+        raise ValueError(f'{input_csv} has no data rows')
+
+    return state, rows_in
+
+
+# Pass two: stream every chunk through the fitted transforms and append it to the three outputs
+# Returns dictionary of output name to rows written
+def apply_transforms(input_csv, output_dir, model, chunk_rows=DEFAULT_CHUNK_ROWS):
+    output_dir = Path(output_dir)
+    paths = {name: output_dir / relative_path for name, relative_path in OUTPUT_FILES.items()}
+    for path in paths.values():
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    rows_written = {name: 0 for name in paths}
+    handles = {name: open(path, 'w', newline='') for name, path in paths.items()}
+    try:
+        for chunk in iterate_raw_chunks(input_csv, chunk_rows):
+            cleaned = impute_items(clean_chunk(chunk), model['item_modes'])
+
+            outputs = {
+                'cleaned': cleaned,
+                'encoded': encode_chunk(cleaned, model),
+                'rescaled': rescale_chunk(cleaned, model),
+            }
+            for name, frame in outputs.items():
+                frame.to_csv(handles[name], header=rows_written[name] == 0, index=False)
+                rows_written[name] += len(frame)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    return rows_written
+
+
+# Run both passes over a raw CSV
+# Returns summary dictionary: rows in/out, seconds per pass, peak RSS and the size of the merged state
+def run_two_pass(input_csv, output_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+    start = time.perf_counter()
+    state, rows_in = collect_state(input_csv, chunk_rows)
+    model = fit_transforms(state)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows_written = apply_transforms(input_csv, output_dir, model, chunk_rows)
+    apply_seconds = time.perf_counter() - start
+
+    return {
+        'chunk_rows': chunk_rows,
+        'rows_in': rows_in,
+        'rows_out': rows_written,
+        'fit_seconds': fit_seconds,
+        'apply_seconds': apply_seconds,
+        'peak_rss_mb': peak_rss_megabytes(),
+        'state_sizes': {
+            'customers': len(model['customer_sums']),
+            'items': len(model['fold_means'][0].index.union(model['fold_means'][-1].index)),
+            'histogram_values': {column: len(histogram) for column, histogram in state['histograms'].items()},
+        },
+    }
+
+
+# Compare the executor outputs with in-memory stage outputs (reads both in full; for checks only)
+# Returns dictionary of output name to {column: largest absolute difference, or mismatching rows for text}
+def compare_with_reference(output_dir, reference_dir):
+    differences = {}
+
+    for name, reference_files in REFERENCE_FILES.items():
+        produced = pd.read_csv(Path(output_dir) / OUTPUT_FILES[name])
+        differences[name] = {}
+
+        for reference_file in reference_files:
+            reference = pd.read_csv(Path(reference_dir) / reference_file)
+            if len(reference) != len(produced):
+                raise ValueError(f'{reference_file} has {len(reference)} rows, {OUTPUT_FILES[name]} has {len(produced)}')
+
+            for column in reference.columns.intersection(produced.columns):
+                expected, actual = reference[column], produced[column]
+                if pd.api.types.is_numeric_dtype(expected) and not pd.api.types.is_bool_dtype(expected):
+                    gap = np.abs(actual.to_numpy(dtype=np.float64) - expected.to_numpy(dtype=np.float64))
+                    differences[name][column] = float(np.nanmax(gap)) if len(gap) else 0.0
+                else:
+                    differences[name][column] = int((actual.astype(str) != expected.astype(str)).sum())
+
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the missing -> encoding -> rescale pipeline out of core in two passes.')
+    parser.add_argument('input', type=Path, help='raw transaction CSV (e.g. submission/datasource/Deliverable1Dataset.csv)')
+    parser.add_argument('--output', type=Path, required=True, help='directory for the cleaned, encoded and rescaled CSVs')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'rows per chunk; bounds peak memory (default: {DEFAULT_CHUNK_ROWS})')
+    parser.add_argument('--check', type=Path, metavar='REFERENCE_DIR',
+                        help='compare with in-memory stage outputs (e.g. submission/output)')
+    arguments = parser.parse_args()
+
+    summary = run_two_pass(arguments.input, arguments.output, arguments.chunk_rows)
+    print(json.dumps(summary, indent=2))
+
+    if arguments.check:
+        differences = compare_with_reference(arguments.output, arguments.check)
+        print('Largest difference per column (numbers) or mismatching rows (text):')
+        for name, columns in differences.items():
+            print(f'{OUTPUT_FILES[name]}:')
+            for column, difference in columns.items():
+                print(f'  {column:40s} {difference:.3g}')
+
+
+if __name__ == '__main__':
+    main()
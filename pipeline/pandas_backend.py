@@ -0,0 +1,148 @@
+"""
+Pandas Backend (reference)
+
+The stage operations of the pipeline on an in-memory pandas DataFrame, with
+the same semantics as the stage scripts under submission/sources. It is the
+reference that other backends (see pipeline.backends) are checked against.
+
+Every operation takes a frame and returns a new frame:
+
+  listwise_delete(frame, column)                            drop rows where column is missing
+  reconstruct_ratio(frame, column, numerator, denominator)  fill column with numerator / denominator
+  impute_group_mode(frame, column, group_column)            fill column with its mode per group (ties -> smallest)
+  fill_unknown(frame, column, value)                        fill missing values with a constant
+  loo_target_encode(frame, column, target, output)          leave-one-out target mean per column value
+  kfold_target_encode(frame, column, target, output, folds) out-of-fold target mean per column value
+  one_hot_encode(frame, column, prefix, dtype)              one 0/1 column per value, sorted
+  binary_encode(frame, column, positive, output)            1 where column == positive, else 0
+  min_max_scale / standard_scale / robust_scale(frame, column, output)
+
+Usage:
+    from pipeline import pandas_backend as backend
+    frame = backend.listwise_delete(backend.read_csv(path), 'Total Spent')
+"""
+
+import numpy as np
+import pandas as pd
+
+from pipeline.group_index import (
+    MISSING_GROUP, broadcast_to_rows, build_group_index, factorize_group_column, group_mean, group_mode, group_sum,
+    group_value_count, one_hot,
+)
+from pipeline import scalers
+
+
+NAME = 'pandas'
+
+NUMERIC_COLUMNS = ['Price Per Unit', 'Quantity', 'Total Spent']
+
+
+# Read a transaction CSV; numeric columns are coerced to float like the stage scripts do
+def read_csv(path):
+    frame = pd.read_csv(path)
+    return frame.assign(**{column: pd.to_numeric(frame[column], errors='coerce')
+                           for column in NUMERIC_COLUMNS if column in frame.columns})
+
+
+# Drop rows where column is missing (row labels are reset, as after a CSV round trip)
+def listwise_delete(frame, column):
+    return frame.dropna(subset=[column]).reset_index(drop=True)
+
+
+# Fill missing values of column with numerator / denominator
+def reconstruct_ratio(frame, column, numerator, denominator):
+    missing = frame[column].isna()
+    return frame.assign(**{column: frame[column].where(~missing, frame[numerator] / frame[denominator])})
+
+
+# Fill missing values of column with the most frequent value of its group (ties go to the smallest value)
+# Rows whose group is missing or has no observed value stay missing
+def impute_group_mode(frame, column, group_column):
+    group_index = build_group_index(frame, columns=(group_column, column))
+    group_entry, value_entry = group_index[group_column], group_index[column]
+
+    row_mode_codes = broadcast_to_rows(group_entry, group_mode(group_entry, value_entry), fill=MISSING_GROUP)
+    fill_rows = frame[column].isna().to_numpy() & (row_mode_codes != MISSING_GROUP)
+
+    values = frame[column].to_numpy(dtype=object, na_value=np.nan)
+    values[fill_rows] = np.asarray(value_entry['uniques'], dtype=object)[row_mode_codes[fill_rows]]
+
+    return frame.assign(**{column: values})
+
+
+# Fill missing values of column with a constant
+def fill_unknown(frame, column, value):
+    return frame.assign(**{column: frame[column].fillna(value)})
+
+
+# Leave-one-out target encoding: (group target sum - own target) / (group count - 1)
+# Rows that are alone in their group, or have no group, get the global target mean
+def loo_target_encode(frame, column, target, output):
+    entry = factorize_group_column(frame[column], column)
+    target_values = frame[target].to_numpy(dtype=np.float64)
+    global_mean = frame[target].mean()
+
+    sums = broadcast_to_rows(entry, group_sum(entry, target_values))
+    counts = broadcast_to_rows(entry, group_value_count(entry, target_values), fill=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        encoded = (sums - target_values) / (counts - 1)
+
+    return frame.assign(**{output: np.where(np.isnan(encoded), global_mean, encoded)})
+
+
+# Out-of-fold target encoding: rows of each fold get the target mean of their value in the other folds
+# folds holds one fold number per row; values unseen in the other folds get the global target mean
+def kfold_target_encode(frame, column, target, output, folds):
+    entry = factorize_group_column(frame[column], column)
+    target_values = frame[target].to_numpy(dtype=np.float64)
+    global_mean = frame[target].mean()
+
+    folds = np.asarray(folds)
+    encoded = np.full(len(frame), global_mean)
+    for fold in np.unique(folds):
+        encode_rows = np.flatnonzero(folds == fold)
+        means = group_mean(entry, target_values, rows=np.flatnonzero(folds != fold))
+        encoded[encode_rows] = broadcast_to_rows(entry, means, rows=encode_rows)
+
+    return frame.assign(**{output: np.where(np.isnan(encoded), global_mean, encoded)})
+
+
+# One column per value of column (sorted), named prefix_value; rows with a missing value are all zeros
+def one_hot_encode(frame, column, prefix, dtype=np.uint8):
+    entry = factorize_group_column(frame[column], column)
+    matrix = one_hot(entry, dtype=dtype)
+
+    return frame.assign(**{f'{prefix}_{value}': matrix[:, position] for position, value in enumerate(entry['uniques'])})
+
+
+# 1 where column equals positive, 0 otherwise (missing values included)
+def binary_encode(frame, column, positive, output):
+    return frame.assign(**{output: (frame[column] == positive).to_numpy(dtype=np.uint8)})
+
+
+# Min-max normalization to [0, 1] (pipeline.scalers, as in the rescale stage scripts)
+def min_max_scale(frame, column, output):
+    return frame.assign(**{output: scalers.min_max_scale(frame[column])})
+
+
+# Z-score standardization with the population standard deviation (pipeline.scalers)
+def standard_scale(frame, column, output):
+    return frame.assign(**{output: scalers.standard_scale(frame[column])})
+
+
+# (x - median) / IQR with linearly interpolated quartiles (pipeline.scalers)
+def robust_scale(frame, column, output):
+    return frame.assign(**{output: scalers.robust_scale(frame[column])})
+
+
+# Compute any deferred work; a pandas frame is already computed
+def materialize(frame):
+    return frame
+
+
+def row_count(frame):
+    return len(frame)
+
+
+def to_pandas(frame):
+    return frame
@@ -0,0 +1,172 @@
+"""
+Polars Backend
+
+The stage operations of pipeline.pandas_backend on Polars lazy frames. Each
+operation only adds expressions to the query plan; nothing runs until the
+frame is materialized, and Polars then executes the whole plan on its
+multi-threaded columnar engine (projection pushdown, parallel group-bys and
+window expressions).
+
+Group statistics are window expressions (sum/count over the group), so row
+order is kept without joins. Group-mode imputation joins the per-group mode
+back with maintain_order='left'. One-hot encoding needs the sorted
+vocabulary up front, which costs one small extra aggregate query.
+
+Semantics match the pandas backend: Discount-style boolean columns are
+filled as the text 'True'/'False' (how pandas writes them), rows without a
+group get the global target mean, and quantiles interpolate linearly.
+
+Requires polars (pip install polars); converting to pandas also needs pyarrow.
+
+Usage:
+    from pipeline import polars_backend as backend
+    frame = backend.listwise_delete(backend.read_csv(path), 'Total Spent')
+    result = backend.to_pandas(frame)
+"""
+
+import numpy as np
+import polars as pl
+
+
+NAME = 'polars'
+
+NUMERIC_COLUMNS = ['Price Per Unit', 'Quantity', 'Total Spent']
+
+# Planned dtype names (see pipeline.dtype_plan) -> Polars dtypes
+POLARS_DTYPES = {
+    'uint8': pl.UInt8,
+    'bool': pl.Boolean,
+    'float32': pl.Float32,
+    'float64': pl.Float64,
+}
+
+MODE_COLUMN = '__mode'
+FOLD_COLUMN = '__fold'
+
+
+# Scan a transaction CSV lazily; numeric columns are read as Float64 like the pandas backend
+def read_csv(path):
+    return pl.scan_csv(path, schema_overrides={column: pl.Float64 for column in NUMERIC_COLUMNS})
+
+
+# Drop rows where column is missing
+def listwise_delete(frame, column):
+    return frame.filter(pl.col(column).is_not_null())
+
+
+# Fill missing values of column with numerator / denominator
+def reconstruct_ratio(frame, column, numerator, denominator):
+    return frame.with_columns(
+        pl.when(pl.col(column).is_null()).then(pl.col(numerator) / pl.col(denominator)).otherwise(pl.col(column)).alias(column)
+    )
+
+
+# Fill missing values of column with the most frequent value of its group (ties go to the smallest value)
+# Rows whose group is missing or has no observed value stay missing
+def impute_group_mode(frame, column, group_column):
+    modes = (
+        frame.filter(pl.col(column).is_not_null() & pl.col(group_column).is_not_null())
+        .group_by(group_column, column)
+        .len()
+        .sort(['len', column], descending=[True, False])
+        .group_by(group_column, maintain_order=True)
+        .first()
+        .select(group_column, pl.col(column).alias(MODE_COLUMN))
+    )
+
+    return (
+        frame.join(modes, on=group_column, how='left', maintain_order='left')
+        .with_columns(pl.coalesce(column, MODE_COLUMN).alias(column))
+        .drop(MODE_COLUMN)
+    )
+
+
+# Fill missing values of column with a constant
+# Boolean columns become text first, spelled 'True'/'False' as pandas writes them
+def fill_unknown(frame, column, value):
+    filled = pl.col(column)
+    if frame.collect_schema()[column] == pl.Boolean:
+        filled = filled.cast(pl.String).replace({'true': 'True', 'false': 'False'})
+
+    return frame.with_columns(filled.fill_null(value).alias(column))
+
+
+# Replace NaN/null encodings and rows without a group by the global target mean
+def with_global_mean_fallback(encoded, column, target):
+    global_mean = pl.col(target).mean()
+    return pl.when(pl.col(column).is_null()).then(global_mean).otherwise(encoded.fill_nan(None).fill_null(global_mean))
+
+
+# Leave-one-out target encoding: (group target sum - own target) / (group count - 1)
+# Rows that are alone in their group, or have no group, get the global target mean
+def loo_target_encode(frame, column, target, output):
+    group_sum = pl.col(target).sum().over(column)
+    group_count = pl.col(target).count().over(column)
+    encoded = (group_sum - pl.col(target)) / (group_count - 1)
+
+    return frame.with_columns(with_global_mean_fallback(encoded, column, target).alias(output))
+
+
+# Out-of-fold target encoding: rows of each fold get the target mean of their value in the other folds
+# folds holds one fold number per row (the frame must be materialized so its length is known)
+# Other-fold statistics are the group totals minus the totals of the row's own (value, fold) group
+def kfold_target_encode(frame, column, target, output, folds):
+    frame = frame.with_columns(pl.lit(pl.Series(FOLD_COLUMN, np.asarray(folds))))
+
+    other_sum = pl.col(target).sum().over(column) - pl.col(target).sum().over(column, FOLD_COLUMN)
+    other_count = pl.col(target).count().over(column) - pl.col(target).count().over(column, FOLD_COLUMN)
+    encoded = other_sum / other_count
+
+    return frame.with_columns(with_global_mean_fallback(encoded, column, target).alias(output)).drop(FOLD_COLUMN)
+
+
+# One column per value of column (sorted), named prefix_value; rows with a missing value are all zeros
+def one_hot_encode(frame, column, prefix, dtype='uint8'):
+    vocabulary = frame.select(pl.col(column).drop_nulls().unique().sort()).collect().to_series().to_list()
+    polars_dtype = POLARS_DTYPES[np.dtype(dtype).name]
+
+    return frame.with_columns(
+        (pl.col(column) == value).fill_null(False).cast(polars_dtype).alias(f'{prefix}_{value}') for value in vocabulary
+    )
+
+
+# 1 where column equals positive, 0 otherwise (missing values included)
+def binary_encode(frame, column, positive, output):
+    return frame.with_columns((pl.col(column) == positive).fill_null(False).cast(pl.UInt8).alias(output))
+
+
+# Min-max normalization to [0, 1]
+def min_max_scale(frame, column, output):
+    value_range = pl.col(column).max() - pl.col(column).min()
+    scale = pl.when(value_range == 0).then(1.0).otherwise(value_range)
+
+    return frame.with_columns(((pl.col(column) - pl.col(column).min()) / scale).alias(output))
+
+
+# Z-score standardization with the population standard deviation (ddof=0, like StandardScaler)
+def standard_scale(frame, column, output):
+    std = pl.col(column).std(ddof=0)
+    scale = pl.when(std == 0).then(1.0).otherwise(std)
+
+    return frame.with_columns(((pl.col(column) - pl.col(column).mean()) / scale).alias(output))
+
+
+# (x - median) / IQR with linearly interpolated quartiles (like RobustScaler)
+def robust_scale(frame, column, output):
+    iqr = pl.col(column).quantile(0.75, interpolation='linear') - pl.col(column).quantile(0.25, interpolation='linear')
+    scale = pl.when(iqr == 0).then(1.0).otherwise(iqr)
+
+    return frame.with_columns(((pl.col(column) - pl.col(column).quantile(0.5, interpolation='linear')) / scale).alias(output))
+
+
+# Run the query plan built so far and continue from its result
+def materialize(frame):
+    return frame.collect().lazy()
+
+
+def row_count(frame):
+    return frame.select(pl.len()).collect().item()
+
+
+def to_pandas(frame):
+    return frame.collect().to_pandas()
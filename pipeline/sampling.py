@@ -0,0 +1,252 @@
+"""
+Stratified Sampling Mode
+
+Runs the pipeline on a small sample of the raw dataset for fast iterations
+when tuning encoders or scalers. A uniform sample would blur the structure
+the missing-data stages depend on, so the sample is stratified over
+missingness pattern x Category:
+
+  pattern   which of Item, Price Per Unit, Quantity, Total Spent and
+            Discount Applied are missing (Total Spent / Quantity and
+            Price / Item go missing together, Discount completely at random)
+
+Every stratum keeps its share of the rows (largest-remainder allocation, at
+least one row per stratum), rows keep their original order and the sampled
+raw CSV is written verbatim, so the stage scripts see the real formatting.
+
+After the stages ran on the sample, dataset_statistics collects the same
+statistics from the sample's outputs and from a full-data run (missing rates
+and co-missingness, Category / Payment Method / Location / Discount mix, rows
+kept by cleaning, encoding means, scaler parameters) and compare_statistics
+lists how far each one moved.
+
+Usage:
+    python -m pipeline --sample 0.1 --workdir /tmp/sample
+    python -m pipeline.sampling --fraction 0.1 --seed 7 --output /tmp/sample/datasource/Deliverable1Dataset.csv
+    python -m pipeline.sampling --compare /tmp/sample --reference submission
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.deltas import output_exists, read_stage_output
+from pipeline.stages import CLEANED_DATASET, ENCODING_OUTPUT, RAW_DATASET, SUBMISSION_DIR
+
+
+# Columns whose missingness defines the pattern of a row, in pattern order
+PATTERN_COLUMNS = ['Item', 'Price Per Unit', 'Quantity', 'Total Spent', 'Discount Applied']
+STRATUM_COLUMN = 'Category'
+
+# Co-missingness reported as P(second missing | first missing)
+CO_MISSING_PAIRS = [('Total Spent', 'Quantity'), ('Price Per Unit', 'Item')]
+
+MIX_COLUMNS = ['Category', 'Payment Method', 'Location', 'Discount Applied']
+SCALED_COLUMNS = ['Quantity', 'Price Per Unit', 'Total Spent']
+DATE_COLUMN = 'Transaction Date'
+ENCODED_DATASET = f'{ENCODING_OUTPUT}/final_fully_encoded_dataset.csv'
+
+# Sections whose statistics are shares of rows
+SHARE_SECTIONS = ('missingness', 'mix')
+
+DEFAULT_FRACTION = 0.1
+DEFAULT_SEED = 42
+MIN_ROWS_PER_STRATUM = 1
+
+
+# Read the raw CSV as text, so a sample is written back exactly as it was read
+# Only empty fields count as missing
+def read_raw_text(raw_path):
+    return pd.read_csv(raw_path, dtype=str, keep_default_na=False, na_values=[''])
+
+
+# Missingness pattern of every row: one '1' (missing) or '0' per pattern column, e.g. '10110'
+def missingness_patterns(dataframe):
+    missing = dataframe[PATTERN_COLUMNS].isna().to_numpy()
+    digits = np.where(missing, '1', '0')
+
+    return pd.Series([''.join(row) for row in digits], index=dataframe.index, name='pattern')
+
+
+# Rows to draw from every stratum: proportional shares rounded by largest remainder, at least min_rows each
+# Returns Series of stratum -> row count
+def allocate_sample_rows(stratum_sizes, fraction, min_rows=MIN_ROWS_PER_STRATUM):
+    quotas = stratum_sizes * fraction
+    allocation = np.floor(quotas).astype(int)
+
+    shortfall = int(round(stratum_sizes.sum() * fraction)) - allocation.sum()
+    if shortfall > 0:
+        largest_remainders = (quotas - allocation).sort_values(ascending=False, kind='stable').index[:shortfall]
+        allocation[largest_remainders] += 1
+
+    return allocation.clip(lower=np.minimum(min_rows, stratum_sizes))
+
+
+# Draw a stratified sample over missingness pattern x Category
+# Returns tuple of (sampled rows in original order, DataFrame of per-stratum population and sample sizes)
+def stratified_sample(dataframe, fraction, seed=DEFAULT_SEED, min_rows=MIN_ROWS_PER_STRATUM):
+    if not 0 < fraction <= 1:
+        raise ValueError(f'Sample fraction must be in (0, 1], got {fraction}')
+
+    strata = missingness_patterns(dataframe) + '|' + dataframe[STRATUM_COLUMN].fillna('<missing>')
+    stratum_codes, stratum_names = pd.factorize(strata, sort=True)
+    stratum_sizes = pd.Series(np.bincount(stratum_codes), index=stratum_names)
+    allocation = allocate_sample_rows(stratum_sizes, fraction, min_rows)
+
+    rng = np.random.default_rng(seed)
+    order = np.argsort(stratum_codes, kind='stable')
+    boundaries = np.concatenate([[0], np.cumsum(stratum_sizes.to_numpy())])
+
+    chosen = [rng.choice(order[boundaries[code]:boundaries[code + 1]], size=allocation.iloc[code], replace=False)
+              for code in range(len(stratum_names))]
+    positions = np.sort(np.concatenate(chosen))
+
+    strata_table = pd.DataFrame({'population': stratum_sizes, 'sample': allocation})
+    strata_table.index.name = 'pattern|category'
+
+    return dataframe.iloc[positions], strata_table
+
+
+# Write a stratified sample of the raw CSV
+# Returns the per-stratum sizes
+def write_raw_sample(raw_path, output_path, fraction, seed=DEFAULT_SEED):
+    sample, strata_table = stratified_sample(read_raw_text(raw_path), fraction, seed)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    sample.to_csv(output_path, index=False)
+
+    return strata_table
+
+
+# Shares of every value of a column (missing values count as their own value)
+def value_shares(values):
+    return values.fillna('<missing>').astype(str).value_counts(normalize=True).sort_index()
+
+
+# Fit parameters of the three scalers for one column (NaN ignored), as pipeline.scalers computes them
+def scaler_parameters(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    first_quartile, median, third_quartile = np.percentile(values, (25, 50, 75))
+
+    return {'min': values.min(), 'max': values.max(), 'mean': values.mean(), 'std': values.std(),
+            'median': median, 'iqr': third_quartile - first_quartile}
+
+
+# Statistics of one pipeline run, read from its working directory
+# Outputs that do not exist are skipped; delta outputs are read through pipeline.deltas
+# Returns dictionary of section -> {statistic name: value}
+def dataset_statistics(workdir):
+    workdir = Path(workdir)
+    statistics = {}
+
+    raw = read_raw_text(workdir / RAW_DATASET)
+    missing = raw[PATTERN_COLUMNS].isna()
+    missingness = {f'missing rate {column}': missing[column].mean() for column in PATTERN_COLUMNS}
+    for given, other in CO_MISSING_PAIRS:
+        missingness[f'P({other} missing | {given} missing)'] = missing.loc[missing[given], other].mean()
+    missingness.update({f'pattern {pattern} share': share for pattern, share in value_shares(missingness_patterns(raw)).items()})
+    statistics['missingness'] = missingness
+
+    if output_exists(workdir / CLEANED_DATASET):
+        cleaned = read_stage_output(workdir / CLEANED_DATASET)
+        statistics['cleaning'] = {'rows kept share': len(cleaned) / len(raw)}
+        statistics['mix'] = {f'{column} = {value}': share
+                             for column in MIX_COLUMNS for value, share in value_shares(cleaned[column]).items()}
+
+        scaler = {}
+        for column in SCALED_COLUMNS:
+            scaler.update({f'{column} {name}': value for name, value in scaler_parameters(cleaned[column]).items()})
+        days = pd.to_datetime(cleaned[DATE_COLUMN]).astype('datetime64[s]').astype(np.int64) / 86400
+        scaler.update({f'{DATE_COLUMN} {name} (days)': days.agg(name) for name in ('min', 'max')})
+        statistics['scaler'] = scaler
+
+    if output_exists(workdir / ENCODED_DATASET):
+        encoded = read_stage_output(workdir / ENCODED_DATASET)
+        statistics['encoding'] = {f'mean {column}': encoded[column].mean() for column in encoded.columns if column not in raw.columns}
+
+    return statistics
+
+
+# Compare the statistics of a sample run with those of the full run
+# A share missing on one side (a value or pattern the sample lacks) counts as 0; other statistics are skipped
+# Returns list of dictionaries of section, statistic, full, sample, absolute and relative difference
+def compare_statistics(full_statistics, sample_statistics):
+    rows = []
+
+    for section, full_values in full_statistics.items():
+        sample_values = sample_statistics.get(section, {})
+        default = 0.0 if section in SHARE_SECTIONS else None
+        for name in sorted(set(full_values) | set(sample_values)):
+            full_value = full_values.get(name, default)
+            sample_value = sample_values.get(name, default)
+            if full_value is None or sample_value is None:
+                continue
+
+            difference = float(sample_value) - float(full_value)
+            rows.append({
+                'section': section,
+                'statistic': name,
+                'full': float(full_value),
+                'sample': float(sample_value),
+                'difference': difference,
+                'relative_difference': difference / abs(full_value) if full_value else None,
+            })
+
+    return rows
+
+
+# Largest absolute difference per section
+def summarize_differences(rows):
+    summary = {}
+    for row in rows:
+        summary[row['section']] = max(summary.get(row['section'], 0.0), abs(row['difference']))
+
+    return summary
+
+
+# Comparison as aligned text, one statistic per line
+def format_comparison(rows):
+    lines = [f"{'section':12s} {'statistic':52s} {'full':>14s} {'sample':>14s} {'difference':>12s} {'relative':>9s}"]
+
+    for row in rows:
+        relative = f"{row['relative_difference'] * 100:8.2f}%" if row['relative_difference'] is not None else f"{'':9s}"
+        lines.append(f"{row['section']:12s} {row['statistic'][:52]:52s} {row['full']:14.6f} {row['sample']:14.6f} "
+                     f"{row['difference']:+12.6f} {relative}")
+
+    for section, largest in summarize_differences(rows).items():
+        lines.append(f"{'max |diff|':12s} {section:52s} {'':14s} {'':14s} {largest:12.6f}")
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw a stratified sample of the raw dataset or compare a sample run with the full run.')
+    parser.add_argument('--input', type=Path, default=SUBMISSION_DIR / RAW_DATASET, help='raw CSV to sample (default: the submission dataset)')
+    parser.add_argument('--output', type=Path, help='write the sampled raw CSV here')
+    parser.add_argument('--fraction', type=float, default=DEFAULT_FRACTION, help=f'share of rows to keep (default: {DEFAULT_FRACTION})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'random seed (default: {DEFAULT_SEED})')
+    parser.add_argument('--compare', type=Path, metavar='WORKDIR', help='working directory of a sample run to compare')
+    parser.add_argument('--reference', type=Path, default=SUBMISSION_DIR, help='working directory of the full run (default: submission/)')
+    parser.add_argument('--format', choices=('table', 'json'), default='table', dest='report_format')
+    arguments = parser.parse_args()
+
+    if arguments.output is None and arguments.compare is None:
+        parser.error('nothing to do: pass --output and/or --compare')
+
+    if arguments.output is not None:
+        strata_table = write_raw_sample(arguments.input, arguments.output, arguments.fraction, arguments.seed)
+        print(f"Sampled {strata_table['sample'].sum()} of {strata_table['population'].sum()} rows "
+              f"from {len(strata_table)} strata into {arguments.output}")
+
+    if arguments.compare is not None:
+        rows = compare_statistics(dataset_statistics(arguments.reference), dataset_statistics(arguments.compare))
+        print(json.dumps(rows, indent=2) if arguments.report_format == 'json' else format_comparison(rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+NumPy Scalers
+
+The three rescaling methods of the rescale stage scripts as plain NumPy
+arithmetic, so a rescaler does not pay for importing scikit-learn. Each
+function repeats the float64 operations of its sklearn counterpart in the
+same order, so the results are bit-identical:
+
+  min_max_scale   X * (1 / (max - min)) - min / (max - min)       (MinMaxScaler)
+  standard_scale  (X - mean) / std, population std (ddof=0)       (StandardScaler)
+  robust_scale    (X - median) / (Q3 - Q1), linear percentiles    (RobustScaler)
+
+Missing values are ignored when fitting and stay missing. A constant column
+(zero range, std or IQR) is scaled by 1 instead of divided by zero.
+
+Usage:
+    dataframe['Quantity_Normalized'] = min_max_scale(dataframe['Quantity'])
+"""
+
+import numpy as np
+
+
+EPSILON = np.finfo(np.float64).eps
+
+
+# Values of one column as a float64 (n, 1) array, the shape the sklearn scalers work on
+def column_matrix(values):
+    return np.array(values, dtype=np.float64).reshape(-1, 1)
+
+
+# Replace near-zero scales by 1 (constant columns); constant_mask overrides the near-zero test
+def nonzero_scale(scale, constant_mask=None):
+    if constant_mask is None:
+        constant_mask = scale < 10 * EPSILON
+
+    scale = scale.copy()
+    scale[constant_mask] = 1.0
+
+    return scale
+
+
+# Min-max normalization to [0, 1]
+# Returns float64 array, one value per input value
+def min_max_scale(values):
+    matrix = column_matrix(values)
+
+    data_min = np.nanmin(matrix, axis=0)
+    data_range = np.nanmax(matrix, axis=0) - data_min
+    scale = 1.0 / nonzero_scale(data_range)
+
+    matrix *= scale
+    matrix += 0.0 - data_min * scale
+
+    return matrix[:, 0]
+
+
+# Z-score standardization with the population standard deviation (ddof=0)
+# Mean and variance use the corrected two-pass algorithm (Chan, Golub and LeVeque), as StandardScaler does
+# Returns float64 array, one value per input value
+def standard_scale(values):
+    matrix = column_matrix(values)
+
+    missing = np.isnan(matrix)
+    total = np.nansum if missing.any() else np.sum
+    count = matrix.shape[0] - total(missing.astype(np.float64), axis=0)
+
+    mean = total(matrix, axis=0) / count
+    centered = matrix - mean
+    correction = total(centered, axis=0)
+    variance = (total(centered ** 2, axis=0) - correction ** 2 / count) / count
+
+    # Variances within the rounding error of the two-pass algorithm count as constant
+    constant = variance <= count[0] * EPSILON * variance + (count[0] * mean * EPSILON) ** 2
+    scale = nonzero_scale(np.sqrt(variance), constant_mask=constant)
+
+    matrix -= mean
+    matrix /= scale
+
+    return matrix[:, 0]
+
+
+# (x - median) / IQR with linearly interpolated quartiles
+# Returns float64 array, one value per input value
+def robust_scale(values):
+    matrix = column_matrix(values)
+
+    center = np.nanmedian(matrix, axis=0)
+    first_quartile, third_quartile = np.nanpercentile(matrix[:, 0], (25, 75))
+    scale = nonzero_scale(np.array([third_quartile - first_quartile]))
+
+    matrix -= center
+    matrix /= scale
+
+    return matrix[:, 0]
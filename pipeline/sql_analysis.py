@@ -0,0 +1,237 @@
+"""
+Embedded SQL Analysis Path (DuckDB)
+
+Answers the analysis steps of the missing-data stage scripts with SQL
+aggregates run by an in-process DuckDB connection directly over the raw CSV
+or Parquet file. DuckDB scans in parallel, only reads the referenced columns
+and aggregates out of core, so nothing is loaded into pandas except the small
+result tables.
+
+  analyze_missingness_mechanism        share of missing values by Category, Payment Method and Location
+                                       (one scan: GROUPING SETS)
+  assess_total_spent_reconstructability  missing Total Spent with / without Price Per Unit and Quantity
+  assess_price_reconstructability        missing Price Per Unit recoverable as Total Spent / Quantity
+  analyze_item_distribution_by_category  Item mode (ties -> smallest Item) and distinct Items per Category
+  analyze_observed_value_distribution    observed Discount Applied counts and True/False ratio
+
+Each stage analyses the rows it sees in the pipeline, so the Total Spent
+deletion is applied as a WHERE clause for the later columns (STAGE_FILTERS).
+Results come back as the same pandas Series / tuples the stage scripts print.
+
+Requires duckdb (pip install duckdb).
+
+Usage:
+    python -m pipeline.sql_analysis submission/datasource/Deliverable1Dataset.csv
+    python -m pipeline.sql_analysis big.parquet --threads 8
+"""
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+
+# Column names
+TOTAL_SPENT = 'Total Spent'
+PRICE_PER_UNIT = 'Price Per Unit'
+QUANTITY = 'Quantity'
+CATEGORY = 'Category'
+PAYMENT_METHOD = 'Payment Method'
+LOCATION = 'Location'
+ITEM = 'Item'
+DISCOUNT_APPLIED = 'Discount Applied'
+
+MECHANISM_GROUPS = (CATEGORY, PAYMENT_METHOD, LOCATION)
+
+# Rows each missing-data stage sees: stages after the Total Spent deletion work on rows with Total Spent
+AFTER_DELETION = f'"{TOTAL_SPENT}" IS NOT NULL'
+STAGE_FILTERS = {
+    TOTAL_SPENT: 'TRUE',
+    PRICE_PER_UNIT: AFTER_DELETION,
+    ITEM: AFTER_DELETION,
+    DISCOUNT_APPLIED: AFTER_DELETION,
+}
+
+# The stage scripts print Total Spent, Price Per Unit and Item shares in percent, Discount Applied as fractions
+SHARE_SCALES = {
+    TOTAL_SPENT: 100,
+    PRICE_PER_UNIT: 100,
+    ITEM: 100,
+    DISCOUNT_APPLIED: 1,
+}
+
+
+# Quote a column name for SQL
+def quoted(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+# Open an in-process DuckDB connection (threads=None keeps DuckDB's default of one per core)
+# Raises ImportError naming the package when duckdb is not installed
+def connect(threads=None):
+    try:
+        import duckdb
+    except ImportError as error:
+        raise ImportError('The SQL analysis path requires duckdb (pip install duckdb)') from error
+
+    connection = duckdb.connect(':memory:')
+    if threads is not None:
+        connection.execute(f'SET threads = {int(threads)}')
+
+    return connection
+
+
+# SQL table expression scanning a CSV or Parquet file
+def source_relation(path):
+    path = Path(path)
+    literal = "'" + str(path).replace("'", "''") + "'"
+
+    if path.suffix == '.parquet':
+        return f'read_parquet({literal})'
+    return f'read_csv({literal}, header = true)'
+
+
+# Run a query and return the result as a pandas DataFrame
+def query(connection, sql):
+    return connection.execute(sql).df()
+
+
+# Share of rows with column missing per Category, Payment Method and Location, in one scan
+# Rows whose group value is missing are left out, like group_share
+# Returns tuple of (category_share, payment_share, location_share), each sorted descending and scaled like the scripts
+def analyze_missingness_mechanism(connection, source, column):
+    group_list = ', '.join(quoted(group) for group in MECHANISM_GROUPS)
+    result = query(connection, f"""
+        SELECT {group_list},
+               GROUPING({group_list}) AS grouping_id,
+               avg(CASE WHEN {quoted(column)} IS NULL THEN 1.0 ELSE 0.0 END) AS share
+        FROM {source}
+        WHERE {STAGE_FILTERS[column]}
+        GROUP BY GROUPING SETS ({', '.join(f'({quoted(group)})' for group in MECHANISM_GROUPS)})
+    """)
+
+    shares = []
+    for position, group in enumerate(MECHANISM_GROUPS):
+        # GROUPING() sets one bit per column left out of the grouping set; the grouped column has its bit cleared
+        bit = 1 << (len(MECHANISM_GROUPS) - 1 - position)
+        rows = result[(result['grouping_id'] & bit == 0) & result[group].notna()]
+
+        share = pd.Series(rows['share'].to_numpy(), index=pd.Index(rows[group].to_numpy(), name=group), name=column)
+        shares.append(share.sort_index().sort_values(ascending=False, kind='stable') * SHARE_SCALES[column])
+
+    return tuple(shares)
+
+
+# Missing Total Spent that can / cannot be rebuilt as Price Per Unit x Quantity
+# Returns tuple of (reconstructable_count, reconstruction_rate, irrecoverable_count, irrecoverable_rate)
+def assess_total_spent_reconstructability(connection, source):
+    counts = query(connection, f"""
+        SELECT count(*) FILTER (WHERE {quoted(TOTAL_SPENT)} IS NULL) AS missing,
+               count(*) FILTER (WHERE {quoted(TOTAL_SPENT)} IS NULL
+                                  AND {quoted(PRICE_PER_UNIT)} IS NOT NULL
+                                  AND {quoted(QUANTITY)} IS NOT NULL) AS reconstructable
+        FROM {source}
+    """).iloc[0]
+
+    missing, reconstructable = int(counts['missing']), int(counts['reconstructable'])
+    irrecoverable = missing - reconstructable
+
+    return (reconstructable, reconstructable / missing if missing else 0,
+            irrecoverable, irrecoverable / missing if missing else 0)
+
+
+# Missing Price Per Unit (after the Total Spent deletion) that can be rebuilt as Total Spent / Quantity
+# Returns tuple of (reconstructable_count, reconstruction_rate in percent, zero_quantity_count)
+def assess_price_reconstructability(connection, source):
+    counts = query(connection, f"""
+        SELECT count(*) FILTER (WHERE {quoted(PRICE_PER_UNIT)} IS NULL) AS missing,
+               count(*) FILTER (WHERE {quoted(PRICE_PER_UNIT)} IS NULL AND {quoted(QUANTITY)} IS NOT NULL) AS reconstructable,
+               count(*) FILTER (WHERE {quoted(PRICE_PER_UNIT)} IS NULL AND {quoted(QUANTITY)} = 0) AS zero_quantity
+        FROM {source}
+        WHERE {STAGE_FILTERS[PRICE_PER_UNIT]}
+    """).iloc[0]
+
+    missing, reconstructable = int(counts['missing']), int(counts['reconstructable'])
+
+    return reconstructable, reconstructable / missing * 100 if missing else 0, int(counts['zero_quantity'])
+
+
+# Item mode per Category (ties go to the smallest Item, like group_mode) and distinct Items per Category
+# Returns tuple of (category_mode_map, item_variety sorted descending)
+def analyze_item_distribution_by_category(connection, source):
+    result = query(connection, f"""
+        WITH pair_counts AS (
+            SELECT {quoted(CATEGORY)} AS category, {quoted(ITEM)} AS item, count(*) AS row_count
+            FROM {source}
+            WHERE {STAGE_FILTERS[ITEM]} AND {quoted(CATEGORY)} IS NOT NULL AND {quoted(ITEM)} IS NOT NULL
+            GROUP BY ALL
+        ),
+        ranked AS (
+            SELECT category, item,
+                   row_number() OVER (PARTITION BY category ORDER BY row_count DESC, item) AS mode_rank,
+                   count(*) OVER (PARTITION BY category) AS unique_items
+            FROM pair_counts
+        )
+        SELECT category, item AS mode_item, unique_items FROM ranked WHERE mode_rank = 1 ORDER BY category
+    """)
+
+    category_mode_map = dict(zip(result['category'], result['mode_item']))
+    item_variety = pd.Series(result['unique_items'].to_numpy(), index=result['category'].to_numpy()).sort_values(ascending=False, kind='stable')
+
+    return category_mode_map, item_variety
+
+
+# Counts of the observed (non-missing) Discount Applied values and the True/False balance
+# Returns tuple of (value_counts sorted by value, true_count, false_count, balance_ratio)
+def analyze_observed_value_distribution(connection, source):
+    result = query(connection, f"""
+        SELECT {quoted(DISCOUNT_APPLIED)} AS value, count(*) AS row_count
+        FROM {source}
+        WHERE {STAGE_FILTERS[DISCOUNT_APPLIED]} AND {quoted(DISCOUNT_APPLIED)} IS NOT NULL
+        GROUP BY ALL
+        ORDER BY value
+    """)
+
+    value_counts = pd.Series(result['row_count'].to_numpy(), index=pd.Index(result['value'].to_numpy(), name=DISCOUNT_APPLIED), name='count')
+    true_count = int(value_counts.get(True, 0))
+    false_count = int(value_counts.get(False, 0))
+    balance_ratio = true_count / false_count if false_count > 0 else 0
+
+    return value_counts, true_count, false_count, balance_ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the missing-data analysis as DuckDB SQL over a raw CSV or Parquet file.')
+    parser.add_argument('input', type=Path, help='raw transaction file (.csv or .parquet)')
+    parser.add_argument('--threads', type=int, help='DuckDB worker threads (default: one per core)')
+    arguments = parser.parse_args()
+
+    connection = connect(arguments.threads)
+    source = source_relation(arguments.input)
+
+    for column in STAGE_FILTERS:
+        print(f'MISSINGNESS MECHANISM ANALYSIS - {column}')
+        for group, share in zip(MECHANISM_GROUPS, analyze_missingness_mechanism(connection, source, column)):
+            print(f'\nMissing {column} by {group}' + (' (%):' if SHARE_SCALES[column] == 100 else ':'))
+            print(share.round(4))
+        print()
+
+    print('RECONSTRUCTABILITY ASSESSMENT')
+    reconstructable, _, irrecoverable, _ = assess_total_spent_reconstructability(connection, source)
+    print(f'Missing {TOTAL_SPENT} that CAN be reconstructed: {reconstructable}, CANNOT: {irrecoverable}')
+    reconstructable, rate, zero_quantity = assess_price_reconstructability(connection, source)
+    print(f'Missing {PRICE_PER_UNIT} that CAN be reconstructed: {reconstructable} ({rate:.1f}%), zero Quantity: {zero_quantity}')
+
+    print('\nITEM DISTRIBUTION ANALYSIS')
+    category_mode_map, item_variety = analyze_item_distribution_by_category(connection, source)
+    for category, count in item_variety.items():
+        print(f'{category:40s}: {count:3d} unique items, mode {category_mode_map[category]}')
+
+    print('\nOBSERVED VALUE DISTRIBUTION ANALYSIS')
+    value_counts, true_count, false_count, balance_ratio = analyze_observed_value_distribution(connection, source)
+    print(value_counts)
+    print(f'\nTrue/False ratio: {balance_ratio:.3f}')
+
+
+if __name__ == '__main__':
+    main()
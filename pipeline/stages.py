@@ -0,0 +1,309 @@
+"""
+Stage Registry and Runner
+
+Describes every stage script of the submission pipeline and runs a stage
+against an arbitrary working directory. The working directory mirrors the
+submission layout (datasource/ and output/), so each script's module-level
+path constants are re-rooted into it before main() is called.
+
+Usage (runs one stage and writes a JSON metrics report):
+    python -m pipeline.stages missing_total_spent --workdir /tmp/run --report /tmp/run/report.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+from pipeline.deltas import count_output_rows, stage_output_files
+from pipeline.headless import HEADLESS_VARIABLE
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SUBMISSION_DIR = REPO_ROOT / 'submission'
+SOURCES_DIR = SUBMISSION_DIR / 'sources'
+
+# Sub-directories of the submission tree that a stage reads from or writes to
+DATA_DIRECTORIES = ('datasource', 'output')
+
+RAW_DATASET = 'datasource/Deliverable1Dataset.csv'
+MISSING_OUTPUT = 'output/1_handle_missing_data'
+ENCODING_OUTPUT = 'output/2_handle_encoding_data'
+RESCALE_OUTPUT = 'output/3_handle_rescale_data'
+CLEANED_DATASET = f'{MISSING_OUTPUT}/final_cleaned_dataset.csv'
+
+# Every stage in execution order
+# 'input' is the primary input (used for rows in), 'extra_inputs' any other files the stage reads,
+# 'outputs' are the files the stage writes
+STAGES = [
+    {
+        'name': 'missing_total_spent',
+        'phase': 'missing',
+        'script': '1_handle_missing_data/total_spent_missing_data_2b.py',
+        'input': RAW_DATASET,
+        'outputs': [f'{MISSING_OUTPUT}/total_spent_cleaned.csv'],
+    },
+    {
+        'name': 'missing_price_per_unit',
+        'phase': 'missing',
+        'script': '1_handle_missing_data/price_per_unit_missing_data_2b.py',
+        'input': f'{MISSING_OUTPUT}/total_spent_cleaned.csv',
+        'outputs': [f'{MISSING_OUTPUT}/price_per_unit_reconstructed.csv'],
+    },
+    {
+        'name': 'missing_item',
+        'phase': 'missing',
+        'script': '1_handle_missing_data/item_missing_data_2b.py',
+        'input': f'{MISSING_OUTPUT}/price_per_unit_reconstructed.csv',
+        'outputs': [f'{MISSING_OUTPUT}/item_imputed.csv'],
+    },
+    {
+        'name': 'missing_discount_applied',
+        'phase': 'missing',
+        'script': '1_handle_missing_data/discount_applied_missing_data_2b.py',
+        'input': f'{MISSING_OUTPUT}/item_imputed.csv',
+        'outputs': [CLEANED_DATASET],
+    },
+    {
+        'name': 'encode_customer_id',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/customer_id_encode_data_2d.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/encoded_customer_id_dataset.csv'],
+    },
+    {
+        'name': 'encode_item',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/item_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/encoded_item_dataset.csv'],
+    },
+    {
+        'name': 'encode_category',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/category_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/encoded_category_dataset.csv'],
+    },
+    {
+        'name': 'encode_location',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/location_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/location_binary_encoded.csv'],
+    },
+    {
+        'name': 'encode_payment_method',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/payment_method_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/encoded_payment_method_dataset.csv'],
+    },
+    {
+        'name': 'encode_discount_applied',
+        'phase': 'encoding',
+        'script': '2_handle_encoding_data/discount_applied_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{ENCODING_OUTPUT}/discount_applied_one_hot_encoded.csv'],
+    },
+    {
+        'name': 'combine_all',
+        'phase': 'combine',
+        'script': '2_handle_encoding_data/combine_all_encode_data_2c.py',
+        'input': CLEANED_DATASET,
+        'extra_inputs': [
+            f'{ENCODING_OUTPUT}/encoded_category_dataset.csv',
+            f'{ENCODING_OUTPUT}/encoded_customer_id_dataset.csv',
+            f'{ENCODING_OUTPUT}/encoded_item_dataset.csv',
+            f'{ENCODING_OUTPUT}/location_binary_encoded.csv',
+            f'{ENCODING_OUTPUT}/encoded_payment_method_dataset.csv',
+            f'{ENCODING_OUTPUT}/discount_applied_one_hot_encoded.csv',
+        ],
+        'outputs': [f'{ENCODING_OUTPUT}/final_fully_encoded_dataset.csv', f'{ENCODING_OUTPUT}/final_feature_matrix/manifest.json'],
+    },
+    {
+        'name': 'rescale_transaction_date',
+        'phase': 'rescale',
+        'script': '3_handle_rescale_data/transaction_date_rescale_data_3c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{RESCALE_OUTPUT}/data_rescaling_norm_transaction_date.csv'],
+    },
+    {
+        'name': 'rescale_quantity',
+        'phase': 'rescale',
+        'script': '3_handle_rescale_data/quantity_rescale_data_3c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{RESCALE_OUTPUT}/data_rescaling_{method}_quantity.csv' for method in ('norm', 'std', 'robust')],
+    },
+    {
+        'name': 'rescale_price_per_unit',
+        'phase': 'rescale',
+        'script': '3_handle_rescale_data/price_per_unit_rescale_data_3c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{RESCALE_OUTPUT}/data_rescaling_{method}_price_per_unit.csv' for method in ('norm', 'std', 'robust')],
+    },
+    {
+        'name': 'rescale_total_spent',
+        'phase': 'rescale',
+        'script': '3_handle_rescale_data/total_spent_rescale_data_3c.py',
+        'input': CLEANED_DATASET,
+        'outputs': [f'{RESCALE_OUTPUT}/data_rescaling_{method}_total_spent.csv' for method in ('norm', 'std', 'robust')],
+    },
+]
+
+STAGES_BY_NAME = {stage['name']: stage for stage in STAGES}
+
+
+# Look up a stage definition by name
+# Raises KeyError listing the known stages when the name is unknown
+def get_stage(stage_name):
+    if stage_name not in STAGES_BY_NAME:
+        raise KeyError(f'Unknown stage {stage_name!r}; expected one of {sorted(STAGES_BY_NAME)}')
+    return STAGES_BY_NAME[stage_name]
+
+
+# Every file a stage reads, relative to the working directory
+def stage_inputs(stage):
+    return [stage['input']] + stage.get('extra_inputs', [])
+
+
+# Names of the stages that write the files a stage reads, in execution order
+def stage_dependencies(stage):
+    inputs = set(stage_inputs(stage))
+    return [other['name'] for other in STAGES if inputs.intersection(other['outputs'])]
+
+
+# Import a stage script as a module without running its main()
+# Returns the loaded module object
+def load_stage_module(stage):
+    script_path = SOURCES_DIR / stage['script']
+    module_name = 'stage_' + stage['name']
+
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+# Point every data path constant of a stage module into the working directory
+# Only Path constants under submission/datasource or submission/output are touched
+# Returns dictionary of constant name to new path
+def reroot_stage_paths(module, workdir):
+    workdir = Path(workdir)
+    rerooted = {}
+
+    for attribute_name, value in vars(module).items():
+        if not isinstance(value, Path) or not attribute_name.isupper():
+            continue
+
+        resolved = value.resolve()
+        for directory in DATA_DIRECTORIES:
+            data_root = SUBMISSION_DIR / directory
+            if resolved == data_root or data_root in resolved.parents:
+                new_path = workdir / resolved.relative_to(SUBMISSION_DIR)
+                setattr(module, attribute_name, new_path)
+                rerooted[attribute_name] = new_path
+                break
+
+    return rerooted
+
+
+# Count data rows of a CSV file without parsing it (header excluded)
+def count_csv_rows(csv_path):
+    line_count = 0
+    with open(csv_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            line_count += block.count(b'\n')
+
+    return max(line_count - 1, 0)
+
+
+# Peak resident set size of the current process in megabytes
+def peak_rss_megabytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+# Run one stage's main() against a working directory
+# Stage output (prints, plots) is suppressed unless verbose is set
+# With trace set, every step function is instrumented (see pipeline.instrumentation)
+# Returns dictionary of metrics: wall time, CPU time, peak RSS, rows in/out, bytes written, rows per second
+def run_stage(stage_name, workdir, verbose=False, trace=False):
+    stage = get_stage(stage_name)
+    workdir = Path(workdir)
+
+    # Plotting scripts call plt.show(); skip the plots (and their imports) and keep any that run non-interactive
+    os.environ.setdefault(HEADLESS_VARIABLE, '1')
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    module = load_stage_module(stage)
+    reroot_stage_paths(module, workdir)
+
+    step_trace = None
+    if trace:
+        from pipeline.instrumentation import instrument_module
+        step_trace = instrument_module(module, track_memory=False)
+
+    rows_in = count_output_rows(workdir / stage['input'])
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    output_sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output_sink:
+        module.main()
+
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    rows_out = count_output_rows(workdir / stage['outputs'][0])
+    output_files = {path.resolve() for output in stage['outputs'] for path in stage_output_files(workdir / output)}
+
+    metrics = {
+        'stage': stage['name'],
+        'phase': stage['phase'],
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': cpu_seconds,
+        'peak_rss_mb': peak_rss_megabytes(),
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'bytes_out': sum(path.stat().st_size for path in output_files),
+        'rows_per_second': rows_in / wall_seconds if wall_seconds > 0 else None,
+    }
+    if step_trace is not None:
+        metrics['steps'] = step_trace
+
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run one pipeline stage against a working directory.')
+    parser.add_argument('stage', choices=[stage['name'] for stage in STAGES])
+    parser.add_argument('--workdir', type=Path, default=SUBMISSION_DIR,
+                        help='directory holding datasource/ and output/ (default: submission/)')
+    parser.add_argument('--report', type=Path, help='write the stage metrics to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='show the stage script output')
+    parser.add_argument('--trace', action='store_true', help='include per-step timings in the report')
+    arguments = parser.parse_args()
+
+    metrics = run_stage(arguments.stage, arguments.workdir, verbose=arguments.verbose, trace=arguments.trace)
+
+    if arguments.report:
+        arguments.report.parent.mkdir(parents=True, exist_ok=True)
+        arguments.report.write_text(json.dumps(metrics, indent=2))
+    else:
+        print(json.dumps(metrics, indent=2))
+
+
+if __name__ == '__main__':
+    main()
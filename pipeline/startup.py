@@ -0,0 +1,141 @@
+"""
+Startup-Time Budget
+
+Measures what each stage script costs before its main() runs: a fresh
+interpreter imports the script file directly (python -X importtime, without
+importing pipeline.stages first, so the harness is not billed to the script)
+and the import time of its top-level modules is summed. Batch jobs start the small stages over and
+over, so each stage has a budget, and the heavy optional libraries
+(matplotlib, seaborn, scikit-learn, SciPy) must not be imported at startup at
+all: plotting is imported inside the plotting functions and skipped when
+headless (see pipeline.headless), and scaling / folds use NumPy
+(pipeline.scalers, pipeline.folds).
+
+Import times vary between runs, so every stage is measured repeat times and
+the fastest run counts. The exit status is 1 when a stage is over budget or
+imports a heavy module.
+
+Usage:
+    python -m pipeline.startup
+    python -m pipeline.startup --stages encode_location encode_discount_applied --repeat 5 --report startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from pipeline.headless import HEADLESS_VARIABLE
+from pipeline.stages import REPO_ROOT, SOURCES_DIR, STAGES, get_stage
+
+
+# Import-time budget per stage in milliseconds (pandas alone is about half of it)
+DEFAULT_BUDGET_MS = 1000
+STAGE_BUDGETS_MS = {
+    'encode_location': 800,
+    'encode_discount_applied': 800,
+    'encode_payment_method': 800,
+    'rescale_transaction_date': 800,
+}
+
+# Top-level packages that no stage may import at startup
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'sklearn', 'scipy')
+
+IMPORT_TIME_PREFIX = 'import time:'
+
+
+# Parse python -X importtime output
+# Returns list of (module name, self microseconds, cumulative microseconds, nesting depth)
+def parse_import_times(stderr_text):
+    entries = []
+
+    for line in stderr_text.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        fields = line[len(IMPORT_TIME_PREFIX):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+
+        name_field = fields[2].rstrip()
+        module_name = name_field.lstrip()
+        depth = (len(name_field) - len(module_name) - 1) // 2
+        entries.append((module_name, int(fields[0]), int(fields[1]), depth))
+
+    return entries
+
+
+# Import one stage script in a fresh headless interpreter with -X importtime
+# The script is loaded from its file, so only its own imports are measured
+# Returns dictionary of wall time, total import time, the slowest top-level imports and heavy modules seen
+def measure_stage_startup(stage_name):
+    script_path = str(SOURCES_DIR / get_stage(stage_name)['script'])
+    code = ('import importlib.util; '
+            f'spec = importlib.util.spec_from_file_location({"stage_" + stage_name!r}, {script_path!r}); '
+            'spec.loader.exec_module(importlib.util.module_from_spec(spec))')
+    environment = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')])))
+    environment[HEADLESS_VARIABLE] = '1'
+
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_ROOT, env=environment,
+                               capture_output=True, text=True)
+    wall_seconds = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        raise RuntimeError(f'Importing stage {stage_name} failed:\n{completed.stderr[-2000:]}')
+
+    entries = parse_import_times(completed.stderr)
+    top_level = sorted((entry for entry in entries if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+    heavy = sorted({entry[0].split('.')[0] for entry in entries} & set(HEAVY_MODULES))
+
+    return {
+        'wall_ms': wall_seconds * 1000,
+        'import_ms': sum(entry[2] for entry in top_level) / 1000,
+        'slowest_imports': [{'module': name, 'cumulative_ms': cumulative / 1000} for name, _, cumulative, _ in top_level[:5]],
+        'heavy_modules': heavy,
+    }
+
+
+# Measure every stage repeat times and check the fastest run against its budget
+# Returns dictionary of stage name -> measurement with budget_ms and passed
+def check_startup_budgets(stage_names, repeat=3):
+    results = {}
+
+    for stage_name in stage_names:
+        runs = [measure_stage_startup(stage_name) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run['import_ms'])
+        budget = STAGE_BUDGETS_MS.get(stage_name, DEFAULT_BUDGET_MS)
+
+        results[stage_name] = dict(best, budget_ms=budget, passed=best['import_ms'] <= budget and not best['heavy_modules'])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the startup (import) time of every stage script against its budget.')
+    parser.add_argument('--stages', nargs='+', choices=[stage['name'] for stage in STAGES], default=[stage['name'] for stage in STAGES])
+    parser.add_argument('--repeat', type=int, default=3, help='interpreter starts per stage; the fastest counts (default: 3)')
+    parser.add_argument('--report', type=Path, help='write the measurements to this JSON file')
+    arguments = parser.parse_args()
+
+    results = check_startup_budgets(arguments.stages, arguments.repeat)
+
+    for stage_name, result in results.items():
+        status = 'ok' if result['passed'] else 'OVER'
+        slowest = ', '.join(f"{entry['module']} {entry['cumulative_ms']:.0f}ms" for entry in result['slowest_imports'][:3])
+        print(f"{stage_name:26s} {result['import_ms']:7.1f}ms / {result['budget_ms']}ms {status:4s}  ({slowest})")
+        if result['heavy_modules']:
+            print(f"{'':26s} heavy modules imported: {', '.join(result['heavy_modules'])}")
+
+    if arguments.report:
+        arguments.report.parent.mkdir(parents=True, exist_ok=True)
+        arguments.report.write_text(json.dumps(results, indent=2))
+
+    if not all(result['passed'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+"""
+Streaming Ingestion
+
+Follows a growing transaction log instead of a finished CSV: either one
+append-only CSV file or a directory of CSV batch files (taken in name order,
+each may still be growing). Every complete new record is pushed through the
+same transforms as pipeline.out_of_core and appended as a feature row to an
+output sink:
+
+  cleaning   drop rows without Total Spent, Price Per Unit = Total Spent / Quantity
+             where missing, Item imputed with the fitted Category mode,
+             Discount Applied missing -> 'Unknown'
+  encoding   one-hot columns from the fitted vocabularies, Location_Encoded,
+             and running target encodings of Customer ID and Item: the mean
+             Total Spent of all earlier rows with the same key (reference rows
+             plus rows streamed before it), the global mean for unseen keys
+  scaling    min-max, z-score and robust columns with the frozen scaler
+             parameters, Transaction Date Numeric / Scaled
+
+The fitted model and the running encoding state come from a reference CSV
+(init) and live in a JSON checkpoint together with a durable offset per
+source file and the committed size of the sink. After each micro-batch the
+sink is flushed and fsynced first, then the checkpoint is replaced
+atomically, so a restart resumes exactly after the last committed batch:
+sink bytes written after it are truncated and their records read again.
+
+A record's running encodings only depend on the rows before it, so the sink
+is the same whatever the micro-batch sizes and however often the stream was
+restarted.
+
+Usage:
+    python -m pipeline.streaming init --reference submission/datasource/Deliverable1Dataset.csv --source /tmp/stream/incoming --sink /tmp/stream/features.csv --checkpoint /tmp/stream/checkpoint.json
+    python -m pipeline.streaming run --checkpoint /tmp/stream/checkpoint.json
+    python -m pipeline.streaming run --checkpoint /tmp/stream/checkpoint.json --once
+    python -m pipeline.streaming benchmark --rate 2000 --report streaming_benchmark.json
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import apply_dtype_plan
+from pipeline.group_index import MISSING_GROUP, factorize_group_column, group_sum
+from pipeline.out_of_core import (CATEGORY, CUSTOMER_ID, DISCOUNT_APPLIED, ITEM, LOCATION, N_FOLDS, NUMERIC_COLUMNS,
+                                  PAYMENT_METHOD, TARGET, TRANSACTION_DATE, TRANSACTION_ID, add_imputed_rows, clean_chunk,
+                                  collect_state, fit_transforms, impute_items, one_hot_columns, rescale_chunk)
+from pipeline.stages import RAW_DATASET, SUBMISSION_DIR
+
+
+CHECKPOINT_FORMAT_VERSION = 1
+DEFAULT_POLL_SECONDS = 0.05
+# Bytes read from one source file per micro-batch (about 10,000 records)
+DEFAULT_BATCH_BYTES = 1 << 20
+SOURCE_PATTERN = '*.csv'
+
+CUSTOMER_ENCODED = 'Customer ID Target Encoded'
+ITEM_ENCODED = 'Item Target Encoded'
+
+# Benchmark defaults: records appended per second and per write
+DEFAULT_RATE = 2000
+DEFAULT_APPEND_ROWS = 20
+
+
+# Fit the frozen model and the initial running encoding state on a reference CSV
+# Returns tuple of (model, running state), both JSON-serializable
+def fit_stream_model(reference_csv):
+    state, _ = collect_state(reference_csv)
+    fitted = fit_transforms(state)
+    item_modes = fitted['item_modes']
+
+    item_sums = sum(add_imputed_rows(state['item_sums'][fold], state['missing_item_sums'][fold], item_modes) for fold in range(N_FOLDS))
+    item_counts = sum(add_imputed_rows(state['item_counts'][fold], state['missing_item_counts'][fold], item_modes) for fold in range(N_FOLDS))
+
+    model = {
+        'global_mean': float(fitted['global_mean']),
+        'item_modes': {str(category): str(item) for category, item in item_modes.items()},
+        'vocabularies': {column: [str(value) for value in values] for column, values in fitted['vocabularies'].items()},
+        'scalers': {column: {name: float(value) for name, value in scaler.items()} for column, scaler in fitted['scalers'].items()},
+        'date_min': int(fitted['date_min']),
+        'date_range': int(fitted['date_range']),
+    }
+    running = {
+        'customer': {str(key): [float(state['customer_sums'][key]), int(state['customer_counts'][key])] for key in state['customer_sums'].index},
+        'item': {str(key): [float(item_sums[key]), int(item_counts[key])] for key in item_sums.index},
+    }
+
+    return model, running
+
+
+# New checkpoint for a source (file or directory) and a sink, nothing consumed yet
+def new_checkpoint(model, running, source, sink):
+    return {
+        'format_version': CHECKPOINT_FORMAT_VERSION,
+        'source': str(Path(source).resolve()),
+        'sink': {'path': str(Path(sink).resolve()), 'bytes': 0, 'rows': 0},
+        'offsets': {},
+        'rows_in': 0,
+        'batches': 0,
+        'model': model,
+        'running': running,
+    }
+
+
+# Write the checkpoint atomically: a fsynced temporary file replaces the old checkpoint
+def save_checkpoint(checkpoint, checkpoint_path):
+    checkpoint_path = Path(checkpoint_path)
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+
+    temporary_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+    with open(temporary_path, 'w') as handle:
+        json.dump(checkpoint, handle, separators=(',', ':'))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path):
+    checkpoint = json.loads(Path(checkpoint_path).read_text())
+
+    if checkpoint.get('format_version') != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f'Unsupported checkpoint format {checkpoint.get("format_version")!r}; expected {CHECKPOINT_FORMAT_VERSION}')
+
+    return checkpoint
+
+
+# Source files in the order they are consumed: the file itself, or the directory's CSV files by name
+def source_files(source):
+    source = Path(source)
+    if source.is_dir():
+        return sorted(source.glob(SOURCE_PATTERN))
+
+    return [source] if source.exists() else []
+
+
+# Complete lines of a file from offset on, at most max_bytes (a trailing partial line is left for later)
+# Raises ValueError when the file shrank below offset or one record is longer than max_bytes
+def read_complete_lines(path, offset, max_bytes=DEFAULT_BATCH_BYTES):
+    size = path.stat().st_size
+    if size < offset:
+        raise ValueError(f'{path} is shorter than its committed offset {offset}; sources must be append-only')
+    if size == offset:
+        return b''
+
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        data = handle.read(max_bytes)
+
+    end = data.rfind(b'\n')
+    if end < 0:
+        if len(data) == max_bytes:
+            raise ValueError(f'{path}: the record at byte {offset} is longer than {max_bytes} bytes')
+        return b''
+
+    return data[:end + 1]
+
+
+# Running target encoding of one key column: the mean target of all earlier rows with the same key
+# totals maps key -> [target sum, row count] of the rows seen so far and is updated with this batch
+# Rows without a key, or whose key has no earlier rows, get global_mean
+# Returns float64 array, one encoding per row
+def running_target_encoding(totals, keys, target, global_mean):
+    entry = factorize_group_column(keys)
+    codes = entry['codes']
+
+    # Totals before this batch per group, plus a zero row picked by missing keys (code -1)
+    before = np.array([totals.get(label, [0.0, 0]) for label in entry['uniques']] + [[0.0, 0]], dtype=np.float64)
+
+    # Earlier rows of the same key inside this batch
+    batch = pd.DataFrame({'code': codes, 'target': target})
+    earlier_sums = batch.groupby('code')['target'].cumsum().to_numpy() - target
+    earlier_counts = batch.groupby('code').cumcount().to_numpy()
+
+    sums = before[codes, 0] + earlier_sums
+    counts = before[codes, 1] + earlier_counts
+    encoded = np.full(len(codes), global_mean)
+    np.divide(sums, counts, out=encoded, where=(codes != MISSING_GROUP) & (counts > 0))
+
+    for label, batch_sum, batch_count in zip(entry['uniques'], group_sum(entry, target), entry['sizes']):
+        total_sum, total_count = totals.get(label, [0.0, 0])
+        totals[label] = [total_sum + float(batch_sum), total_count + int(batch_count)]
+
+    return encoded
+
+
+# Turn raw records (all columns as text) into feature rows: cleaned, encoded and rescaled
+# Updates the running encoding state of the checkpoint
+def transform_records(records, checkpoint):
+    model = checkpoint['model']
+    cleaned = impute_items(clean_chunk(records), pd.Series(model['item_modes'], dtype=object))
+    target = cleaned[TARGET].to_numpy(dtype=np.float64)
+
+    dummies = one_hot_columns(cleaned, model['vocabularies'])
+    features = cleaned[[TRANSACTION_ID] + NUMERIC_COLUMNS + [TRANSACTION_DATE]].assign(
+        **dummies[CATEGORY],
+        **{CUSTOMER_ENCODED: running_target_encoding(checkpoint['running']['customer'], cleaned[CUSTOMER_ID], target, model['global_mean']),
+           ITEM_ENCODED: running_target_encoding(checkpoint['running']['item'], cleaned[ITEM], target, model['global_mean']),
+           'Location_Encoded': (cleaned[LOCATION] == 'Online').to_numpy()},
+        **dummies[PAYMENT_METHOD],
+        **dummies[DISCOUNT_APPLIED],
+    )
+    features = apply_dtype_plan(features, columns=[column for column in features.columns if column not in (TRANSACTION_ID, TRANSACTION_DATE)])
+
+    rescaled = rescale_chunk(cleaned, model)
+    return features.assign(**{column: rescaled[column] for column in rescaled.columns.difference(cleaned.columns, sort=False)})
+
+
+# Open the sink for appending, cut back to the size of the last committed batch
+# Raises ValueError when the sink is shorter than the checkpoint says
+def open_sink(checkpoint):
+    sink_path = Path(checkpoint['sink']['path'])
+    committed_bytes = checkpoint['sink']['bytes']
+    sink_path.parent.mkdir(parents=True, exist_ok=True)
+
+    size = sink_path.stat().st_size if sink_path.exists() else 0
+    if size < committed_bytes:
+        raise ValueError(f'{sink_path} has {size} bytes but {committed_bytes} were committed')
+
+    handle = open(sink_path, 'ab')
+    handle.truncate(committed_bytes)
+
+    return handle
+
+
+# Append a batch of feature rows to the sink and make it durable
+# Returns number of bytes written
+def write_to_sink(features, sink, checkpoint):
+    data = features.to_csv(index=False, header=checkpoint['sink']['bytes'] == 0).encode()
+    sink.write(data)
+    sink.flush()
+    os.fsync(sink.fileno())
+
+    return len(data)
+
+
+# Consume every complete new record of the source files, one micro-batch per file read
+# Each batch is committed (sink fsynced, then checkpoint replaced) before the next one is read
+# on_batch(checkpoint) is called after every commit
+# Returns number of raw records consumed
+def poll_sources(checkpoint, checkpoint_path, sink, max_bytes=DEFAULT_BATCH_BYTES, on_batch=None):
+    consumed = 0
+
+    for path in source_files(checkpoint['source']):
+        position = checkpoint['offsets'].setdefault(path.name, {'offset': 0, 'header': None})
+
+        while True:
+            data = read_complete_lines(path, position['offset'], max_bytes)
+            if not data:
+                break
+
+            if position['header'] is None:
+                header_end = data.index(b'\n') + 1
+                position['header'] = data[:header_end].decode()
+                position['offset'] += header_end
+                data = data[header_end:]
+                if not data:
+                    continue
+
+            records = pd.read_csv(io.BytesIO(position['header'].encode() + data), dtype='str')
+            features = transform_records(records, checkpoint)
+
+            checkpoint['sink']['bytes'] += write_to_sink(features, sink, checkpoint)
+            checkpoint['sink']['rows'] += len(features)
+            position['offset'] += len(data)
+            checkpoint['rows_in'] += len(records)
+            checkpoint['batches'] += 1
+            save_checkpoint(checkpoint, checkpoint_path)
+
+            consumed += len(records)
+            if on_batch is not None:
+                on_batch(checkpoint)
+
+    return consumed
+
+
+# Follow the source from the committed offsets, polling every poll_seconds while nothing is new
+# Stops when once is set and the source is drained, or when stop (threading.Event) is set and the source is drained
+# Returns the final checkpoint
+def follow(checkpoint_path, poll_seconds=DEFAULT_POLL_SECONDS, once=False, stop=None, max_bytes=DEFAULT_BATCH_BYTES, on_batch=None):
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    with open_sink(checkpoint) as sink:
+        while True:
+            if poll_sources(checkpoint, checkpoint_path, sink, max_bytes, on_batch):
+                continue
+            if once or (stop is not None and stop.is_set()):
+                return checkpoint
+            if stop is not None:
+                stop.wait(poll_seconds)
+            else:
+                time.sleep(poll_seconds)
+
+
+# Header and data lines of a CSV file, as bytes
+def csv_lines(csv_path):
+    lines = Path(csv_path).read_bytes().splitlines(keepends=True)
+    return lines[0], lines[1:]
+
+
+# Create a stream under directory: checkpoint fitted on the reference CSV, empty source file, sink path
+# Returns tuple of (checkpoint path, source path, sink path)
+def create_stream(directory, model, running, header):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    source_path, sink_path, checkpoint_path = directory / 'transactions.csv', directory / 'features.csv', directory / 'checkpoint.json'
+
+    source_path.write_bytes(header)
+    save_checkpoint(new_checkpoint(model, running, source_path, sink_path), checkpoint_path)
+
+    return checkpoint_path, source_path, sink_path
+
+
+# Append lines to a source file and make them visible to the reader
+def append_lines(source_path, lines):
+    with open(source_path, 'ab') as handle:
+        handle.write(b''.join(lines))
+        handle.flush()
+
+
+# Benchmark the stream on the reference records
+#   throughput  a backlog of every record drained in micro-batches of max_bytes
+#   latency     records appended append_rows at a time at rate records per second while the stream
+#               follows; latency of a record = commit time of its batch - time it was appended
+#   restart     the backlog split in two with a restart in between (and uncommitted sink bytes left
+#               behind, as after a crash) must give the same sink as the single run
+# Returns summary dictionary
+def run_benchmark(reference_csv, workdir, rate=DEFAULT_RATE, append_rows=DEFAULT_APPEND_ROWS,
+                  poll_seconds=DEFAULT_POLL_SECONDS, max_bytes=DEFAULT_BATCH_BYTES):
+    workdir = Path(workdir)
+    header, lines = csv_lines(reference_csv)
+
+    start = time.perf_counter()
+    model, running = fit_stream_model(reference_csv)
+    fit_seconds = time.perf_counter() - start
+
+    # Throughput: drain the whole backlog
+    checkpoint_path, source_path, sink_path = create_stream(workdir / 'backlog', model, running, header)
+    append_lines(source_path, lines)
+    start = time.perf_counter()
+    checkpoint = follow(checkpoint_path, once=True, max_bytes=max_bytes)
+    backlog_seconds = time.perf_counter() - start
+    backlog_sink = sink_path.read_bytes()
+
+    # Restart: first half, a crash leaving uncommitted sink bytes, then the rest from the checkpoint
+    checkpoint_path, source_path, sink_path = create_stream(workdir / 'restart', model, running, header)
+    append_lines(source_path, lines[:len(lines) // 2])
+    follow(checkpoint_path, once=True, max_bytes=max_bytes)
+    append_lines(sink_path, [b'uncommitted,partial,row\n'])
+    append_lines(source_path, lines[len(lines) // 2:])
+    follow(checkpoint_path, once=True, max_bytes=max_bytes)
+    restart_matches = sink_path.read_bytes() == backlog_sink
+
+    # Latency: a writer thread appends at the given rate while the stream follows
+    checkpoint_path, source_path, sink_path = create_stream(workdir / 'latency', model, running, header)
+    appended, committed = [], []
+    stop = threading.Event()
+
+    def write_records():
+        interval = append_rows / rate
+        next_time = time.perf_counter()
+        for first in range(0, len(lines), append_rows):
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+            append_lines(source_path, lines[first:first + append_rows])
+            appended.append((min(first + append_rows, len(lines)), time.perf_counter()))
+            next_time += interval
+        stop.set()
+
+    writer = threading.Thread(target=write_records)
+    start = time.perf_counter()
+    writer.start()
+    follow(checkpoint_path, poll_seconds=poll_seconds, stop=stop, max_bytes=max_bytes,
+           on_batch=lambda state: committed.append((state['rows_in'], time.perf_counter())))
+    writer.join()
+    stream_seconds = time.perf_counter() - start
+
+    # Record i was appended by the first write and committed by the first batch that covered i + 1 records
+    records = np.arange(1, len(lines) + 1)
+    appended_rows, appended_times = (np.array(values) for values in zip(*appended))
+    committed_rows, committed_times = (np.array(values) for values in zip(*committed))
+    latencies = committed_times[np.searchsorted(committed_rows, records)] - appended_times[np.searchsorted(appended_rows, records)]
+
+    return {
+        'records': len(lines),
+        'fit_seconds': fit_seconds,
+        'backlog': {
+            'seconds': backlog_seconds,
+            'records_per_second': len(lines) / backlog_seconds,
+            'batches': checkpoint['batches'],
+            'rows_out': checkpoint['sink']['rows'],
+        },
+        'restart_matches_single_run': restart_matches,
+        'latency': {
+            'rate': rate,
+            'append_rows': append_rows,
+            'poll_seconds': poll_seconds,
+            'seconds': stream_seconds,
+            'batches': len(committed),
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+            'max_ms': float(latencies.max() * 1000),
+            'matches_backlog_sink': sink_path.read_bytes() == backlog_sink,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a growing transaction log through cleaning, encoding and scaling.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = subparsers.add_parser('init', help='fit the model on a reference CSV and write a fresh checkpoint')
+    init_parser.add_argument('--reference', type=Path, default=SUBMISSION_DIR / RAW_DATASET,
+                             help='raw CSV the model is fitted on (default: the submission dataset)')
+    init_parser.add_argument('--source', type=Path, required=True, help='append-only CSV file or directory of CSV batch files')
+    init_parser.add_argument('--sink', type=Path, required=True, help='CSV the feature rows are appended to')
+    init_parser.add_argument('--checkpoint', type=Path, required=True)
+
+    run_parser = subparsers.add_parser('run', help='follow the source from the committed offsets')
+    run_parser.add_argument('--checkpoint', type=Path, required=True)
+    run_parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help=f'seconds between polls (default: {DEFAULT_POLL_SECONDS})')
+    run_parser.add_argument('--batch-bytes', type=int, default=DEFAULT_BATCH_BYTES, help='bytes read per micro-batch')
+    run_parser.add_argument('--once', action='store_true', help='stop when every complete record is consumed')
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='measure backlog throughput, append-to-commit latency and restarts')
+    benchmark_parser.add_argument('--reference', type=Path, default=SUBMISSION_DIR / RAW_DATASET)
+    benchmark_parser.add_argument('--rate', type=int, default=DEFAULT_RATE, help=f'records appended per second (default: {DEFAULT_RATE})')
+    benchmark_parser.add_argument('--append-rows', type=int, default=DEFAULT_APPEND_ROWS, help=f'records per append (default: {DEFAULT_APPEND_ROWS})')
+    benchmark_parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS)
+    benchmark_parser.add_argument('--report', type=Path, help='write the summary to this JSON file')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'init':
+        model, running = fit_stream_model(arguments.reference)
+        save_checkpoint(new_checkpoint(model, running, arguments.source, arguments.sink), arguments.checkpoint)
+        print(f"Fitted on {arguments.reference}: {len(running['customer'])} customers, {len(running['item'])} items; "
+              f"checkpoint {arguments.checkpoint}")
+        return
+
+    if arguments.command == 'run':
+        try:
+            checkpoint = follow(arguments.checkpoint, arguments.poll, arguments.once, max_bytes=arguments.batch_bytes)
+        except KeyboardInterrupt:
+            checkpoint = load_checkpoint(arguments.checkpoint)
+        print(f"Committed so far: {checkpoint['rows_in']} records in {checkpoint['batches']} batches; "
+              f"{checkpoint['sink']['rows']} feature rows in {checkpoint['sink']['path']}")
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        summary = run_benchmark(arguments.reference, workdir, arguments.rate, arguments.append_rows, arguments.poll)
+    print(json.dumps(summary, indent=2))
+
+    if arguments.report:
+        arguments.report.parent.mkdir(parents=True, exist_ok=True)
+        arguments.report.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
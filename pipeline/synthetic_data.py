@@ -0,0 +1,240 @@
+"""
+Synthetic Transaction Generator
+
+Produces data shaped like datasource/Deliverable1Dataset.csv at any size:
+the same 11 columns, Item codes whose suffix matches the Category
+(FOOD, FUR, CEA, MILK, EHE, BEV, BUT, PAT), one fixed unit price per item
+and Total Spent = Price Per Unit x Quantity.
+
+Missingness mirrors the real data:
+  - Item + Quantity + Total Spent missing together (about 4.80% of rows)
+  - Item + Price Per Unit missing together (about 4.84% of rows)
+  - Discount Applied missing completely at random (about 33.4% of rows)
+
+Rows are generated in fixed-size chunks with NumPy, so hundreds of millions
+of rows can be written without holding them in memory. Each chunk has its own
+seed derived from (seed, chunk index), so a run is reproducible for a given
+seed and chunk size.
+
+Usage:
+    python -m pipeline.synthetic_data --rows 100000000 --output big.csv
+    python -m pipeline.synthetic_data --rows 5000000 --format parquet --output big.parquet --customers 5000 --customer-skew 1.1
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = [
+    'Transaction ID', 'Customer ID', 'Category', 'Item', 'Price Per Unit', 'Quantity',
+    'Total Spent', 'Payment Method', 'Location', 'Transaction Date', 'Discount Applied',
+]
+
+# Category name to the code used as Item suffix
+CATEGORY_CODES = {
+    'Beverages': 'BEV',
+    'Butchers': 'BUT',
+    'Computers and electric accessories': 'CEA',
+    'Electric household essentials': 'EHE',
+    'Food': 'FOOD',
+    'Furniture': 'FUR',
+    'Milk Products': 'MILK',
+    'Patisserie': 'PAT',
+}
+PAYMENT_METHODS = ['Cash', 'Credit Card', 'Digital Wallet']
+LOCATIONS = ['In-store', 'Online']
+
+# Item_n always costs BASE_PRICE + PRICE_STEP * (n - 1), as in the real data
+BASE_PRICE = 5.0
+PRICE_STEP = 1.5
+MAX_QUANTITY = 10
+
+# Defaults measured on Deliverable1Dataset.csv (12,575 rows)
+DEFAULT_CUSTOMERS = 25
+DEFAULT_ITEMS_PER_CATEGORY = 25
+DEFAULT_START_DATE = '2022-01-01'
+DEFAULT_END_DATE = '2025-01-18'
+QUANTITY_TOTAL_MISSING_RATE = 604 / 12575
+PRICE_ITEM_MISSING_RATE = 609 / 12575
+DISCOUNT_MISSING_RATE = 4199 / 12575
+
+FIRST_TRANSACTION_NUMBER = 1_000_000
+DEFAULT_CHUNK_ROWS = 1_000_000
+OUTPUT_FORMATS = ('csv', 'parquet')
+
+
+# Zipf-style selection probabilities over n choices
+# skew=0 is uniform; larger values concentrate traffic on the first choices
+def build_skewed_probabilities(choice_count, skew):
+    weights = 1.0 / np.arange(1, choice_count + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+# Build the label, price and date lookup tables shared by every chunk
+# Returns dictionary of NumPy arrays indexed by integer codes
+def build_lookup_tables(customer_count, items_per_category, start_date, end_date):
+    categories = list(CATEGORY_CODES)
+    date_strings = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1).astype(str).astype(object)
+    customer_width = max(2, len(str(customer_count)))
+
+    item_numbers = np.arange(1, items_per_category + 1)
+    item_labels = np.array([
+        [f'Item_{number}_{CATEGORY_CODES[category]}' for number in item_numbers]
+        for category in categories
+    ], dtype=object)
+
+    return {
+        'categories': np.array(categories, dtype=object),
+        'customers': np.array([f'CUST_{number:0{customer_width}d}' for number in range(1, customer_count + 1)], dtype=object),
+        'item_labels': item_labels,
+        'item_prices': BASE_PRICE + PRICE_STEP * (item_numbers - 1),
+        'payment_methods': np.array(PAYMENT_METHODS, dtype=object),
+        'locations': np.array(LOCATIONS, dtype=object),
+        'dates': date_strings,
+    }
+
+
+# Generate one chunk of synthetic transactions
+# first_row is the global row number of the chunk, used for unique Transaction IDs
+# Returns dataframe with the 11 raw columns and the real missingness pattern
+def generate_chunk(row_count, first_row, rng, tables, customer_probabilities, item_probabilities):
+    category_codes = rng.integers(0, len(tables['categories']), size=row_count)
+    customer_codes = rng.choice(len(tables['customers']), size=row_count, p=customer_probabilities)
+    item_codes = rng.choice(len(item_probabilities), size=row_count, p=item_probabilities)
+
+    prices = tables['item_prices'][item_codes]
+    quantities = rng.integers(1, MAX_QUANTITY + 1, size=row_count).astype(np.float64)
+    totals = prices * quantities
+
+    # Missingness: one uniform draw decides between the two MAR patterns, another drives MCAR Discount
+    pattern_draw = rng.random(row_count)
+    quantity_total_missing = pattern_draw < QUANTITY_TOTAL_MISSING_RATE
+    price_item_missing = (pattern_draw >= QUANTITY_TOTAL_MISSING_RATE) & (pattern_draw < QUANTITY_TOTAL_MISSING_RATE + PRICE_ITEM_MISSING_RATE)
+    item_missing = quantity_total_missing | price_item_missing
+    discount_missing = rng.random(row_count) < DISCOUNT_MISSING_RATE
+
+    prices[price_item_missing] = np.nan
+    quantities[quantity_total_missing] = np.nan
+    totals[quantity_total_missing] = np.nan
+
+    items = tables['item_labels'][category_codes, item_codes]
+    items[item_missing] = None
+
+    discounts = np.where(rng.random(row_count) < 0.5, 'TRUE', 'FALSE').astype(object)
+    discounts[discount_missing] = None
+
+    dates = tables['dates'][rng.integers(0, len(tables['dates']), size=row_count)]
+
+    transaction_numbers = np.arange(first_row, first_row + row_count, dtype=np.int64) + FIRST_TRANSACTION_NUMBER
+
+    return pd.DataFrame({
+        'Transaction ID': 'TXN_' + pd.Series(transaction_numbers).astype(str),
+        'Customer ID': tables['customers'][customer_codes],
+        'Category': tables['categories'][category_codes],
+        'Item': items,
+        'Price Per Unit': prices,
+        'Quantity': pd.array(quantities, dtype='Int64'),
+        'Total Spent': totals,
+        'Payment Method': tables['payment_methods'][rng.integers(0, len(PAYMENT_METHODS), size=row_count)],
+        'Location': tables['locations'][rng.integers(0, len(LOCATIONS), size=row_count)],
+        'Transaction Date': dates,
+        'Discount Applied': discounts,
+    }, columns=COLUMNS)
+
+
+# Yield synthetic transaction chunks totalling row_count rows
+# Customer and item cardinality and Zipf skew are configurable
+def iterate_synthetic_chunks(
+    row_count,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    seed=0,
+    customer_count=DEFAULT_CUSTOMERS,
+    items_per_category=DEFAULT_ITEMS_PER_CATEGORY,
+    customer_skew=0.0,
+    item_skew=0.0,
+    start_date=DEFAULT_START_DATE,
+    end_date=DEFAULT_END_DATE,
+):
+    tables = build_lookup_tables(customer_count, items_per_category, start_date, end_date)
+    customer_probabilities = build_skewed_probabilities(customer_count, customer_skew)
+    item_probabilities = build_skewed_probabilities(items_per_category, item_skew)
+
+    for chunk_index, first_row in enumerate(range(0, row_count, chunk_rows)):
+        rng = np.random.default_rng([seed, chunk_index])
+        rows_in_chunk = min(chunk_rows, row_count - first_row)
+        yield generate_chunk(rows_in_chunk, first_row, rng, tables, customer_probabilities, item_probabilities)
+
+
+# Write synthetic transactions to CSV or Parquet chunk by chunk
+# CSV matches the raw file layout; Parquet needs the optional pyarrow dependency
+# Returns number of rows written
+def write_synthetic_dataset(output_path, row_count, output_format='csv', **generator_options):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}')
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    parquet_writer = None
+    rows_written = 0
+
+    for chunk in iterate_synthetic_chunks(row_count, **generator_options):
+        if output_format == 'csv':
+            chunk.to_csv(output_path, index=False, mode='w' if rows_written == 0 else 'a', header=rows_written == 0, float_format='%g')
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as error:
+                raise ImportError('Parquet output requires pyarrow (pip install pyarrow)') from error
+
+            chunk['Discount Applied'] = chunk['Discount Applied'].map({'TRUE': True, 'FALSE': False}).astype('boolean')
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(output_path, table.schema)
+            parquet_writer.write_table(table)
+
+        rows_written += len(chunk)
+
+    if parquet_writer is not None:
+        parquet_writer.close()
+
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic transactions shaped like Deliverable1Dataset.csv.')
+    parser.add_argument('--rows', type=int, required=True, help='number of rows to generate')
+    parser.add_argument('--output', type=Path, required=True, help='output file path')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', dest='output_format')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--customers', type=int, default=DEFAULT_CUSTOMERS, help='number of distinct Customer IDs')
+    parser.add_argument('--items-per-category', type=int, default=DEFAULT_ITEMS_PER_CATEGORY)
+    parser.add_argument('--customer-skew', type=float, default=0.0, help='Zipf exponent for customers (0 = uniform)')
+    parser.add_argument('--item-skew', type=float, default=0.0, help='Zipf exponent for items within a category')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    rows_written = write_synthetic_dataset(
+        arguments.output,
+        arguments.rows,
+        output_format=arguments.output_format,
+        chunk_rows=arguments.chunk_rows,
+        seed=arguments.seed,
+        customer_count=arguments.customers,
+        items_per_category=arguments.items_per_category,
+        customer_skew=arguments.customer_skew,
+        item_skew=arguments.item_skew,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f'Wrote {rows_written} rows to {arguments.output} in {elapsed:.2f}s ({rows_written / elapsed:,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
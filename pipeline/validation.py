@@ -0,0 +1,288 @@
+"""
+Declarative Validation Engine
+
+Stage invariants are declared as plain constraint dictionaries and checked
+together in one pass over the frame, block by block:
+
+  one_hot_group(name, columns)              only 0/1 values, and exactly one 1 across the columns on every row
+  binary(columns)                           only 0/1 (or False/True) values
+  value_range(column, low, high)            values inside [low, high]; observed min/max are reported
+  not_null(columns, finite=False)           no missing (and, with finite, no infinite) values
+  mapping(source, target, mapping)          target equals mapping[source] on every row
+  product_equals(result, left, right, tol)  result = left x right within tol (rows with a NaN are skipped)
+  correlation(source, target, minimum)      Spearman rank correlation >= minimum (1.0 for a monotone rescale)
+  row_count(expected)                       the frame has exactly expected rows
+
+Row-wise checks produce a violation mask per block; correlation keeps the
+non-missing value pairs and ranks them once every block is seen, so each
+column is read once whatever the number of constraints. The report lists,
+per constraint, the violation count and the ids of the first violating rows.
+
+Usage:
+    report = validate_frame(dataframe, [
+        one_hot_group('Payment Method', PAYMENT_COLS),
+        binary(['Location_Encoded']),
+        product_equals('Total Spent', 'Price Per Unit', 'Quantity'),
+    ])
+    display_validation_report(report)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_BLOCK_ROWS = 1_000_000
+DEFAULT_SAMPLE_SIZE = 5
+DEFAULT_ID_COLUMN = 'Transaction ID'
+
+# Relative tolerance for product_equals, absolute slack for correlation
+PRODUCT_TOLERANCE = 1e-9
+CORRELATION_TOLERANCE = 1e-9
+
+
+# Short label for a list of columns in constraint names
+def describe_columns(columns):
+    return ', '.join(columns) if len(columns) <= 3 else f'{len(columns)} columns'
+
+
+# One-hot family: exactly one 1 across the columns on every row
+def one_hot_group(name, columns):
+    return {'name': f'{name} one-hot sums to 1', 'kind': 'one_hot_group', 'columns': list(columns)}
+
+
+# Only 0/1 values in every column
+def binary(columns, name=None):
+    columns = list(columns)
+    return {'name': name or f'{describe_columns(columns)} only 0/1', 'kind': 'binary', 'columns': columns}
+
+
+# Values inside [low, high]; either bound may be None (the observed range is always reported)
+# Missing values are left to not_null
+def value_range(column, low=None, high=None, name=None):
+    return {'name': name or f'{column} in [{low}, {high}]', 'kind': 'range', 'columns': [column], 'low': low, 'high': high}
+
+
+# No missing values; with finite=True, no infinite values either
+def not_null(columns, finite=False, name=None):
+    columns = list(columns)
+    label = 'finite' if finite else 'not null'
+    return {'name': name or f'{describe_columns(columns)} {label}', 'kind': 'not_null', 'columns': columns, 'finite': finite}
+
+
+# target equals mapping[source] on every row; sources missing from mapping are violations
+def mapping(source, target, values, name=None):
+    return {'name': name or f'{target} follows {source} mapping', 'kind': 'mapping', 'columns': [source, target], 'mapping': dict(values)}
+
+
+# result = left x right within a relative tolerance; rows where any of the three is missing are skipped
+def product_equals(result, left, right, tolerance=PRODUCT_TOLERANCE, name=None):
+    return {'name': name or f'{result} = {left} x {right}', 'kind': 'product_equals', 'columns': [result, left, right], 'tolerance': tolerance}
+
+
+# Spearman rank correlation of source and target at least minimum (minus CORRELATION_TOLERANCE)
+# Any monotone rescale reaches 1.0, including float32 rounding of a linear one
+def correlation(source, target, minimum=1.0, name=None):
+    return {'name': name or f'corr({source}, {target}) >= {minimum}', 'kind': 'correlation', 'columns': [source, target], 'minimum': minimum}
+
+
+# The frame has exactly expected rows
+def row_count(expected, name=None):
+    return {'name': name or f'row count = {expected}', 'kind': 'row_count', 'columns': [], 'expected': expected}
+
+
+# Rows of one column block holding anything other than 0/1 (missing values included)
+def non_binary(values):
+    if isinstance(values, pd.Series):
+        return ~values.isin([0, 1]).to_numpy()
+    if values.dtype == bool:
+        return np.zeros(len(values), dtype=bool)
+    return (values != 0) & (values != 1)
+
+
+# Violation mask of one block for a row-wise constraint
+# arrays maps column name -> block values (NumPy array, or Series for non-numeric columns)
+def block_violations(constraint, arrays, state):
+    kind = constraint['kind']
+    columns = constraint['columns']
+
+    if kind == 'one_hot_group':
+        # Each column must hold 0/1 itself; only then are the ones counted across the group
+        violations = np.zeros(len(arrays[columns[0]]), dtype=bool)
+        ones = np.zeros(len(violations), dtype=np.int64)
+        for column in columns:
+            values = arrays[column]
+            violations |= non_binary(values)
+            is_one = values == 1
+            ones += is_one.to_numpy(dtype=bool, na_value=False) if isinstance(is_one, pd.Series) else is_one
+        return violations | (ones != 1)
+
+    if kind == 'binary':
+        violations = np.zeros(len(arrays[columns[0]]), dtype=bool)
+        for column in columns:
+            violations |= non_binary(arrays[column])
+        return violations
+
+    if kind == 'not_null':
+        violations = np.zeros(len(arrays[columns[0]]), dtype=bool)
+        for column in columns:
+            values = arrays[column]
+            if isinstance(values, pd.Series):
+                violations |= values.isna().to_numpy()
+            elif values.dtype.kind == 'f':
+                violations |= ~np.isfinite(values) if constraint['finite'] else np.isnan(values)
+        return violations
+
+    if kind == 'range':
+        values = np.asarray(arrays[columns[0]], dtype=np.float64)
+        present = values[~np.isnan(values)]
+        if len(present):
+            state['minimum'] = min(state.get('minimum', np.inf), float(present.min()))
+            state['maximum'] = max(state.get('maximum', -np.inf), float(present.max()))
+
+        violations = np.zeros(len(values), dtype=bool)
+        if constraint['low'] is not None:
+            violations |= values < constraint['low']
+        if constraint['high'] is not None:
+            violations |= values > constraint['high']
+        return violations
+
+    if kind == 'mapping':
+        source, target = columns
+        expected = pd.Series(arrays[source]).map(constraint['mapping'])
+        return ~(expected.notna().to_numpy() & (expected.to_numpy() == np.asarray(arrays[target])))
+
+    if kind == 'product_equals':
+        result, left, right = (np.asarray(arrays[column], dtype=np.float64) for column in columns)
+        with np.errstate(invalid='ignore'):
+            return ~np.isclose(result, left * right, rtol=constraint['tolerance'], atol=0.0, equal_nan=False) & \
+                ~(np.isnan(result) | np.isnan(left) | np.isnan(right))
+
+    if kind == 'correlation':
+        source, target = (np.asarray(arrays[column], dtype=np.float64) for column in columns)
+        present = ~(np.isnan(source) | np.isnan(target))
+
+        # Ranks need every value, so the present pairs are kept until the last block
+        state.setdefault('source', []).append(source[present])
+        state.setdefault('target', []).append(target[present])
+        return None
+
+    return None
+
+
+# Final result of an aggregate constraint once every block has been seen
+# Returns (violation count, detail dictionary)
+def finish_aggregate(constraint, state, total_rows):
+    if constraint['kind'] == 'row_count':
+        return int(total_rows != constraint['expected']), {'expected': constraint['expected'], 'actual': total_rows}
+
+    if constraint['kind'] == 'correlation':
+        # Spearman: Pearson correlation of the (tie-averaged) ranks
+        value = np.nan
+        if state.get('source') and sum(len(block) for block in state['source']) > 1:
+            source_ranks = pd.Series(np.concatenate(state['source'])).rank(method='average').to_numpy()
+            target_ranks = pd.Series(np.concatenate(state['target'])).rank(method='average').to_numpy()
+            source_ranks = source_ranks - source_ranks.mean()
+            target_ranks = target_ranks - target_ranks.mean()
+            variance_x = (source_ranks * source_ranks).sum()
+            variance_y = (target_ranks * target_ranks).sum()
+            if variance_x > 0 and variance_y > 0:
+                value = float((source_ranks * target_ranks).sum() / np.sqrt(variance_x * variance_y))
+
+        passed = not np.isnan(value) and value >= constraint['minimum'] - CORRELATION_TOLERANCE
+        return int(not passed), {'correlation': value}
+
+    return 0, {}
+
+
+# Evaluate every constraint against a dataframe in one fused, block-wise pass
+# Each referenced column is converted once; ids of the first sample_size violating rows are kept per constraint
+# Raises KeyError naming columns that the frame does not have
+# Returns report dictionary: rows, passed, and one result per constraint (violations, sample_ids, detail)
+def validate_frame(dataframe, constraints, block_rows=DEFAULT_BLOCK_ROWS, sample_size=DEFAULT_SAMPLE_SIZE, id_column=DEFAULT_ID_COLUMN):
+    referenced = sorted({column for constraint in constraints for column in constraint['columns']})
+    missing_columns = [column for column in referenced if column not in dataframe.columns]
+    if missing_columns:
+        raise KeyError(f'Columns not in the frame: {missing_columns}')
+
+    # Numeric and boolean columns become NumPy arrays once (zero-copy when possible); others stay Series
+    columns = {}
+    for column in referenced:
+        series = dataframe[column]
+        if pd.api.types.is_bool_dtype(series) and not series.isna().any():
+            columns[column] = series.to_numpy(dtype=bool)
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            columns[column] = series.to_numpy(dtype=np.float64 if series.isna().any() else None)
+        else:
+            columns[column] = series
+
+    ids = dataframe[id_column] if id_column in dataframe.columns else None
+    total_rows = len(dataframe)
+
+    results = [{'name': constraint['name'], 'kind': constraint['kind'], 'violations': 0, 'sample_ids': [], 'detail': {}}
+               for constraint in constraints]
+    states = [{} for _ in constraints]
+
+    for start in range(0, max(total_rows, 1), block_rows):
+        stop = min(start + block_rows, total_rows)
+        arrays = {column: values.iloc[start:stop] if isinstance(values, pd.Series) else values[start:stop]
+                  for column, values in columns.items()}
+
+        for constraint, result, state in zip(constraints, results, states):
+            if not constraint['columns']:
+                continue
+
+            violations = block_violations(constraint, arrays, state)
+            if violations is None or not violations.any():
+                continue
+
+            positions = np.flatnonzero(violations)
+            result['violations'] += len(positions)
+
+            room = sample_size - len(result['sample_ids'])
+            if room > 0:
+                sample_positions = positions[:room] + start
+                sample = ids.iloc[sample_positions].tolist() if ids is not None else sample_positions.tolist()
+                result['sample_ids'].extend(sample)
+
+    for constraint, result, state in zip(constraints, results, states):
+        if constraint['kind'] in ('row_count', 'correlation'):
+            result['violations'], result['detail'] = finish_aggregate(constraint, state, total_rows)
+        elif constraint['kind'] == 'range':
+            result['detail'] = {'minimum': state.get('minimum', np.nan), 'maximum': state.get('maximum', np.nan)}
+
+    return {
+        'rows': total_rows,
+        'passed': all(result['violations'] == 0 for result in results),
+        'results': results,
+    }
+
+
+# Look up one constraint result of a report by name
+def report_result(report, name):
+    for result in report['results']:
+        if result['name'] == name:
+            return result
+
+    raise KeyError(f'No constraint named {name!r}; report has {[result["name"] for result in report["results"]]}')
+
+
+# Print a validation report: one line per constraint, violation samples only when it fails
+def display_validation_report(report, title='VALIDATION CHECKS'):
+    print(title)
+
+    for number, result in enumerate(report['results'], start=1):
+        detail = result['detail']
+        if result['kind'] == 'correlation':
+            note = f" (r = {detail['correlation']:.6f})"
+        elif result['kind'] == 'range':
+            note = f" (observed [{detail['minimum']:.4f}, {detail['maximum']:.4f}])"
+        elif result['kind'] == 'row_count':
+            note = f" (actual {detail['actual']})"
+        else:
+            note = ''
+
+        print(f"{number}. {result['name']}: {result['violations'] == 0}{note}")
+        if result['sample_ids']:
+            print(f"   {result['violations']} violating rows, e.g. {result['sample_ids']}")
+
+    print(f"All checks passed: {report['passed']}")
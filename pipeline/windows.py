@@ -0,0 +1,280 @@
+"""
+Windowed Per-Customer Aggregates
+
+Customer ID Target Encoded gives each customer one all-history mean. The
+window features here are recency-aware: for every transaction, over the 7,
+30 and 90 days before its Transaction Date, the customer's
+
+  Customer Spend {W}d                  sum of Total Spent
+  Customer Transactions {W}d           number of transactions
+  Customer cat_{Category} Share {W}d   share of those transactions per Category
+
+A window covers the W days before the transaction's date (date - W <= day <
+date). Dates carry no time of day, so transactions of the same day never see
+each other, and a row never sees its own Total Spent.
+
+Engine: the rows are reduced to one row per (Customer ID, day) with the day's
+spend, transaction count and per-Category counts, sorted once by a combined
+(customer, day) key. Cumulative sums over that table turn every window into
+two lookups, whose positions come from np.searchsorted on the keys; the
+customer part of the key keeps windows from reaching into another customer.
+
+Incremental updates: the state is the daily table of the last max(W) days
+before the newest day. A batch of new days (no earlier than the newest day
+already seen) is reduced, merged into the state and looked up the same way,
+then days that no future window can reach are dropped, so an update costs
+the size of the batch plus customers x max(W) days, never the history.
+Later-dated batches give exactly the features of a full recomputation.
+
+Usage:
+    python -m pipeline.windows build --output /tmp/windows/features.csv --state /tmp/windows/state.json
+    python -m pipeline.windows update new_days.csv --state /tmp/windows/state.json --output /tmp/windows/new_features.csv
+    python -m pipeline.windows check --batches 20
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.dtype_plan import date_day_numbers
+from pipeline.out_of_core import CATEGORY, CUSTOMER_ID, TOTAL_SPENT, TRANSACTION_DATE, TRANSACTION_ID
+from pipeline.stages import CLEANED_DATASET, SUBMISSION_DIR
+
+
+DEFAULT_WINDOWS = (7, 30, 90)
+STATE_FORMAT_VERSION = 1
+
+DAY = 'day'
+SPEND = 'spend'
+TRANSACTIONS = 'transactions'
+
+
+# Column of the daily table holding the transaction count of one Category
+def category_count_column(category):
+    return f'n_{category}'
+
+
+# Names of the window feature columns, in output order
+def window_feature_columns(windows, categories):
+    columns = []
+    for window in windows:
+        columns += [f'Customer Spend {window}d', f'Customer Transactions {window}d']
+        columns += [f'Customer cat_{category} Share {window}d' for category in categories]
+
+    return columns
+
+
+# Reduce transaction rows to one row per (Customer ID, day): spend, transaction count and per-Category counts
+# Categories outside the vocabulary count as transactions but get no share
+# Raises ValueError when a Customer ID is missing
+# Returns DataFrame sorted by Customer ID and day
+def daily_aggregates(dataframe, categories):
+    if dataframe[CUSTOMER_ID].isna().any():
+        raise ValueError(f'{int(dataframe[CUSTOMER_ID].isna().sum())} rows have no {CUSTOMER_ID}; windows need one per row')
+
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE).astype(np.int64)
+    daily = pd.DataFrame({
+        CUSTOMER_ID: dataframe[CUSTOMER_ID].to_numpy(),
+        DAY: days,
+        SPEND: np.nan_to_num(dataframe[TOTAL_SPENT].to_numpy(dtype=np.float64)),
+        TRANSACTIONS: np.ones(len(dataframe), dtype=np.int64),
+        **{category_count_column(category): (dataframe[CATEGORY] == category).to_numpy(dtype=np.int64) for category in categories},
+    })
+
+    return merge_daily(daily)
+
+
+# Sum daily rows that share a (Customer ID, day); used to reduce rows and to merge a batch into the state
+def merge_daily(daily):
+    return daily.groupby([CUSTOMER_ID, DAY], sort=True, as_index=False).sum()
+
+
+# Window features of query rows (customer, day) from a daily table
+# Every window is cumulative[end] - cumulative[start], with start / end found by searchsorted on the
+# combined key customer * span + day offset; the offset leaves max(W) free days before each customer
+# Returns DataFrame of window_feature_columns, one row per query
+def window_features(daily, customers, days, windows, categories):
+    customers = np.asarray(customers)
+    days = np.asarray(days, dtype=np.int64)
+    longest = max(windows)
+
+    labels, codes = np.unique(np.concatenate([daily[CUSTOMER_ID].to_numpy(), customers]), return_inverse=True)
+    daily_codes, query_codes = codes[:len(daily)], codes[len(daily):]
+
+    first_day = min(daily[DAY].min(), days.min()) if len(daily) else days.min()
+    span = max(daily[DAY].max() if len(daily) else 0, days.max()) - first_day + longest + 1
+    daily_keys = daily_codes * span + (daily[DAY].to_numpy() - first_day + longest)
+    query_keys = query_codes * span + (days - first_day + longest)
+
+    # The one sort: daily rows by (customer, day); then cumulative sums with a leading zero row
+    order = np.argsort(daily_keys, kind='stable')
+    daily_keys = daily_keys[order]
+    measures = daily[[SPEND, TRANSACTIONS] + [category_count_column(category) for category in categories]].to_numpy(dtype=np.float64)[order]
+    cumulative = np.vstack([np.zeros((1, measures.shape[1])), np.cumsum(measures, axis=0)])
+
+    end = np.searchsorted(daily_keys, query_keys, side='left')
+    features = {}
+    for window in windows:
+        start = np.searchsorted(daily_keys, query_keys - window, side='left')
+        totals = cumulative[end] - cumulative[start]
+        transactions = totals[:, 1]
+
+        features[f'Customer Spend {window}d'] = totals[:, 0]
+        features[f'Customer Transactions {window}d'] = transactions.astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for position, category in enumerate(categories):
+                features[f'Customer cat_{category} Share {window}d'] = np.where(transactions > 0, totals[:, 2 + position] / transactions, 0.0)
+
+    return pd.DataFrame(features, columns=window_feature_columns(windows, categories))
+
+
+# Keep only the daily rows a window of a transaction on or after last_day can still reach
+def trim_daily(daily, last_day, windows):
+    return daily[daily[DAY] >= last_day - max(windows)].reset_index(drop=True)
+
+
+# Window features of every row of a dataset, plus the state for incremental updates
+# categories defaults to the dataset's sorted Categories
+# Returns tuple of (features DataFrame with Transaction ID first, state dictionary)
+def build_window_features(dataframe, windows=DEFAULT_WINDOWS, categories=None):
+    windows = sorted(windows)
+    categories = sorted(dataframe[CATEGORY].dropna().unique()) if categories is None else list(categories)
+
+    daily = daily_aggregates(dataframe, categories)
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE).astype(np.int64)
+    features = window_features(daily, dataframe[CUSTOMER_ID].to_numpy(), days, windows, categories)
+    features.insert(0, TRANSACTION_ID, dataframe[TRANSACTION_ID].to_numpy())
+
+    last_day = int(daily[DAY].max())
+    state = {'windows': windows, 'categories': categories, 'last_day': last_day, 'daily': trim_daily(daily, last_day, windows)}
+
+    return features, state
+
+
+# Window features of a batch of new rows from the state, and the updated state
+# The batch may start on the newest day already seen (rows of the same day do not see each other)
+# Raises ValueError for rows dated before it: their features would change already emitted rows
+# Returns tuple of (features DataFrame with Transaction ID first, new state dictionary)
+def update_window_features(state, dataframe):
+    windows, categories = state['windows'], state['categories']
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE).astype(np.int64)
+    if len(days) and days.min() < state['last_day']:
+        raise ValueError(f'{int((days < state["last_day"]).sum())} rows are dated before the newest day already seen '
+                         f'({pd.Timestamp(state["last_day"], unit="D").date()}); rebuild the windows instead')
+
+    daily = merge_daily(pd.concat([state['daily'], daily_aggregates(dataframe, categories)], ignore_index=True))
+    features = window_features(daily, dataframe[CUSTOMER_ID].to_numpy(), days, windows, categories)
+    features.insert(0, TRANSACTION_ID, dataframe[TRANSACTION_ID].to_numpy())
+
+    last_day = int(max(state['last_day'], days.max())) if len(days) else state['last_day']
+    return features, dict(state, last_day=last_day, daily=trim_daily(daily, last_day, windows))
+
+
+def save_window_state(state, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    serializable = dict(state, format_version=STATE_FORMAT_VERSION, daily=state['daily'].to_dict(orient='list'))
+    output_path.write_text(json.dumps(serializable, default=lambda value: value.item()))
+
+
+def load_window_state(input_path):
+    state = json.loads(Path(input_path).read_text())
+
+    if state.pop('format_version', None) != STATE_FORMAT_VERSION:
+        raise ValueError(f'{input_path} is not a window state of format {STATE_FORMAT_VERSION}')
+    state['daily'] = pd.DataFrame(state['daily'])
+
+    return state
+
+
+# Split a dataset into batches of whole days in date order (the way new days arrive)
+# Returns list of DataFrames
+def split_by_days(dataframe, batches):
+    days = date_day_numbers(dataframe[TRANSACTION_DATE], TRANSACTION_DATE)
+    boundaries = np.quantile(np.unique(days), np.linspace(0, 1, batches + 1)[1:-1]).astype(np.int64)
+    batch_numbers = np.searchsorted(boundaries, days, side='right')
+    order = np.argsort(batch_numbers, kind='stable')
+
+    return [dataframe.iloc[order[batch_numbers[order] == number]] for number in range(batches)]
+
+
+# Build on the first batch, update with the others, and compare with one full build
+# Returns dictionary of timings, state size and the largest difference per feature family
+def check_incremental(dataframe, windows=DEFAULT_WINDOWS, batches=20):
+    start = time.perf_counter()
+    full_features, full_state = build_window_features(dataframe, windows)
+    full_seconds = time.perf_counter() - start
+
+    parts = split_by_days(dataframe, batches)
+    start = time.perf_counter()
+    features, state = build_window_features(parts[0], windows, full_state['categories'])
+    collected = [features]
+    for part in parts[1:]:
+        features, state = update_window_features(state, part)
+        collected.append(features)
+    incremental_seconds = time.perf_counter() - start
+
+    incremental = pd.concat(collected).set_index(TRANSACTION_ID).loc[full_features[TRANSACTION_ID]].reset_index()
+    feature_columns = window_feature_columns(full_state['windows'], full_state['categories'])
+    gaps = np.abs(incremental[feature_columns].to_numpy(dtype=np.float64) - full_features[feature_columns].to_numpy(dtype=np.float64)).max(axis=0)
+
+    return {
+        'rows': len(dataframe),
+        'batches': batches,
+        'full_seconds': full_seconds,
+        'incremental_seconds': incremental_seconds,
+        'state_daily_rows': len(state['daily']),
+        'history_daily_rows': len(daily_aggregates(dataframe, full_state['categories'])),
+        'max_difference': float(gaps.max()),
+        'identical': bool((gaps == 0).all()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-customer spend, count and Category mix over trailing day windows.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='window features of every row of a dataset')
+    build_parser.add_argument('input', type=Path, nargs='?', default=SUBMISSION_DIR / CLEANED_DATASET,
+                              help='cleaned transactions (default: the submission final_cleaned_dataset.csv)')
+    build_parser.add_argument('--windows', type=int, nargs='+', default=list(DEFAULT_WINDOWS), help='window lengths in days')
+    build_parser.add_argument('--output', type=Path, required=True, help='CSV of Transaction ID and the window features')
+    build_parser.add_argument('--state', type=Path, help='write the state for incremental updates here')
+
+    update_parser = subparsers.add_parser('update', help='window features of new days from a saved state')
+    update_parser.add_argument('input', type=Path, help='cleaned transactions of the new days')
+    update_parser.add_argument('--state', type=Path, required=True, help='state to read and update in place')
+    update_parser.add_argument('--output', type=Path, required=True)
+
+    check_parser = subparsers.add_parser('check', help='compare day-by-day incremental updates with a full build')
+    check_parser.add_argument('input', type=Path, nargs='?', default=SUBMISSION_DIR / CLEANED_DATASET)
+    check_parser.add_argument('--windows', type=int, nargs='+', default=list(DEFAULT_WINDOWS))
+    check_parser.add_argument('--batches', type=int, default=20, help='batches of whole days (default: 20)')
+    arguments = parser.parse_args()
+
+    dataframe = pd.read_csv(arguments.input)
+
+    if arguments.command == 'check':
+        print(json.dumps(check_incremental(dataframe, arguments.windows, arguments.batches), indent=2))
+        return
+
+    if arguments.command == 'build':
+        features, state = build_window_features(dataframe, arguments.windows)
+    else:
+        features, state = update_window_features(load_window_state(arguments.state), dataframe)
+
+    arguments.output.parent.mkdir(parents=True, exist_ok=True)
+    features.to_csv(arguments.output, index=False)
+    if arguments.state:
+        save_window_state(state, arguments.state)
+    print(f"Wrote {len(features)} rows x {len(features.columns) - 1} window features to {arguments.output}; "
+          f"state holds {len(state['daily'])} customer-days")
+
+
+if __name__ == '__main__':
+    main()